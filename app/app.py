@@ -3,19 +3,32 @@ from pathlib import Path
 import dash
 from dash import dcc, html, dash_table
 import dash_bootstrap_components as dbc
-from flask import send_from_directory
+from flask import Response, abort, send_file, send_from_directory
+from werkzeug.security import safe_join
 
 from containers import logo_title, info_box, hello_user, create_radio_container, \
     select_pollination_project, select_sample_project, create_color_by_container, \
-    create_images_container
-from config import assets_path, upload_path, static_path
+    create_images_container, create_pareto_container, create_sensitivity_container, \
+    create_scatter_container, create_axes_container
+from config import assets_path, upload_path, static_path, compress_responses, \
+    server_backend, x_sendfile, table_page_size, samples_path, brush_debounce_ms
 from samples import load_sample_project
+from metrics import PROMETHEUS_CONTENT_TYPE, record_response, render_prometheus
+import serialization
+from storage import uploads, pollination_projects, project_path, touch_project
+import deepzoom
 
 # import callback functions
-from callbacks import color, image, records, sample, sort, table, upload
+from callbacks import color, dimensions, image, pareto, records, sample, \
+    scatter, sensitivity, sort, stats, table, upload
+from callbacks.table import table_page
 
 #
 from helper import find_free_port, print_startup_banner
+from serve import run
+
+# encode callback responses with orjson, including components and Patch objects
+serialization.install()
 
 
 app = dash.Dash(
@@ -26,23 +39,60 @@ app = dash.Dash(
         {'href': '/assets/custom.css?version=2.0', 'rel': 'stylesheet', 'type': 'text/css'}
     ],
     assets_ignore=r'^.*\.ttf$',  # Ignore font files to let Flask serve them directly
-    suppress_callback_exceptions=True
+    suppress_callback_exceptions=True,
+    # gzip/brotli through flask-compress, images are served uncompressed
+    compress=compress_responses
 )
 app.title = 'Design Explorer'
 server = app.server
+server.config['USE_X_SENDFILE'] = x_sendfile
 
 # this will set an alternative folder for images (alternative to "/assets")
 @server.route('/pollination/<path:path>')
 def serve_image(path):
     directory = Path(__file__).parent.joinpath('pollination')
+    pollination_projects.touch(path)
     return send_from_directory(directory, path)
 
 
+# Serve the sample projects, next to the executable in the fast launch build
+@server.route('/samples/<path:path>')
+def serve_sample(path):
+    return send_from_directory(samples_path, path)
+
+
 # Serve uploaded files directly from static/uploaded to avoid Dash caching and reload issues
 @server.route('/uploaded/<path:path>')
 def serve_uploaded(path):
+    uploads.touch(path)
     return send_from_directory(upload_path, path)
 
+# Serve the deep zoom descriptor and tiles of a large image of a project, e.g.
+# /deepzoom/uploaded/<project>/<image>.dzi and
+# /deepzoom/uploaded/<project>/<image>_files/<level>/<col>_<row>.png
+@server.route('/deepzoom/<path:path>')
+def serve_deepzoom(path):
+    prefix, _, rest = path.partition('/')
+    root = project_path(f'{prefix}/')
+    request = deepzoom.parse_path(rest)
+    if root is None or request is None:
+        abort(404)
+    image, tile = request
+    image_path = safe_join(str(root), image)
+    if image_path is None:
+        abort(404)
+    touch_project(f'{prefix}/{image}')
+    if tile is None:
+        xml = deepzoom.descriptor(Path(image_path))
+        if xml is None:
+            abort(404)
+        return Response(xml, mimetype='application/xml')
+    tile = deepzoom.tile(Path(image_path), *tile)
+    if tile is None:
+        abort(404)
+    return send_file(tile)
+
+
 # Serve font files directly to ensure proper access
 @server.route('/assets/font/<path:filename>')
 def serve_font(filename):
@@ -50,11 +100,22 @@ def serve_font(filename):
     return send_from_directory(font_dir, filename)
 
 
+# Expose callback timings, payload sizes and cache counters for Prometheus
+@server.route('/metrics')
+def serve_metrics():
+    return Response(render_prometheus(), mimetype=PROMETHEUS_CONTENT_TYPE)
+
+
+server.after_request(record_response)
+
+
 parameters, color_by, fig, images_grid_children, sort_by, project_folder, \
-df_records, df, labels, img_column, columns = load_sample_project(
+df, labels, img_column, columns, dataset_version, axes = load_sample_project(
     'daylight-factor'
 )
 
+table_data, page_count = table_page(df, None, 0, table_page_size, columns=axes)
+
 app.layout = dbc.Container([
     # Header section
     logo_title(app),
@@ -77,14 +138,36 @@ app.layout = dbc.Container([
     
     # Color by section
     create_color_by_container(parameters, color_by),
+
+    # Pareto front section
+    create_pareto_container(parameters),
     
-    # Parallel coordinates graph
+    # Parallel coordinates graph and column statistics
     dbc.Card([
         dbc.CardBody([
-            dcc.Graph(id='parallel-coordinates', figure=fig),
+            create_axes_container(parameters, axes),
+            dbc.Row([
+                dbc.Col(dcc.Graph(id='parallel-coordinates', figure=fig), lg=9),
+                dbc.Col(html.Div(id='column-stats', className='column-stats'),
+                        lg=3),
+            ]),
         ])
     ], className='mb-4 shadow-sm'),
     
+    # Scatter plot of two columns, linked to the filters
+    dbc.Card([
+        dbc.CardBody([
+            create_scatter_container(),
+        ])
+    ], className='mb-4 shadow-sm'),
+
+    # Sensitivity of the outputs to the inputs
+    dbc.Card([
+        dbc.CardBody([
+            create_sensitivity_container(),
+        ])
+    ], className='mb-4 shadow-sm'),
+
     # Images container
     create_images_container(images_grid_children, parameters, sort_by),
     
@@ -93,15 +176,21 @@ app.layout = dbc.Container([
         dbc.CardBody([
             dash_table.DataTable(
                 id='table', 
-                data=df.to_dict('records'),
+                data=table_data,
                 columns=columns,
+                page_action='custom',
+                page_current=0,
+                page_size=table_page_size,
+                page_count=page_count,
                 style_table={
                     'padding': '20px',
                     'overflowX': 'auto',
                     'overflowY': 'auto',
                     'maxHeight': '400px'
                 },
-                sort_action='native',
+                sort_action='custom',
+                sort_mode='single',
+                sort_by=[],
                 fixed_rows={'headers': True},
                 style_cell={'textAlign': 'left', 'padding': '8px', 'minWidth': '100px', 'width': '150px', 'maxWidth': '200px'},
                 style_header={'backgroundColor': '#f8fafc', 'fontWeight': 'bold', 'borderBottom': '2px solid #e2e8f0'},
@@ -114,14 +203,17 @@ app.layout = dbc.Container([
     
     # Hidden stores
     dcc.Store(id='project-folder', data=project_folder),
-    dcc.Loading(children=[dcc.Store(id='df', data=df_records)],
-        className='custom-spinner', type='default', fullscreen=True),
-    dcc.Store(id='df-columns', data=df.columns),
+    dcc.Store(id='df-columns', data=axes),
     dcc.Store(id='labels', data=labels),
     dcc.Store(id='parameters', data=parameters),
     dcc.Store(id='img-column', data=img_column),
     dcc.Store(id='active-filters', data={}),
-    dcc.Store(id='active-records', data=df_records),
+    dcc.Store(id='brush', data=None),
+    dcc.Store(id='brush-debounce', data=brush_debounce_ms),
+    dcc.Store(id='active-rows', data=None),
+    # the rows stay on the server, every loader sets the version of its data
+    dcc.Loading(children=[dcc.Store(id='dataset-version', data=dataset_version)],
+        className='custom-spinner', type='default', fullscreen=True),
     dcc.Store(id='uploaded-projects-store', data=[]),
     dcc.Store(id='parallel-coordinates-figure-highlight', data={}),
     dcc.Store(id='parallel-coordinates-figure', data=fig),
@@ -132,8 +224,9 @@ if __name__ == '__main__':
     # Find an available port
     port = find_free_port(8050)
     print_startup_banner(port=port)
-    # Run app using Flask development server
-    app.run(debug=False, host="127.0.0.1", port=port)
+    # Run app with waitress unless another server is configured
+    backend = 'waitress' if server_backend == 'auto' else server_backend
+    run(server, backend=backend, host="127.0.0.1", port=port)
 
 
 
@@ -0,0 +1,229 @@
+// Deep zoom viewer of the selected image, see deepzoom.py.
+//
+// The image is drawn from the tiles of the level that matches the zoom, and
+// only the tiles in view are requested. The whole image at a low level stays
+// below them while they load. Scroll to zoom, drag to pan, a click that is not
+// a drag is forwarded to the target element.
+(function () {
+    const viewers = {};
+
+    function parseDescriptor(text) {
+        const xml = new DOMParser().parseFromString(text, 'application/xml');
+        const image = xml.getElementsByTagName('Image')[0];
+        const size = xml.getElementsByTagName('Size')[0];
+        const width = parseInt(size.getAttribute('Width'));
+        const height = parseInt(size.getAttribute('Height'));
+        return {
+            format: image.getAttribute('Format'),
+            overlap: parseInt(image.getAttribute('Overlap')),
+            tileSize: parseInt(image.getAttribute('TileSize')),
+            width: width,
+            height: height,
+            maxLevel: Math.ceil(Math.log2(Math.max(width, height, 1)))
+        };
+    }
+
+    function Viewer(container) {
+        this.container = container;
+        this.tiles = {};
+        this.image = null;
+        this.token = 0;
+        this.drag = null;
+
+        container.addEventListener('wheel', event => {
+            if (!this.image) {
+                return;
+            }
+            event.preventDefault();
+            const rect = container.getBoundingClientRect();
+            this.zoomAt(event.clientX - rect.left, event.clientY - rect.top,
+                        Math.pow(2, -event.deltaY / 300));
+        }, {passive: false});
+        container.addEventListener('pointerdown', event => {
+            this.drag = {x: event.clientX, y: event.clientY, moved: false};
+            container.setPointerCapture(event.pointerId);
+        });
+        container.addEventListener('pointermove', event => {
+            const drag = this.drag;
+            if (!drag || !this.image) {
+                return;
+            }
+            const dx = event.clientX - drag.x;
+            const dy = event.clientY - drag.y;
+            if (!drag.moved && Math.abs(dx) + Math.abs(dy) < 4) {
+                return;
+            }
+            drag.moved = true;
+            drag.x = event.clientX;
+            drag.y = event.clientY;
+            this.x += dx;
+            this.y += dy;
+            this.render();
+        });
+        container.addEventListener('pointerup', () => {
+            const drag = this.drag;
+            this.drag = null;
+            if (drag && !drag.moved && this.target) {
+                const target = document.getElementById(this.target);
+                if (target) {
+                    target.click();
+                }
+            }
+        });
+        // fit again when the panel is resized, e.g. when it opens
+        new ResizeObserver(() => this.image && this.fit()).observe(container);
+    }
+
+    Viewer.prototype.open = function (url, target) {
+        const token = ++this.token;
+        this.target = target;
+        this.clear();
+        this.container.style.display = 'block';
+        return fetch(url).then(response => response.text()).then(text => {
+            if (token !== this.token) {
+                return;
+            }
+            this.image = parseDescriptor(text);
+            this.base = url.replace(/\.dzi$/, '_files/');
+            this.fit();
+        });
+    };
+
+    Viewer.prototype.close = function () {
+        this.token++;
+        this.clear();
+        this.container.style.display = 'none';
+    };
+
+    Viewer.prototype.clear = function () {
+        this.image = null;
+        this.scale = null;
+        this.tiles = {};
+        this.container.replaceChildren();
+    };
+
+    Viewer.prototype.fit = function () {
+        const image = this.image;
+        const width = this.container.clientWidth;
+        const height = this.container.clientHeight;
+        if (!width || !height) {
+            return;
+        }
+        this.minScale = Math.min(width / image.width, height / image.height);
+        this.scale = this.minScale;
+        this.x = (width - image.width * this.scale) / 2;
+        this.y = (height - image.height * this.scale) / 2;
+        this.render();
+    };
+
+    Viewer.prototype.zoomAt = function (x, y, factor) {
+        // at most 4 screen pixels per image pixel
+        const scale = Math.min(Math.max(this.scale * factor, this.minScale),
+                               Math.max(4 / window.devicePixelRatio,
+                                        this.minScale));
+        this.x = x - (x - this.x) * scale / this.scale;
+        this.y = y - (y - this.y) * scale / this.scale;
+        this.scale = scale;
+        this.render();
+    };
+
+    Viewer.prototype.levelTiles = function (level, visible) {
+        const image = this.image;
+        const tileSize = image.tileSize;
+        const overlap = image.overlap;
+        // image pixels per level pixel
+        const factor = Math.pow(2, image.maxLevel - level);
+        const levelWidth = Math.ceil(image.width / factor);
+        const levelHeight = Math.ceil(image.height / factor);
+        const size = tileSize * factor * this.scale;
+        const width = this.container.clientWidth;
+        const height = this.container.clientHeight;
+        let cols = [0, Math.ceil(levelWidth / tileSize) - 1];
+        let rows = [0, Math.ceil(levelHeight / tileSize) - 1];
+        if (visible) {
+            cols = [Math.max(cols[0], Math.floor(-this.x / size)),
+                    Math.min(cols[1], Math.floor((width - this.x) / size))];
+            rows = [Math.max(rows[0], Math.floor(-this.y / size)),
+                    Math.min(rows[1], Math.floor((height - this.y) / size))];
+        }
+        const tiles = [];
+        for (let col = cols[0]; col <= cols[1]; col++) {
+            for (let row = rows[0]; row <= rows[1]; row++) {
+                const left = Math.max(col * tileSize - overlap, 0);
+                const top = Math.max(row * tileSize - overlap, 0);
+                const right = Math.min((col + 1) * tileSize + overlap,
+                                       levelWidth);
+                const bottom = Math.min((row + 1) * tileSize + overlap,
+                                        levelHeight);
+                tiles.push({
+                    key: `${level}/${col}_${row}`,
+                    left: this.x + left * factor * this.scale,
+                    top: this.y + top * factor * this.scale,
+                    width: (right - left) * factor * this.scale,
+                    height: (bottom - top) * factor * this.scale
+                });
+            }
+        }
+        return tiles;
+    };
+
+    Viewer.prototype.render = function () {
+        const image = this.image;
+        if (!this.scale) {
+            return;
+        }
+        // the whole image fits in one tile below this level
+        const baseLevel = Math.min(
+            Math.floor(Math.log2(image.tileSize)), image.maxLevel);
+        const level = Math.min(Math.max(image.maxLevel + Math.ceil(
+            Math.log2(this.scale * window.devicePixelRatio)), baseLevel),
+                               image.maxLevel);
+        const tiles = this.levelTiles(baseLevel, false);
+        if (level !== baseLevel) {
+            tiles.push(...this.levelTiles(level, true));
+        }
+
+        const keep = {};
+        tiles.forEach(tile => {
+            let element = this.tiles[tile.key];
+            if (!element) {
+                element = document.createElement('img');
+                element.className = 'deepzoom-tile';
+                element.draggable = false;
+                element.src = `${this.base}${tile.key}.${image.format}`;
+                this.container.appendChild(element);
+            }
+            element.style.left = `${tile.left}px`;
+            element.style.top = `${tile.top}px`;
+            element.style.width = `${tile.width}px`;
+            element.style.height = `${tile.height}px`;
+            keep[tile.key] = element;
+        });
+        Object.keys(this.tiles).forEach(key => {
+            if (!keep[key]) {
+                this.tiles[key].remove();
+            }
+        });
+        this.tiles = keep;
+    };
+
+    window.designExplorerDeepZoom = {
+        show: function (id, url, target) {
+            const container = document.getElementById(id);
+            if (!container) {
+                return;
+            }
+            // the layout of a new project renders a new container
+            if (!viewers[id] || viewers[id].container !== container) {
+                viewers[id] = new Viewer(container);
+            }
+            const viewer = viewers[id];
+            return viewer.open(url, target);
+        },
+        hide: function (id) {
+            if (viewers[id]) {
+                viewers[id].close();
+            }
+        }
+    };
+})();
@@ -0,0 +1,77 @@
+"""Module to run slow computations outside of the callback that needs them.
+
+A callback submits a job with a key and returns at once. A dcc.Interval then
+calls it again until the result for the key is ready. The jobs run in a thread
+pool of the current process. When the poll lands on another process, the job
+is submitted there as well, so callers must pass everything the job needs.
+
+The thread pool is created by the first job of a process. A process forked
+from one that ran jobs, e.g. a gunicorn worker, starts with no pool and no
+jobs: the threads of the parent do not exist in the child.
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import background_workers
+from metrics import record_cache
+
+
+MAX_JOBS = 32
+
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_executor = None
+_pid = None
+
+
+def _reset():
+    global _lock, _executor, _pid
+    _lock = threading.Lock()
+    _jobs.clear()
+    _executor = _pid = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _pid
+    if _executor is None or _pid != os.getpid():
+        _jobs.clear()
+        _executor = ThreadPoolExecutor(
+            max_workers=background_workers,
+            thread_name_prefix='design-explorer')
+        _pid = os.getpid()
+    return _executor
+
+
+def submit(key, func, *args) -> Future:
+    """Run func(*args) in the background unless a job with key exists."""
+    with _lock:
+        executor = _get_executor()
+        future = _jobs.get(key)
+        if future is None:
+            future = _jobs[key] = executor.submit(func, *args)
+        _jobs.move_to_end(key)
+        # drop the oldest finished jobs, running jobs are kept
+        for old_key in list(_jobs):
+            if len(_jobs) <= MAX_JOBS:
+                break
+            if _jobs[old_key].done():
+                del _jobs[old_key]
+    return future
+
+
+def result(key, func, *args):
+    """Return the result of the job for key, or None while it is running.
+
+    The job is submitted if it does not exist. An exception raised by the job
+    is raised here."""
+    future = submit(key, func, *args)
+    record_cache('background', future.done())
+    if not future.done():
+        return None
+    return future.result()
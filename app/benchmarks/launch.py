@@ -0,0 +1,112 @@
+"""Measure the launch time of Design Explorer builds.
+
+Every command is started ``--repeat`` times. The time to the banner is the
+time until the port is printed, the time to the first page is the time until
+the home page answers with status 200. The process is stopped after each run.
+Without commands, ``python app.py`` from the source tree is measured.
+
+Run it from the app folder, after building both modes on the same machine:
+
+    python -m benchmarks.launch
+    python -m benchmarks.launch "../dist/Design Explorer" \\
+        "../dist/fast/Design Explorer/Design Explorer" --repeat 5
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+
+BANNER_URL = re.compile(r'http://127\.0\.0\.1:(\d+)/')
+POLL_SECONDS = 0.05
+
+
+def _read_port(process, found: threading.Event, port: list):
+    for line in process.stdout:
+        match = BANNER_URL.search(line)
+        if match and not found.is_set():
+            port.append(int(match.group(1)))
+            found.set()
+    found.set()
+
+
+def _stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def launch(command: list, timeout: float) -> dict:
+    """Start a command once and return the seconds to the banner and to the
+    first page."""
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL, text=True, errors='replace', env=env)
+    found, port = threading.Event(), []
+    threading.Thread(
+        target=_read_port, args=(process, found, port), daemon=True).start()
+    try:
+        if not found.wait(timeout) or not port:
+            raise RuntimeError(f'No banner from {command} in {timeout} s')
+        banner = time.perf_counter() - start
+        url = f'http://127.0.0.1:{port[0]}/'
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    if response.status == 200:
+                        return {'banner_seconds': banner,
+                                'page_seconds': time.perf_counter() - start}
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(POLL_SECONDS)
+        raise RuntimeError(f'{url} did not answer in {timeout} s')
+    finally:
+        _stop(process)
+
+
+def measure(command: list, repeat: int, timeout: float) -> dict:
+    runs = [launch(command, timeout) for _ in range(repeat)]
+    result = {'command': command}
+    for key in ('banner_seconds', 'page_seconds'):
+        values = [run[key] for run in runs]
+        result[key] = statistics.median(values)
+        result[key.replace('seconds', 'first')] = values[0]
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('commands', nargs='*',
+                        help='executables to launch, python app.py by default')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--save', help='write the results to a JSON file')
+    args = parser.parse_args(argv)
+
+    commands = [[c] for c in args.commands] or [
+        [sys.executable, str(Path(__file__).parent.parent.joinpath('app.py'))]]
+    results = [measure(c, args.repeat, args.timeout) for c in commands]
+
+    print(f'\n{"command":<48} {"banner s":>9} {"page s":>9} {"first page s":>13}')
+    for result in results:
+        name = ' '.join(result['command'])[-48:]
+        print(f'{name:<48} {result["banner_seconds"]:>9.2f} '
+              f'{result["page_seconds"]:>9.2f} {result["page_first"]:>13.2f}')
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,565 @@
+"""Headless multi-session load test for Design Explorer.
+
+Every virtual user behaves like a browser tab. It downloads the layout and the
+callback graph, keeps the value of every component property and replays a
+session by changing properties and firing the server callbacks that depend on
+them, the same way the Dash renderer does. The users run concurrently against
+the Flask test client or against a running server, and the latency of every
+_dash-update-component request is reported per callback.
+
+Run it from the app folder:
+
+    python -m benchmarks.loadtest --users 8 --sessions 3
+    python -m benchmarks.loadtest --users 16 --url http://127.0.0.1:8000
+"""
+import argparse
+import base64
+import http.client
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from config import static_path, upload_path
+from benchmarks.run import remove_projects, zip_project
+from benchmarks.synthetic import generate_project
+
+
+WILDCARDS = (['ALL'], ['MATCH'], ['ALLSMALLER'])
+MAX_CHAIN_DEPTH = 10
+
+
+class TestClientTransport:
+    """Send requests to the app in this process through the Flask test client."""
+
+    def __init__(self):
+        # importing app registers every callback and builds the Flask server
+        from app import server
+        self.client = server.test_client()
+
+    def request(self, method: str, path: str, body: bytes = None):
+        response = self.client.open(
+            path, method=method, data=body, content_type='application/json')
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+
+class HttpTransport:
+    """Send requests to a running server over a keep-alive connection."""
+
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.prefix = parsed.path.rstrip('/')
+        self.connection = http.client.HTTPConnection(
+            self.host, self.port, timeout=300)
+
+    def request(self, method: str, path: str, body: bytes = None):
+        headers = {'Content-Type': 'application/json'} if body else {}
+        for attempt in range(2):
+            try:
+                self.connection.request(
+                    method, self.prefix + path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # the server closed the keep-alive connection, open a new one
+                self.connection.close()
+                if attempt:
+                    raise
+
+
+class Recorder:
+    """Thread-safe collection of request latencies."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.bytes = defaultdict(int)
+        self.chains = defaultdict(list)
+
+    def add(self, name: str, seconds: float, status: int, size: int):
+        with self.lock:
+            self.samples[name].append(seconds)
+            self.bytes[name] += size
+            if status >= 400:
+                self.errors[name] += 1
+
+    def add_chain(self, name: str, seconds: float, round_trips: int,
+                  requests: int):
+        """Record a user action: its end-to-end time, the sequential round
+        trips of its callback chain and the requests it fired."""
+        with self.lock:
+            self.chains[name].append((seconds, round_trips, requests))
+
+    def chain_summary(self) -> dict:
+        summary = {}
+        for name, chains in sorted(self.chains.items()):
+            seconds, round_trips, requests = (np.asarray(c) for c in zip(*chains))
+            summary[name] = {
+                'count': len(chains),
+                'round_trips': float(round_trips.mean()),
+                'requests': float(requests.mean()),
+                'p50_ms': float(np.percentile(seconds * 1000, 50)),
+                'p95_ms': float(np.percentile(seconds * 1000, 95)),
+            }
+        return summary
+
+    def summary(self) -> dict:
+        summary = {}
+        for name, samples in sorted(self.samples.items()):
+            ms = np.asarray(samples) * 1000
+            summary[name] = {
+                'count': len(samples),
+                'errors': self.errors[name],
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'max_ms': float(ms.max()),
+                'mean_kib': self.bytes[name] / len(samples) / 1024,
+            }
+        return summary
+
+
+def parse_id(component_id):
+    if isinstance(component_id, str) and component_id.startswith('{'):
+        return json.loads(component_id)
+    return component_id
+
+
+def id_key(component_id) -> str:
+    """Return the string Dash uses for a component id."""
+    if isinstance(component_id, dict):
+        return json.dumps(component_id, sort_keys=True, separators=(',', ':'))
+    return component_id
+
+
+def id_matches(pattern, component_id) -> bool:
+    if not isinstance(pattern, dict):
+        return pattern == component_id
+    if not isinstance(component_id, dict) or pattern.keys() != component_id.keys():
+        return False
+    return all(value in WILDCARDS or value == component_id[key]
+               for key, value in pattern.items())
+
+
+def is_component(node) -> bool:
+    return isinstance(node, dict) and 'props' in node and 'type' in node \
+        and 'namespace' in node
+
+
+def apply_patch(value, patch: dict):
+    """Apply the operations of a Dash Patch to a value."""
+    for operation in patch['operations']:
+        location = operation['location']
+        params = operation['params']
+        name = operation['operation']
+        if not location:
+            parent, key = None, None
+            target = value
+        else:
+            parent = value
+            for step in location[:-1]:
+                parent = parent[step]
+            key = location[-1]
+            target = parent[key] if name != 'Assign' else None
+        if name == 'Assign':
+            if parent is None:
+                value = params['value']
+            else:
+                parent[key] = params['value']
+        elif name == 'Delete':
+            del parent[key]
+        elif name in ('Append', 'Extend', 'Prepend', 'Insert', 'Merge',
+                      'Clear', 'Reverse', 'Remove'):
+            if name == 'Append':
+                target.append(params['value'])
+            elif name == 'Extend':
+                target.extend(params['value'])
+            elif name == 'Prepend':
+                target.insert(0, params['value'])
+            elif name == 'Insert':
+                target.insert(params['index'], params['value'])
+            elif name == 'Merge':
+                target.update(params['value'])
+            elif name == 'Clear':
+                target.clear()
+            elif name == 'Reverse':
+                target.reverse()
+            elif name == 'Remove':
+                target.remove(params['value'])
+    return value
+
+
+class Callback:
+    """A server callback from _dash-dependencies."""
+
+    def __init__(self, spec: dict):
+        self.output = spec['output']
+        outputs = self.output
+        self.multi = outputs.startswith('..')
+        if self.multi:
+            outputs = outputs[2:-2].split('...')
+        else:
+            outputs = [outputs]
+        self.outputs = []
+        for output in outputs:
+            component_id, _, prop = output.partition('@')[0].rpartition('.')
+            self.outputs.append((parse_id(component_id), prop))
+        self.inputs = [(parse_id(i['id']), i['property']) for i in spec['inputs']]
+        self.state = [(parse_id(s['id']), s['property']) for s in spec['state']]
+        self.clientside = spec.get('clientside_function') is not None
+        first_id, first_prop = self.outputs[0]
+        self.name = f'{id_key(first_id)}.{first_prop}'
+        if len(self.outputs) > 1:
+            self.name += f' (+{len(self.outputs) - 1})'
+
+    def triggered_by(self, component_id, prop) -> bool:
+        return any(p == prop and id_matches(i, component_id)
+                   for i, p in self.inputs)
+
+
+class Session:
+    """The component state of one browser tab."""
+
+    def __init__(self, transport, recorder: Recorder, rng: random.Random,
+                 fetch_images: int = 0):
+        self.transport = transport
+        self.recorder = recorder
+        self.rng = rng
+        self.fetch_images = fetch_images
+        self.props = {}
+        self.ids = {}
+        self.descendants = defaultdict(set)
+        self.ancestors = {}
+        self.callbacks = []
+        self.brush_session = f'{rng.getrandbits(64):x}'
+        self.brush_seq = 0
+        self.brush_ranges = {}
+
+    def start(self):
+        status, layout = self.transport.request('GET', '/_dash-layout')
+        self.walk(json.loads(layout), [])
+        status, dependencies = self.transport.request(
+            'GET', '/_dash-dependencies')
+        self.callbacks = [Callback(spec) for spec in json.loads(dependencies)]
+
+    # component tree
+    def walk(self, node, owners: list):
+        if isinstance(node, list):
+            for child in node:
+                self.walk(child, owners)
+            return
+        if not is_component(node):
+            return
+        props = node['props']
+        if 'id' in props:
+            key = id_key(props['id'])
+            self.ids[key] = props['id']
+            self.ancestors[key] = list(owners)
+            for owner in owners:
+                self.descendants[owner].add(key)
+            for prop, value in props.items():
+                if prop != 'id':
+                    self.props[(key, prop)] = value
+            owners = owners + [key]
+        self.walk(props.get('children'), owners)
+
+    def replace_children(self, key: str, children):
+        for child in self.descendants.pop(key, set()):
+            self.ids.pop(child, None)
+            for owner in self.ancestors.pop(child, []):
+                if owner != key:
+                    self.descendants[owner].discard(child)
+            self.descendants.pop(child, None)
+        self.props = {k: v for k, v in self.props.items()
+                      if k[0] in self.ids or k[0] == key}
+        self.walk(children, self.ancestors.get(key, []) + [key])
+
+    def set_prop(self, key: str, prop: str, value):
+        self.props[(key, prop)] = value
+        if prop == 'children':
+            self.replace_children(key, value)
+
+    def get(self, component_id, prop):
+        return self.props.get((id_key(component_id), prop))
+
+    # callbacks
+    def resolve(self, specs, with_value=True):
+        resolved = []
+        for component_id, prop in specs:
+            matches = [self.ids[key] for key in self.ids
+                       if id_matches(component_id, self.ids[key])]
+            items = []
+            for match in matches:
+                item = {'id': match, 'property': prop}
+                if with_value:
+                    item['value'] = self.props.get((id_key(match), prop))
+                items.append(item)
+            if isinstance(component_id, dict):
+                resolved.append(items)
+            elif items:
+                resolved.append(items[0])
+            else:
+                item = {'id': component_id, 'property': prop}
+                if with_value:
+                    item['value'] = None
+                resolved.append(item)
+        return resolved
+
+    def fire(self, callback: Callback, changed: list) -> list:
+        outputs = self.resolve(callback.outputs, with_value=False)
+        payload = {
+            'output': callback.output,
+            'outputs': outputs if callback.multi else outputs[0],
+            'inputs': self.resolve(callback.inputs),
+            'state': self.resolve(callback.state),
+            'changedPropIds': changed,
+        }
+        body = json.dumps(payload).encode()
+        start = time.perf_counter()
+        status, data = self.transport.request(
+            'POST', '/_dash-update-component', body)
+        self.recorder.add(callback.name, time.perf_counter() - start, status,
+                          len(data))
+        if status != 200:
+            return []
+
+        updated = []
+        response = json.loads(data).get('response', {})
+        for key, props in response.items():
+            for prop, value in props.items():
+                if isinstance(value, dict) and '__dash_patch_update' in value:
+                    value = apply_patch(self.props.get((key, prop)), value)
+                self.set_prop(key, prop, value)
+                updated.append((key, prop))
+        if self.fetch_images and any(p == 'children' and k == 'images-grid'
+                                     for k, p in updated):
+            self.load_grid_images()
+        return updated
+
+    def change(self, component_id, prop, value, chain: str = None):
+        """Set a property like the user would and run the callback chain.
+
+        The callbacks fired by the same changes are sent together, so every
+        step of the chain is one round trip. With a chain name, the end-to-end
+        time, round trips and requests are recorded under it."""
+        key = id_key(component_id)
+        self.set_prop(key, prop, value)
+        # (component key, prop, output of the callback that changed it)
+        changed = [(key, prop, None)]
+        start = time.perf_counter()
+        round_trips = requests = 0
+        for _ in range(MAX_CHAIN_DEPTH):
+            if not changed:
+                break
+            triggered = {}
+            for callback in self.callbacks:
+                if callback.clientside:
+                    continue
+                # like the renderer, a callback is not fired by its own outputs
+                ids = [f'{k}.{p}' for k, p, source in changed
+                       if source != callback.output
+                       and callback.triggered_by(self.ids.get(k, k), p)]
+                if ids:
+                    triggered[callback.output] = (callback, ids)
+            changed = []
+            round_trips += bool(triggered)
+            requests += len(triggered)
+            for callback, ids in triggered.values():
+                changed.extend(
+                    (k, p, callback.output) for k, p in self.fire(callback, ids))
+        if chain:
+            self.recorder.add_chain(
+                chain, time.perf_counter() - start, round_trips, requests)
+
+    def brush(self, index: int, ranges, chain: str = None):
+        """Brush a dimension of the plot like the debounced clientside
+        callback, which sends the ranges of every dimension."""
+        self.brush_seq += 1
+        self.brush_ranges[index] = ranges
+        dimensions = len(self.get('df-columns', 'data') or [])
+        self.change('brush', 'data', {
+            'session': self.brush_session, 'seq': self.brush_seq,
+            'ranges': {i: self.brush_ranges.get(i) for i in range(dimensions)},
+        }, chain=chain)
+
+    def click(self, component_id, prop='n_clicks', chain: str = None):
+        self.change(component_id, prop, (self.get(component_id, prop) or 0) + 1,
+                    chain=chain)
+
+    def load_grid_images(self):
+        images = [self.props.get((key, 'src')) for key, component_id
+                  in self.ids.items()
+                  if isinstance(component_id, dict) and 'image' in component_id]
+        for src in images[:self.fetch_images]:
+            if not src:
+                continue
+            start = time.perf_counter()
+            status, data = self.transport.request(
+                'GET', '/' + src.lstrip('/'))
+            self.recorder.add('GET image', time.perf_counter() - start, status,
+                              len(data))
+
+
+def dimension_values(dimension: dict):
+    """Return the values of a dimension of the parallel coordinates figure,
+    plotly sends numeric arrays as base64 typed arrays."""
+    values = dimension.get('values') or []
+    if isinstance(values, dict):
+        return np.frombuffer(base64.b64decode(values['bdata']),
+                             dtype=values['dtype'])
+    return np.asarray(values)
+
+
+def run_session(session: Session, contents: str, filename: str, brushes: int):
+    """Replay a realistic session: load, brush, color, sort and click images."""
+    rng = session.rng
+    session.props[('upload-data-component', 'filename')] = filename
+    session.change('upload-data-component', 'contents', contents)
+
+    df_columns = session.get('df-columns', 'data') or []
+    # the rows stay on the server, the ranges come from the plot
+    figure = session.get('parallel-coordinates', 'figure') or {}
+    dimensions = figure['data'][0]['dimensions'] if figure.get('data') else []
+    numeric = [i for i, col in enumerate(df_columns)
+               if not col.startswith('img:') and i < len(dimensions)]
+    for _ in range(brushes if numeric else 0):
+        index = rng.choice(numeric)
+        values = dimension_values(dimensions[index])
+        low, high = float(values.min()), float(values.max())
+        a, b = sorted(rng.uniform(low, high) for _ in range(2))
+        session.brush(index, [[a, b]], chain='brush')
+
+    schemes = [key for key, cid in session.ids.items()
+               if isinstance(cid, dict) and 'color_scheme' in cid]
+    if schemes:
+        session.click(session.ids[rng.choice(schemes)])
+
+    sort_items = [key for key, cid in session.ids.items()
+                  if isinstance(cid, dict) and 'sort_by_dropdown' in cid]
+    if sort_items:
+        session.click(session.ids[rng.choice(sort_items)], chain='sort by')
+    session.click('button-ascending', chain='sort direction')
+
+    for _ in range(2):
+        images = [key for key, cid in session.ids.items()
+                  if isinstance(cid, dict) and 'image' in cid]
+        if not images:
+            break
+        session.click(session.ids[rng.choice(images)])
+    if session.get('selected-image-data', 'data'):
+        session.click('selected-image')
+
+    # clear the brushes
+    for index in numeric:
+        session.brush(index, None)
+
+
+def print_chains(chains: dict):
+    print(f'\n{"user action":<48} {"count":>6} {"trips":>6} {"requests":>9} '
+          f'{"p50 ms":>9} {"p95 ms":>9}')
+    for name, row in chains.items():
+        print(f'{name:<48} {row["count"]:>6} {row["round_trips"]:>6.1f} '
+              f'{row["requests"]:>9.1f} {row["p50_ms"]:>9.1f} '
+              f'{row["p95_ms"]:>9.1f}')
+
+
+def print_summary(summary: dict, wall: float):
+    print(f'\n{"callback":<48} {"count":>6} {"err":>4} {"p50 ms":>9} '
+          f'{"p95 ms":>9} {"p99 ms":>9} {"max ms":>9} {"KiB":>8}')
+    total = 0
+    for name, row in summary.items():
+        total += row['count']
+        label = name if len(name) <= 48 else name[:45] + '...'
+        print(f'{label:<48} {row["count"]:>6} {row["errors"]:>4} '
+              f'{row["p50_ms"]:>9.1f} {row["p95_ms"]:>9.1f} '
+              f'{row["p99_ms"]:>9.1f} {row["max_ms"]:>9.1f} '
+              f'{row["mean_kib"]:>8.1f}')
+    print(f'\n{total} requests in {wall:.1f} s ({total / wall:.1f} req/s)')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--url', help='base URL of a running server; the '
+                        'Flask test client is used when omitted')
+    parser.add_argument('--users', type=int, default=4,
+                        help='number of concurrent virtual users')
+    parser.add_argument('--sessions', type=int, default=2,
+                        help='sessions replayed by every user')
+    parser.add_argument('--brushes', type=int, default=3,
+                        help='axes brushed in every session')
+    parser.add_argument('--fetch-images', type=int, default=0,
+                        help='grid images downloaded after every grid update')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--images', type=int, default=50)
+    parser.add_argument('--resolution', type=int, default=128)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', help='write the summary to a JSON file')
+    args = parser.parse_args(argv)
+
+    static_created = not static_path.exists()
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp, 'loadtest')
+        generate_project(folder, rows=args.rows, images=args.images,
+                         resolution=args.resolution, seed=args.seed)
+        contents = zip_project(folder)
+
+    recorder = Recorder()
+
+    def virtual_user(index: int):
+        if args.url:
+            transport = HttpTransport(args.url)
+        else:
+            transport = TestClientTransport()
+        session = Session(transport, recorder, random.Random(args.seed + index),
+                          args.fetch_images)
+        session.start()
+        for _ in range(args.sessions):
+            run_session(session, contents, f'loadtest-user{index}.zip',
+                        args.brushes)
+
+    if not args.url:
+        # import the app once before the users start
+        TestClientTransport()
+
+    print(f'Running {args.users} users x {args.sessions} sessions on '
+          f'{args.rows} rows ({args.url or "Flask test client"})')
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            for future in [executor.submit(virtual_user, i)
+                           for i in range(args.users)]:
+                future.result()
+    finally:
+        if not args.url:
+            remove_projects(
+                [upload_path.joinpath(f'loadtest-user{index}')
+                 for index in range(args.users)], static_created)
+    wall = time.perf_counter() - start
+
+    summary = recorder.summary()
+    chains = recorder.chain_summary()
+    print_summary(summary, wall)
+    print_chains(chains)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'config': vars(args), 'wall_seconds': wall,
+                       'callbacks': summary, 'chains': chains}, f, indent=2)
+        print(f'Summary written to {args.save}')
+    return 1 if any(row['errors'] for row in summary.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
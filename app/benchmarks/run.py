@@ -0,0 +1,410 @@
+"""Benchmark the hot paths of Design Explorer on a synthetic project.
+
+The callbacks are called directly, without a browser, on a project generated
+by ``benchmarks.synthetic``. The image route is requested through the Flask
+test client. For every case the median latency, the peak traced memory and the
+size of the JSON payload Dash would send back are reported.
+
+``process_upload`` extracts an archive with different bytes on every call,
+``process_upload_dedup`` uploads an archive that was extracted before. The
+generated projects, their blobs and dataset pointers are removed afterwards,
+and the static folder too when the benchmark created it.
+
+Run it from the app folder:
+
+    python -m benchmarks.run --rows 10000 --images 200
+    python -m benchmarks.run --rows 10000 --images 200 --save baseline.json
+    python -m benchmarks.run --rows 10000 --images 200 --compare baseline.json
+    python -m benchmarks.run --rows 10000 --images 200 --encoding
+"""
+import argparse
+import base64
+import gzip
+import io
+import json
+import shutil
+import statistics
+import sys
+import time
+import tracemalloc
+import zipfile
+from contextlib import contextmanager
+
+import pandas as pd
+import plotly.express as px
+from dash._callback_context import context_value
+from dash._utils import AttributeDict, to_json
+
+import blobs
+from config import blob_path, max_axes, static_path, upload_path
+from datasets import get_dataset, register, remove_sources
+from helper import default_axes, process_dataframe
+from neighbors import NeighborIndex
+from pareto import front_levels, non_dominated, objective_values
+import serialization
+from benchmarks.synthetic import generate_project
+
+
+PROJECT_ID = 'benchmark-synthetic'
+
+
+@contextmanager
+def triggered(prop_id: str):
+    """Fake the callback context so ctx.triggered_id works outside a request."""
+    token = context_value.set(AttributeDict(
+        triggered_inputs=[{'prop_id': prop_id, 'value': 1}]))
+    try:
+        yield
+    finally:
+        context_value.reset(token)
+
+
+def payload_size(result) -> int:
+    """Return the size of the JSON Dash would send for a callback result."""
+    if isinstance(result, bytes):
+        return len(result)
+    if isinstance(result, tuple):
+        result = list(result)
+    return len(to_json(result))
+
+
+def _timed(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure_encoding(result, repeat: int) -> dict:
+    """Compare plotly's encoder with serialization.to_json and the size of
+    the payload once compressed with gzip and brotli."""
+    if isinstance(result, tuple):
+        result = list(result)
+    encoded = serialization.to_json(result).encode()
+    encoding = {
+        'encode_plotly_seconds': _timed(
+            lambda: serialization._plotly_to_json(result), repeat),
+        'encode_seconds': _timed(
+            lambda: serialization.to_json(result), repeat),
+        'gzip_bytes': len(gzip.compress(encoded, 6)),
+        'br_bytes': None,
+    }
+    try:
+        import brotli
+        encoding['br_bytes'] = len(brotli.compress(encoded, quality=4))
+    except ImportError:
+        pass
+    return encoding
+
+
+def measure(func, repeat: int, payload: bool = True,
+            encoding: bool = False) -> dict:
+    """Run func repeat times and return latency, peak memory and payload."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    measured = {
+        'seconds': statistics.median(timings),
+        'min_seconds': min(timings),
+        'peak_bytes': peak,
+        'payload_bytes': payload_size(result) if payload else None,
+    }
+    if encoding and payload and not isinstance(result, bytes):
+        measured.update(measure_encoding(result, repeat))
+    return measured
+
+
+def project_state(csv_file):
+    """Recreate the stores the browser holds after a project is loaded."""
+    df = pd.read_csv(csv_file)
+    labels, parameters, input_columns, output_columns, image_columns = \
+        process_dataframe(df)
+    color_by = output_columns[0] if output_columns else input_columns[0]
+    axes = default_axes(input_columns, output_columns, max_axes)
+    fig = px.parallel_coordinates(
+        df, dimensions=axes, color=color_by, labels=labels)
+    filters = {}
+    if input_columns:
+        low, high = df[input_columns[0]].quantile([0.25, 0.75])
+        filters[input_columns[0]] = [[float(low), float(high)]]
+    if output_columns:
+        q = df[output_columns[0]].quantile([0.0, 0.3, 0.5, 0.9]).tolist()
+        filters[output_columns[0]] = [[[q[0], q[1]], [q[2], q[3]]]]
+    return {
+        'df': df,
+        'dataset_version': register(df),
+        'objectives': tuple((column, 'min') for column in output_columns),
+        'labels': labels,
+        'axes': axes,
+        'color_by': color_by,
+        'img_column': image_columns[0] if image_columns else None,
+        'figure': fig.to_dict(),
+        'filters': filters,
+    }
+
+
+def build_cases(csv_file, folder, repeat: int) -> dict:
+    """Return a dictionary of case name to (function, payload)."""
+    # importing app registers every callback and builds the Flask server
+    from app import server
+    from callbacks.color import update_color_scheme
+    from callbacks.image import update_images_grid, \
+        update_images_grid_direction
+    from callbacks.records import update_selection
+    from callbacks.table import update_table_data
+    from callbacks.upload import load_uploaded_project_data, process_upload
+
+    state = project_state(csv_file)
+    version = state['dataset_version']
+
+    project_folder = f'uploaded/{PROJECT_ID}'
+
+    table_columns = [{'id': column} for column in state['axes']]
+    sort_by = [{'column_id': state['color_by'], 'direction': 'desc'}]
+
+    def selection_case(images_only=()):
+        with triggered('active-filters.data'):
+            return update_selection(
+                None, state['filters'], 'off', [], list(images_only), None,
+                state['axes'], version, state['img_column'], project_folder,
+                0, 100, sort_by, table_columns, state['color_by'],
+                state['color_by'], False, 'Original', None, 'all', None)
+
+    active_rows = selection_case()[1]
+    client = server.test_client()
+
+    # measure calls a case repeat + 1 times, an archive each for the cold case
+    cold_archives = iter([zip_project(folder, f'{i}'.encode())
+                          for i in range(repeat + 1)])
+    dedup_archive = zip_project(folder, b'dedup')
+    process_upload(dedup_archive, f'{PROJECT_ID}-dedup.zip', [])
+
+    def color_scheme():
+        with triggered('{"color_scheme":"Nuanced"}.n_clicks'):
+            return update_color_scheme(
+                [1], version, state['color_by'], state['labels'],
+                state['axes'], state['figure'])
+
+    def images_grid(grid_mode):
+        return update_images_grid(
+            state['color_by'], state['color_by'], False, 'Original', grid_mode,
+            None, active_rows, state['img_column'], project_folder, None, 'off',
+            [], version)
+
+    def sort_toggle():
+        return update_images_grid_direction(
+            True, state['color_by'], 'off', [], state['color_by'], 'Original',
+            'all', None, active_rows, state['img_column'], project_folder,
+            None, version)
+
+    def table_case():
+        with triggered('table.page_current'):
+            return update_table_data(
+                version, 1, 100, sort_by, table_columns, active_rows)
+
+    def image_route():
+        image = state['df'][state['img_column']].iat[0]
+        response = client.get(f'/uploaded/{PROJECT_ID}/{image}')
+        data = response.get_data()
+        response.close()
+        return data
+
+    cases = {
+        'process_dataframe': (
+            lambda: process_dataframe(state['df']), False),
+        'load_uploaded_project_data': (
+            lambda: load_uploaded_project_data(PROJECT_ID), True),
+        'process_upload': (
+            lambda: process_upload(
+                next(cold_archives), f'{PROJECT_ID}-upload.zip', []),
+            True),
+        'process_upload_dedup': (
+            lambda: process_upload(
+                dedup_archive, f'{PROJECT_ID}-dedup.zip', []),
+            True),
+        'update_selection': (selection_case, True),
+        'images_available_only': (
+            lambda: selection_case(['on']), True),
+        'update_images_grid': (lambda: images_grid('all'), True),
+        'images_grid_representatives': (
+            lambda: images_grid('representatives'), True),
+        'images_grid_sort_toggle': (sort_toggle, True),
+        'update_color_scheme': (color_scheme, True),
+        'update_table_data': (table_case, True),
+    }
+    if state['objectives']:
+        values = objective_values(state['df'], state['objectives'])
+        cases['pareto_front'] = (lambda: non_dominated(values), False)
+        cases['pareto_levels'] = (lambda: front_levels(values), False)
+    index = NeighborIndex(get_dataset(version).df)
+    cases['neighbor_index'] = (
+        lambda: NeighborIndex(get_dataset(version).df), False)
+    cases['neighbor_query'] = (lambda: index.query(len(state['df']) // 2), False)
+    if state['img_column']:
+        cases['serve_uploaded'] = (image_route, True)
+    return cases
+
+
+def zip_project(folder, comment: bytes = b'') -> str:
+    """Zip a project folder and return it as a dcc.Upload contents string.
+
+    Archives with different comments have different bytes, so they are not
+    deduplicated by process_upload."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as zf:
+        zf.comment = comment
+        for path in sorted(folder.iterdir()):
+            zf.write(path, path.name)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:application/zip;base64,{encoded}'
+
+
+def remove_projects(folders, static_created: bool):
+    """Remove generated projects with their dataset pointers and the blobs
+    only they linked to, and the static folder if it was created."""
+    for folder in folders:
+        shutil.rmtree(folder, ignore_errors=True)
+        remove_sources(folder)
+    blobs.remove_orphans()
+    if static_created:
+        shutil.rmtree(static_path, ignore_errors=True)
+        return
+    # the folders emptied by the removal
+    for folder in [*blob_path.glob('*'), blob_path, upload_path]:
+        try:
+            folder.rmdir()
+        except OSError:
+            pass
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print the ratio to the baseline and return the regressed metrics."""
+    regressions = []
+    print('\nComparison with baseline (current / baseline):')
+    for name, current in results['cases'].items():
+        base = baseline['cases'].get(name)
+        if base is None:
+            print(f'  {name:<28} not in baseline')
+            continue
+        ratios = []
+        for key in ('seconds', 'peak_bytes', 'payload_bytes'):
+            if not base.get(key) or current.get(key) is None:
+                continue
+            ratio = current[key] / base[key]
+            ratios.append(f'{key}={ratio:.2f}x')
+            if ratio > tolerance:
+                regressions.append((name, key, ratio))
+        print(f'  {name:<28} ' + '  '.join(ratios))
+    return regressions
+
+
+def print_results(results: dict):
+    print(f'\n{"case":<28} {"median ms":>10} {"min ms":>10} '
+          f'{"peak MiB":>10} {"payload KiB":>12}')
+    for name, case in results['cases'].items():
+        payload = case['payload_bytes']
+        payload = f'{payload / 1024:.1f}' if payload is not None else '-'
+        print(f'{name:<28} {case["seconds"] * 1000:>10.2f} '
+              f'{case["min_seconds"] * 1000:>10.2f} '
+              f'{case["peak_bytes"] / 2 ** 20:>10.2f} {payload:>12}')
+
+    encoded = {name: case for name, case in results['cases'].items()
+               if 'encode_seconds' in case}
+    if not encoded:
+        return
+    print(f'\n{"case":<28} {"plotly ms":>10} {"orjson ms":>10} '
+          f'{"raw KiB":>10} {"gzip KiB":>10} {"br KiB":>10}')
+    for name, case in encoded.items():
+        br = case['br_bytes']
+        br = f'{br / 1024:.1f}' if br is not None else '-'
+        print(f'{name:<28} {case["encode_plotly_seconds"] * 1000:>10.2f} '
+              f'{case["encode_seconds"] * 1000:>10.2f} '
+              f'{case["payload_bytes"] / 1024:>10.1f} '
+              f'{case["gzip_bytes"] / 1024:>10.1f} {br:>10}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--inputs', type=int, default=4)
+    parser.add_argument('--outputs', type=int, default=3)
+    parser.add_argument('--images', type=int, default=100,
+                        help='number of distinct images, 0 for no img: column')
+    parser.add_argument('--resolution', type=int, default=256,
+                        help='width and height of the generated images')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='*', help='run only these cases')
+    parser.add_argument('--encoding', action='store_true',
+                        help='report encode time and compressed payload size')
+    parser.add_argument('--save', help='write the results to a JSON file')
+    parser.add_argument('--compare', help='compare with a saved JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25,
+                        help='ratio above which a metric counts as a regression')
+    parser.add_argument('--keep', action='store_true',
+                        help='keep the generated projects in static/uploaded')
+    args = parser.parse_args(argv)
+
+    static_created = not static_path.exists()
+    folder = upload_path.joinpath(PROJECT_ID)
+    if folder.exists():
+        shutil.rmtree(folder)
+    print(f'Generating {args.rows} rows with {args.images} images '
+          f'({args.resolution}px) in {folder}')
+    csv_file = generate_project(
+        folder, rows=args.rows, inputs=args.inputs, outputs=args.outputs,
+        images=args.images, resolution=args.resolution, seed=args.seed)
+
+    results = {
+        'config': {key: getattr(args, key) for key in
+                   ('rows', 'inputs', 'outputs', 'images', 'resolution')},
+        'cases': {},
+    }
+    try:
+        cases = build_cases(csv_file, folder, args.repeat)
+        for name, (func, payload) in cases.items():
+            if args.only and name not in args.only:
+                continue
+            results['cases'][name] = measure(
+                func, args.repeat, payload, args.encoding)
+    finally:
+        if not args.keep:
+            remove_projects(
+                [upload_path.joinpath(f'{PROJECT_ID}{suffix}')
+                 for suffix in ('', '-upload', '-dedup')], static_created)
+
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nResults written to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != results['config']:
+            print('Warning: the baseline was recorded with a different '
+                  f'configuration: {baseline.get("config")}')
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\nRegressions:')
+            for name, key, ratio in regressions:
+                print(f'  {name} {key} is {ratio:.2f}x the baseline')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
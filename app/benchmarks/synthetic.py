@@ -0,0 +1,76 @@
+"""Module to generate synthetic design-space projects for benchmarks.
+
+The projects follow the same convention as the samples: a data.csv file with
+``in:``, ``out:`` and ``img:`` columns next to the images it references.
+"""
+import struct
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def write_png(path: Path, width: int, height: int, seed: int = 0):
+    """Write an RGB gradient PNG without any imaging library."""
+    rng = np.random.default_rng(seed)
+    start, end = rng.integers(0, 256, size=(2, 3))
+    ramp = np.linspace(0, 1, width, dtype=np.float32)[:, None]
+    row = (start + (end - start) * ramp).astype(np.uint8)
+    pixels = np.repeat(row[None, :, :], height, axis=0)
+    # every scanline starts with filter type 0
+    raw = np.concatenate(
+        [np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)],
+        axis=1).tobytes()
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + \
+            struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    png = b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + \
+        chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b'')
+    path.write_bytes(png)
+
+
+def generate_dataframe(
+        rows: int = 1000, inputs: int = 4, outputs: int = 3, images: int = 0,
+        seed: int = 0) -> pd.DataFrame:
+    """Create a DataFrame with in:/out: columns and an optional img: column.
+
+    Outputs are noisy linear combinations of the inputs so that sorting,
+    coloring and filtering behave like they do on real studies. When images is
+    smaller than rows the image names are reused in a round-robin fashion."""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(inputs):
+        data[f'in:param_{i}'] = np.round(rng.uniform(0, 10, rows), 3)
+    x = np.column_stack(list(data.values())) if inputs else np.zeros((rows, 1))
+    for j in range(outputs):
+        weights = rng.normal(size=x.shape[1])
+        noise = rng.normal(scale=0.5, size=rows)
+        data[f'out:metric_{j}'] = np.round(x @ weights + noise, 4)
+    if images:
+        data['img:Perspective'] = [
+            image_name(k % images) for k in range(rows)]
+    return pd.DataFrame(data)
+
+
+def image_name(index: int) -> str:
+    return f'design_{index:06d}.png'
+
+
+def generate_project(
+        folder: Path, rows: int = 1000, inputs: int = 4, outputs: int = 3,
+        images: int = 0, resolution: int = 256, seed: int = 0) -> Path:
+    """Write a synthetic project to folder and return the path to data.csv."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    df = generate_dataframe(rows, inputs, outputs, images, seed)
+    for k in range(images):
+        write_png(folder.joinpath(image_name(k)), resolution, resolution,
+                  seed=seed + k)
+    csv_file = folder.joinpath('data.csv')
+    df.to_csv(csv_file, index=False)
+    return csv_file
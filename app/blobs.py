@@ -0,0 +1,130 @@
+"""Module to store identical image files of the projects once.
+
+Every image file of an extracted project is hashed and replaced by a hardlink
+to ``blob_path/<hash[:2]>/<hash>``, so the image routes keep serving the same
+paths while a render shared by several projects uses the disk once. A blob
+with a single link is not used by any project anymore and is removed by
+``remove_orphans``.
+
+Hardlinks need the blob store and the projects on the same filesystem. A file
+that can not be linked is kept as it is. The files are hashed and linked by
+``image_check_threads`` threads, hashlib releases the GIL while it hashes.
+
+A stored image shares its inode with the blob and every other project linking
+it, so the file of a project is never opened for writing: ``write_file``
+writes a new file and replaces the link, and a project folder is removed
+before an archive is extracted into it again.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from config import blob_path, image_check_threads
+
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.svg'}
+READ_BYTES = 1 << 20
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _blob(digest: str) -> Path:
+    return blob_path.joinpath(digest[:2], digest)
+
+
+def store_file(path: Path, digest: str = None) -> bool:
+    """Replace a file by a hardlink to its blob, return False if it can not be
+    linked."""
+    blob = _blob(digest or file_hash(path))
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    for _ in range(2):
+        try:
+            if os.path.samefile(blob, path):
+                return True
+            temp = path.with_name(f'.{path.name}.link')
+            temp.unlink(missing_ok=True)
+            os.link(blob, temp)
+            os.replace(temp, path)
+            return True
+        except FileNotFoundError:
+            pass
+        except OSError:
+            return False
+        # first copy of this content, or the blob was just removed as orphan
+        try:
+            os.link(path, blob)
+            return True
+        except FileExistsError:
+            # linked by another process meanwhile, link to its blob
+            continue
+        except OSError:
+            return False
+    return False
+
+
+def write_file(path: Path, data: bytes):
+    """Write a file of a project without writing through a link to a blob."""
+    temp = path.with_name(f'.{path.name}.{os.getpid()}.write')
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+
+def _store_chunk(paths) -> list:
+    digests = []
+    for path in paths:
+        digest = file_hash(path)
+        store_file(path, digest)
+        digests.append((path, digest))
+    return digests
+
+
+def store_files(paths) -> dict:
+    """Store image files as blobs, return the content hash of every file."""
+    paths = list(paths)
+    threads = max(image_check_threads, 1)
+    # a task per chunk of files rather than per file, fewer futures
+    size = max(len(paths) // (threads * 4), 1)
+    chunks = [paths[i:i + size] for i in range(0, len(paths), size)]
+    digests = {}
+    with ThreadPoolExecutor(threads) as executor:
+        for chunk in executor.map(_store_chunk, chunks):
+            digests.update(chunk)
+    return digests
+
+
+def store_images(folder: Path) -> dict:
+    """Store the image files below a folder as blobs, return the content hash
+    of every image file."""
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            path = Path(root, name)
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                paths.append(path)
+    return store_files(paths)
+
+
+def remove_orphans() -> int:
+    """Remove the blobs that are not linked from a project anymore."""
+    removed = 0
+    if not blob_path.exists():
+        return removed
+    for blob in blob_path.glob('*/*'):
+        try:
+            if blob.stat().st_nlink == 1:
+                blob.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
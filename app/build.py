@@ -1,9 +1,11 @@
+import argparse
 import os
-import sys
 import shutil
+from pathlib import Path
 import PyInstaller.__main__
 
 # Config
+APP_NAME = "Design Explorer"
 ENTRY_FILE = "app/app.py"
 
 DATA_DIRS = [
@@ -12,37 +14,90 @@ DATA_DIRS = [
     ("app/callbacks", "callbacks"),
 ]
 
-def clean_build_folders():
-    """Remove PyInstaller build directories."""
-    for folder in ["build", "dist"]:
-        if os.path.exists(folder):
+# Modules pulled in by the hooks of optional dependencies, never imported by
+# the app. Excluding them keeps them out of the fast launch build.
+EXCLUDED_MODULES = [
+    "tkinter", "matplotlib", "IPython", "jupyter_client", "notebook",
+    "pytest", "PyQt5", "PyQt6", "PySide2", "PySide6", "sphinx", "docutils",
+]
+
+# Output folders of every mode, relative to the repository root
+DIST_PATHS = {
+    "onefile": "dist",
+    "fast": "dist/fast",
+}
+
+
+def clean_build_folders(mode):
+    """Remove the PyInstaller build directory and the output of a mode."""
+    work = os.path.join("build", mode)
+    output = os.path.join(DIST_PATHS[mode], APP_NAME)
+    for folder in [work, output, output + ".exe"]:
+        if os.path.isdir(folder):
             shutil.rmtree(folder)
             print(f"Removed folder: {folder}")
+        elif os.path.isfile(folder):
+            os.remove(folder)
+            print(f"Removed file: {folder}")
+
+
+def add_data(cmd, src, target):
+    cmd.append("--add-data")
+    # Format: source_path:target_path (mac/linux)
+    #         source_path;target_path (windows)
+    sep = ";" if os.name == "nt" else ":"
+    cmd.append(f"{src}{sep}{target}")
 
 
-def build():
+def fast_launch_options(cmd):
+    """Options of the fast launch mode.
+
+    The onedir output starts without unpacking an archive to a temp dir. The
+    samples are copied next to the executable after the build instead of
+    being bundled, the callbacks are collected as byte-compiled modules
+    instead of source files, and unused modules are excluded."""
+    cmd.append("--onedir")
+    cmd.append("--noupx")
+    # the data paths are relative to the spec file in the build folder
+    add_data(cmd, os.path.abspath("app/.pollination"), ".pollination")
+    for path in sorted(Path("app/assets").iterdir()):
+        if path.name == "samples":
+            continue
+        target = "assets/" + path.name if path.is_dir() else "assets"
+        add_data(cmd, str(path.resolve()), target)
+    for path in sorted(Path("app/callbacks").glob("*.py")):
+        cmd.extend(["--hidden-import", f"callbacks.{path.stem}"])
+    for module in EXCLUDED_MODULES:
+        cmd.extend(["--exclude-module", module])
+
+
+def build(mode="onefile"):
     """Build the application using PyInstaller."""
     print("============================================")
-    print(" Building Design Explorer")
+    print(f" Building Design Explorer ({mode})")
     print("============================================")
 
-    clean_build_folders()
+    clean_build_folders(mode)
 
     # Build PyInstaller command
     cmd = [
-        "--name", "Design Explorer",
-        "--onefile",
+        "--name", APP_NAME,
         "--console",  # If no console wanted: replace with "--noconsole"
-        ENTRY_FILE,
+        "--noconfirm",
+        "--distpath", DIST_PATHS[mode],
+        "--workpath", os.path.join("build", mode),
+        "--specpath", os.path.join("build", mode),
     ]
 
-    # Add data folders
-    for src, target in DATA_DIRS:
-        cmd.append("--add-data")
-        # Format: source_path:target_path (mac/linux)
-        #         source_path;target_path (windows)
-        sep = ";" if os.name == "nt" else ":"
-        cmd.append(f"{src}{sep}{target}")
+    if mode == "fast":
+        fast_launch_options(cmd)
+    else:
+        cmd.append("--onefile")
+        # Add data folders
+        for src, target in DATA_DIRS:
+            add_data(cmd, os.path.abspath(src), target)
+
+    cmd.append(os.path.abspath(ENTRY_FILE))
 
     print("\nRunning PyInstaller with arguments:")
     for c in cmd:
@@ -51,10 +106,22 @@ def build():
     # Execute PyInstaller
     PyInstaller.__main__.run(cmd)
 
+    if mode == "fast":
+        # samples are read from next to the executable, see config.py
+        shutil.copytree(
+            "app/assets/samples",
+            os.path.join(DIST_PATHS[mode], APP_NAME, "samples"))
+
     print("============================================")
-    print(" Build complete! Output in dist/")
+    print(f" Build complete! Output in {DIST_PATHS[mode]}/")
     print("============================================")
 
 
 if __name__ == "__main__":
-    build()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the desktop app.")
+    parser.add_argument(
+        "--mode", choices=sorted(DIST_PATHS), default="onefile",
+        help="onefile: a single executable, fast: a folder that launches "
+             "faster")
+    args = parser.parse_args()
+    build(args.mode)
\ No newline at end of file
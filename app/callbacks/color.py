@@ -2,11 +2,12 @@
 import dash
 from dash import Patch, ALL, ctx
 from dash.dependencies import Input, Output, State
-import pandas as pd
 import plotly.express as px
 import numpy as np
 
 from color_schemes import get_color_schemes, rgb_to_hex
+from datasets import get_dataset
+from metrics import instrument, add_rows
 
 
 @dash.callback(
@@ -14,19 +15,24 @@ from color_schemes import get_color_schemes, rgb_to_hex
      Output('color-by-column', 'data'),
      Output('color-by-dropdown', 'label')],
     [Input({'color_by_dropdown': ALL}, 'n_clicks'),
-     State('df', 'data'),
+     State('dataset-version', 'data'),
      State('labels', 'data'),
      State('parallel-coordinates', 'figure')],
     prevent_initial_call=True
 )
-def update_color_by(n_clicks, df_records, labels, figure):
+@instrument
+def update_color_by(n_clicks, dataset_version, labels, figure):
     """If a click is registered in the color by dropdown, the figure is updated
     in parallel-coordinates, the data is updated in color-by-column, and the
     label is updated in color-by-dropdown."""
     if all(v is None for v in n_clicks):
         return (dash.no_update,) * 3
 
-    dff = pd.DataFrame.from_records(df_records)
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return (dash.no_update,) * 3
+    dff = dataset.df
+    add_rows(len(dff))
     color_by = ctx.triggered_id.color_by_dropdown
 
     if color_by:
@@ -46,13 +52,16 @@ def update_color_by(n_clicks, df_records, labels, figure):
      Output('color-scheme-dropdown', 'label'),
      Output('parallel-coordinates', 'figure')],
     [Input({'color_scheme': ALL}, 'n_clicks')],
-    [State('df', 'data'),
+    [State('dataset-version', 'data'),
      State('color-by-column', 'data'),
      State('labels', 'data'),
+     State('df-columns', 'data'),
      State('parallel-coordinates', 'figure')],
     prevent_initial_call=True
 )
-def update_color_scheme(n_clicks, df_records, color_by_column, labels, figure):
+@instrument
+def update_color_scheme(n_clicks, dataset_version, color_by_column, labels,
+                        df_columns, figure):
     """If a click is registered in the color scheme dropdown, update the color scheme.
     This will affect both the parallel coordinates plot and the image grid borders."""
     if all(v is None for v in n_clicks):
@@ -62,8 +71,10 @@ def update_color_scheme(n_clicks, df_records, color_by_column, labels, figure):
     color_scheme = ctx.triggered_id.color_scheme
     
     # Update the parallel coordinates plot with the new color scale
-    if color_by_column and df_records and figure:
-        dff = pd.DataFrame.from_records(df_records)
+    dataset = get_dataset(dataset_version)
+    if color_by_column and dataset is not None and figure:
+        dff = dataset.df
+        add_rows(len(dff))
         
         # Create a custom color scale from the selected scheme
         color_schemes = get_color_schemes()
@@ -77,6 +88,7 @@ def update_color_scheme(n_clicks, df_records, color_by_column, labels, figure):
         # Create a new parallel coordinates figure with the selected color scheme
         new_fig = px.parallel_coordinates(
             dff, 
+            dimensions=df_columns,
             color=color_by_column, 
             labels=labels,
             color_continuous_scale=hex_colors
@@ -0,0 +1,82 @@
+"""Module for the callbacks of the axes of the parallel coordinates plot."""
+import dash
+from dash import Patch
+from dash.dependencies import Input, Output, State
+
+from containers import create_axes_options, create_table_columns
+from datasets import get_dataset
+from metrics import instrument, add_rows
+
+
+@dash.callback(
+    [Output('axes-picker', 'options'),
+     Output('axes-picker', 'value')],
+    [Input('df-columns', 'data'),
+     State('parameters', 'data'),
+     State('axes-picker', 'value')],
+    prevent_initial_call=True,
+)
+@instrument
+def update_axes_picker(df_columns, parameters, value):
+    """If a project is loaded, the axes picker shows its columns and the axes
+    of its plot."""
+    options = create_axes_options(parameters or {})
+    if value is not None and set(value) == set(df_columns or []):
+        # the axes were changed from the picker
+        return options, dash.no_update
+    return options, df_columns
+
+
+@dash.callback(
+    [Output('parallel-coordinates', 'figure', allow_duplicate=True),
+     Output('df-columns', 'data', allow_duplicate=True),
+     Output('table', 'columns', allow_duplicate=True),
+     Output('active-filters', 'data', allow_duplicate=True)],
+    [Input('axes-picker', 'value'),
+     State('df-columns', 'data'),
+     State('labels', 'data'),
+     State('parameters', 'data'),
+     State('active-filters', 'data'),
+     State('dataset-version', 'data')],
+    prevent_initial_call=True,
+)
+@instrument
+def update_axes(value, df_columns, labels, parameters, filters,
+                dataset_version):
+    """If columns are added to or removed from the axes picker, only their
+    dimensions are added to or removed from the figure.
+
+    The values of an added column are read from the dataset, i.e. from the
+    column store of the project, and sent once. The filter of a removed column
+    is removed. df-columns keeps the columns in the order of the dimensions."""
+    df_columns = df_columns or []
+    if not value or set(value) == set(df_columns):
+        return (dash.no_update,) * 4
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return (dash.no_update,) * 4
+
+    removed = [i for i, column in enumerate(df_columns) if column not in value]
+    added = [column for column in value
+             if column not in df_columns and column in dataset.df.columns]
+    add_rows(len(dataset.df) * len(added))
+
+    new_fig = Patch()
+    dimensions = new_fig['data'][0]['dimensions']
+    # from the last one, so the indices of the others do not change
+    for i in reversed(removed):
+        del dimensions[i]
+    for column in added:
+        dimensions.append({'label': labels.get(column, column),
+                           'values': dataset.df[column].to_numpy()})
+    columns = [column for column in df_columns if column in value] + added
+
+    new_filters = dash.no_update
+    brushed = [df_columns[i] for i in removed if (filters or {}).get(df_columns[i])]
+    if brushed:
+        new_filters = Patch()
+        for column in brushed:
+            del new_filters[column]
+
+    return (new_fig, columns, create_table_columns(parameters, columns),
+            new_filters)
@@ -1,53 +1,57 @@
 """Module for image callbacks."""
 from pathlib import Path
 import dash
-from dash import html, ALL, ctx
+from dash import html, ALL, Patch, ctx
 from dash.dependencies import Input, Output, State
-import pandas as pd
 import plotly.express as px
 import numpy as np
 
 from color_schemes import get_color_schemes, sample_color_scheme
+from clustering import representatives
+from config import similar_designs, representative_tiles
+from datasets import get_dataset, first_rows
+from deepzoom import deepzoom_url
+from manifest import image_available, missing_images
+from metrics import instrument, add_rows
+from neighbors import neighbor_index
+from pareto import parse_objectives, pareto_levels
+from selection import selection_count, selection_rows, sorted_rows
+from storage import project_path, touch_project
 
 
-@dash.callback(
-    Output('images-grid', 'children', allow_duplicate=True),
-    [Input('active-records', 'data'),
-     State('df', 'data'),
-     Input('color-by-column', 'data'),
-     Input('sort-by-column', 'data'),
-     Input('sort-ascending', 'data'),
-     Input('color-scheme', 'data'),
-     State('img-column', 'data'),
-     State('project-folder', 'data'),
-     State('selected-image-data', 'data')],
-    prevent_initial_call=True,
-)
-def update_images_grid(
-        active_records, df_records, color_by_column, sort_by_column,
-        sort_ascending, color_scheme, img_column, project_folder, selected_image_data):
-    """If the data in active-records is changed, the children will be updated
-    in images-grid.
-    
-    The images-grid is a grid showing all the images of the selected filters in
-    the parallel coordinate plot.
+def render_images_grid(
+        dataset, selection, rows, color_by_column, sort_by_column,
+        sort_ascending, color_scheme, img_column, project_folder,
+        selected_image_data, pareto_mode, pareto_objectives, grid_mode,
+        grid_cluster):
+    """Return the children of images-grid for the active rows of a dataset.
+
+    selection is the value of active-rows and rows its row ids, None meaning
+    all the rows. Only the image, color and sort columns of these rows are
+    read.
+
+    If pareto-mode is 'rank' the images are sorted by their Pareto front level
+    first, and by the sort-by column within a level.
 
-    The data coming from table is a list. Here is an example:
-    [
-        {'in:X': 1, 'in:Y': 4, 'in:Z': 3.6, 'img:Perspective': 'X_1_Y_4_Z_3.6.png'},
-        {'in:X': 2, 'in:Y': 4, 'in:Z': 3.6, 'img:Perspective': 'X_2_Y_4_Z_3.6.png'}
-    ]
+    If grid-mode is 'representatives' and there are more active rows than
+    representative_tiles, one image per cluster of similar designs is shown
+    with the size of the cluster. grid-cluster is the representative row id of
+    the cluster to show in full.
     """
-    if img_column is None:
+    count = selection_count(dataset, selection)
+    if img_column is None or not count:
         return []
-    
+
+    add_rows(count)
     images_div = []
     minimum = None
     maximum = None
+    columns = list(dict.fromkeys(
+        c for c in (img_column, color_by_column, sort_by_column) if c))
     
     if color_by_column:
-        dff = pd.DataFrame.from_records(df_records)
-        minimum, maximum = dff[color_by_column].min(), dff[color_by_column].max()
+        values = dataset.df[color_by_column]
+        minimum, maximum = values.min(), values.max()
     
     border_color = '#636EFA'
     
@@ -56,17 +60,57 @@ def update_images_grid(
     if selected_image_data and isinstance(selected_image_data, list) and len(selected_image_data) > 0:
         selected_image = selected_image_data[0].get(img_column)
     
-    if sort_by_column:
-        dff = pd.DataFrame.from_records(active_records)
-        sorted_df = dff.sort_values(
-            by=sort_by_column, ascending=sort_ascending)
-        active_records = sorted_df.to_dict('records')
-    
+    cluster_sizes = {}
+    presorted = False
+    if grid_mode == 'representatives' and count > representative_tiles:
+        clusters = representatives(dataset, rows, representative_tiles)
+        if grid_cluster is not None and grid_cluster in clusters.centers:
+            rows = clusters.members(grid_cluster)
+        else:
+            rows = clusters.centers
+            cluster_sizes = dict(zip(clusters.centers.tolist(),
+                                     clusters.sizes.tolist()))
+    elif sort_by_column:
+        # the sort order of the selection is cached, see selection.sorted_rows
+        rows = sorted_rows(dataset, selection, sort_by_column, sort_ascending)
+        presorted = True
+    if rows is None:
+        rows = np.arange(len(dataset.df))
+    dff = dataset.df.iloc[rows][columns]
+
+    levels = None
+    objectives = parse_objectives(pareto_objectives)
+    if pareto_mode == 'rank' and objectives and \
+            all(o[0] in dataset.df.columns for o in objectives):
+        levels = pareto_levels(dataset, objectives)[rows]
+
+    if levels is not None:
+        dff = dff.assign(__level__=levels)
+        by, ascending = ['__level__'], [True]
+        if sort_by_column and not presorted:
+            by.append(sort_by_column)
+            ascending.append(sort_ascending)
+        # stable, so presorted rows stay sorted within a level
+        dff = dff.sort_values(by=by, ascending=ascending, kind='stable')
+    elif sort_by_column and not presorted:
+        # descending is the reversal of ascending, like selection.sorted_rows
+        dff = dff.sort_values(by=sort_by_column, kind='stable')
+        if not sort_ascending:
+            dff = dff.iloc[::-1]
+    tile_rows = dff.index.tolist()
+    records = dff.drop(columns='__level__', errors='ignore').to_dict('records')
+
+    # the session is using the project, keep it out of the storage eviction
+    touch_project(project_folder)
+    missing = set()
+    if project_path(project_folder) is not None:
+        missing = missing_images(
+            dataset, img_column, project_path(project_folder))
     project_folder = Path(project_folder)
     color_schemes = get_color_schemes()
     current_scheme = color_schemes.get(color_scheme, color_schemes['Original'])
     
-    for d in active_records:
+    for row, d in zip(tile_rows, records):
         if color_by_column:
             # Use the selected color scheme to get border color
             border_color = sample_color_scheme(current_scheme, d[color_by_column], minimum, maximum)
@@ -77,12 +121,27 @@ def update_images_grid(
         is_selected = selected_image == d[img_column]
         image_class = 'image-grid selected' if is_selected else 'image-grid'
         
+        if d[img_column] in missing:
+            # a tile instead of a broken image, the design can still be selected
+            children = html.Div(f'No image {d[img_column]}',
+                                id={'image': f'{d[img_column]}'},
+                                className=f'{image_class} missing',
+                                title='The image file of this design is missing',
+                                style={'borderColor': border_color})
+        else:
+            children = html.Img(src=src.as_posix(),
+                                id={'image': f'{d[img_column]}'},
+                                className=image_class,
+                                style={'borderColor': border_color}
+                                )
+        if row in cluster_sizes:
+            # the number of designs of the cluster, click to show them
+            children = [children, html.Button(
+                f'{cluster_sizes[row]}', id={'cluster': row},
+                className='cluster-count',
+                title=f'Show the {cluster_sizes[row]} designs of this cluster')]
         image = html.Div(
-            html.Img(src=src.as_posix(),
-                     id={'image': f'{d[img_column]}'},
-                     className=image_class,
-                     style={'borderColor': border_color}
-                     ),
+            children,
             style={
                 'aspectRatio': '1',
                 'width': '100%',
@@ -98,8 +157,145 @@ def update_images_grid(
     return images_div
 
 
+@dash.callback(
+    Output('images-grid', 'children', allow_duplicate=True),
+    [Input('color-by-column', 'data'),
+     Input('sort-by-column', 'data'),
+     State('sort-ascending', 'data'),
+     Input('color-scheme', 'data'),
+     Input('grid-mode', 'value'),
+     Input('grid-cluster', 'data'),
+     State('active-rows', 'data'),
+     State('img-column', 'data'),
+     State('project-folder', 'data'),
+     State('selected-image-data', 'data'),
+     State('pareto-mode', 'value'),
+     State('pareto-objectives', 'value'),
+     State('dataset-version', 'data')],
+    prevent_initial_call=True,
+)
+@instrument
+def update_images_grid(
+        color_by_column, sort_by_column, sort_ascending, color_scheme,
+        grid_mode, grid_cluster, active_rows, img_column, project_folder,
+        selected_image_data, pareto_mode, pareto_objectives, dataset_version):
+    """If the coloring, the sorting or the mode of the grid change, the
+    children will be updated in images-grid.
+
+    The images-grid is a grid showing all the images of the selected filters in
+    the parallel coordinate plot. A new selection is rendered with the active
+    rows by callbacks.records.update_selection, a new sort direction by
+    update_images_grid_direction."""
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return []
+    return render_images_grid(
+        dataset, active_rows, selection_rows(dataset, active_rows),
+        color_by_column, sort_by_column, sort_ascending, color_scheme,
+        img_column, project_folder, selected_image_data, pareto_mode,
+        pareto_objectives, grid_mode, grid_cluster)
+
+
+@dash.callback(
+    Output('images-grid', 'children', allow_duplicate=True),
+    [Input('sort-ascending', 'data'),
+     State('sort-by-column', 'data'),
+     State('pareto-mode', 'value'),
+     State('pareto-objectives', 'value'),
+     State('color-by-column', 'data'),
+     State('color-scheme', 'data'),
+     State('grid-mode', 'value'),
+     State('grid-cluster', 'data'),
+     State('active-rows', 'data'),
+     State('img-column', 'data'),
+     State('project-folder', 'data'),
+     State('selected-image-data', 'data'),
+     State('dataset-version', 'data')],
+    prevent_initial_call=True,
+)
+@instrument
+def update_images_grid_direction(
+        sort_ascending, sort_by_column, pareto_mode, pareto_objectives,
+        color_by_column, color_scheme, grid_mode, grid_cluster, active_rows,
+        img_column, project_folder, selected_image_data, dataset_version):
+    """If the sort direction changes, reverse the children of images-grid.
+
+    Descending is the reversal of ascending, so unless the grid is ranked by
+    Pareto level the browser only reverses the images it has and nothing is
+    rendered again. A ranked grid is rendered again from the dataset."""
+    if not sort_by_column:
+        return dash.no_update
+    if pareto_mode != 'rank' or not parse_objectives(pareto_objectives):
+        children = Patch()
+        children.reverse()
+        return children
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return dash.no_update
+    return render_images_grid(
+        dataset, active_rows, selection_rows(dataset, active_rows),
+        color_by_column, sort_by_column, sort_ascending, color_scheme,
+        img_column, project_folder, selected_image_data, pareto_mode,
+        pareto_objectives, grid_mode, grid_cluster)
+
+
+@dash.callback(
+    Output('image-report', 'children'),
+    [Input('dataset-version', 'data'),
+     State('img-column', 'data'),
+     State('project-folder', 'data')],
+    prevent_initial_call=True
+)
+@instrument
+def update_image_report(dataset_version, img_column, project_folder):
+    """If a project is loaded, report the designs whose image file is
+    missing."""
+    folder = project_path(project_folder)
+    if img_column is None or folder is None:
+        return None
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return None
+    available = image_available(dataset, img_column, folder)
+    rows = int(len(available) - available.sum())
+    if not rows:
+        return None
+    files = len(missing_images(dataset, img_column, folder))
+    return (f'{rows:,} of {len(available):,} designs have no image, '
+            f'{files:,} image files are missing.')
+
+
+@dash.callback(
+    [Output('grid-cluster', 'data'),
+     Output('grid-cluster-back', 'style')],
+    [Input({'cluster': ALL}, 'n_clicks'),
+     Input('grid-cluster-back', 'n_clicks'),
+     Input('grid-mode', 'value'),
+     Input('active-rows', 'data'),
+     State('grid-cluster', 'data')],
+    prevent_initial_call=True
+)
+@instrument
+def update_grid_cluster(n_clicks, back_n_clicks, grid_mode, active_rows,
+                        grid_cluster):
+    """If the size of a cluster is clicked, show the designs of the cluster.
+
+    Going back, changing the grid mode or the active rows shows the
+    representatives again."""
+    triggered_id = ctx.triggered_id
+    if isinstance(triggered_id, dict):
+        if all(item is None for item in n_clicks):
+            # new representatives were rendered, nothing was clicked
+            return dash.no_update, dash.no_update
+        return triggered_id['cluster'], {}
+    if grid_cluster is None:
+        return dash.no_update, dash.no_update
+    return None, {'display': 'none'}
+
+
 @dash.callback(
     [Output('selected-image', 'src', allow_duplicate=True),
+     Output('selected-image-dzi', 'data', allow_duplicate=True),
      Output('selected-image-container', 'style', allow_duplicate=True),
      Output('images-grid', 'style', allow_duplicate=True)],
     [Input('selected-image-data', 'data'),
@@ -107,18 +303,21 @@ def update_images_grid(
      State('project-folder', 'data')],
     prevent_initial_call=True,
 )
+@instrument
 def update_selected_image_table(
         selected_image_data, img_column, project_folder):
     """If the data in selected-image-table is changed.
     
-    The src of selected-image is taken from selected-image-table. The styles of
-    selected-image-container and images-grid are also updated."""
+    The src of selected-image is taken from selected-image-table. A large
+    image is shown from its deep zoom tiles instead, see deepzoom.py, and the
+    original file is not loaded. The styles of selected-image-container and
+    images-grid are also updated."""
     if selected_image_data is None:
-        return (dash.no_update,) * 3
+        return (dash.no_update,) * 4
 
-    project_folder = Path(project_folder)
-    src = project_folder.joinpath(
-        selected_image_data[0][img_column]).as_posix()
+    image = selected_image_data[0][img_column]
+    dzi = deepzoom_url(project_folder, image)
+    src = None if dzi else Path(project_folder).joinpath(image).as_posix()
 
     selected_image_container_style = {
         'width': '75%'
@@ -129,11 +328,32 @@ def update_selected_image_table(
         'width': '25%'
     }
 
-    return src, selected_image_container_style, images_grid_style
+    return src, dzi, selected_image_container_style, images_grid_style
+
+
+# the deep zoom viewer is in assets/deepzoom.js, a click on it that is not a
+# drag is a click on selected-image
+dash.clientside_callback(
+    """
+    function(dzi) {
+        const viewer = window.designExplorerDeepZoom;
+        if (dzi) {
+            viewer.show('selected-image-zoom', dzi, 'selected-image');
+        } else {
+            viewer.hide('selected-image-zoom');
+        }
+        return {display: dzi ? 'none' : null};
+    }
+    """,
+    Output('selected-image', 'style'),
+    Input('selected-image-dzi', 'data'),
+    prevent_initial_call=True,
+)
 
 
 @dash.callback(
     [Output('selected-image', 'src', allow_duplicate=True),
+     Output('selected-image-dzi', 'data', allow_duplicate=True),
      Output('selected-image', 'n_clicks', allow_duplicate=True),
      Output('selected-image-data', 'data', allow_duplicate=True),
      Output('selected-image-info', 'children', allow_duplicate=True),
@@ -142,6 +362,7 @@ def update_selected_image_table(
     Input('selected-image', 'n_clicks'),
     prevent_initial_call=True
 )
+@instrument
 def update_click_selected_image(n_clicks):
     """If a click is registered on selected-image.
     
@@ -150,32 +371,42 @@ def update_click_selected_image(n_clicks):
     if n_clicks is not None:
         selected_image_container_style = {}
         images_grid_style = {}
-        return None, None, None, None, selected_image_container_style, images_grid_style
+        return (None, None, None, None, None, selected_image_container_style,
+                images_grid_style)
 
 
 @dash.callback(
     [Output('selected-image-data', 'data', allow_duplicate=True),
      Output('selected-image-info', 'children', allow_duplicate=True)],
     [Input({'image': ALL}, 'n_clicks'),
-     State('df', 'data'),
+     Input({'similar_image': ALL}, 'n_clicks'),
      State('labels', 'data'),
      State('img-column', 'data'),
-     State('parameters', 'data')],
+     State('parameters', 'data'),
+     State('dataset-version', 'data')],
     prevent_initial_call=True
 )
+@instrument
 def update_clicked_image_grid(
-        n_clicks, df_records, labels, img_column, parameters):
-    """If a click is registered in any of the images in images-grid, the data is
-    updated in selected-image-table."""
-    if all(item is None for item in n_clicks):
+        n_clicks, similar_n_clicks, labels, img_column, parameters,
+        dataset_version):
+    """If a click is registered in any of the images in images-grid, or in the
+    similar designs strip, the data is updated in selected-image-table."""
+    if all(item is None for item in n_clicks + similar_n_clicks):
         # no clicks, no update
         return (dash.no_update,) * 2
     # get the clicked image
-    image_id = ctx.triggered_id.image
-    dff = pd.DataFrame.from_records(df_records)
-    selected_df = dff.loc[dff[img_column] == image_id]
+    triggered_id = ctx.triggered_id
+    image_id = triggered_id.get('image', triggered_id.get('similar_image'))
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return (dash.no_update,) * 2
+    row = first_rows(dataset, img_column).get(image_id)
+    if row is None:
+        return (dash.no_update,) * 2
+    record = [dataset.df.loc[row].to_dict()]
+    add_rows(1)
     select_image_info = []
-    record = selected_df.to_dict('records')
     for label in labels:
         select_image_info.append(
             html.Div(
@@ -186,11 +417,67 @@ def update_clicked_image_grid(
     return record, select_image_info
 
 
+@dash.callback(
+    [Output('similar-images', 'children'),
+     Output('similar-images-container', 'style')],
+    [Input('selected-image-data', 'data'),
+     Input('similar-space', 'value'),
+     State('dataset-version', 'data'),
+     State('img-column', 'data'),
+     State('project-folder', 'data')],
+    prevent_initial_call=True
+)
+@instrument
+def update_similar_images(
+        selected_image_data, space, dataset_version, img_column,
+        project_folder):
+    """If an image is selected, show the designs closest to it in the
+    normalized in: columns, or in the in: and out: columns.
+
+    The nearest-neighbour index is built once per dataset version and space.
+    Designs that share the image of a design already shown are skipped."""
+    if not selected_image_data or img_column is None:
+        return [], {'display': 'none'}
+
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return [], {'display': 'none'}
+    selected = selected_image_data[0].get(img_column)
+    row = first_rows(dataset, img_column).get(selected)
+    if row is None:
+        return [], {'display': 'none'}
+
+    index = neighbor_index(dataset, space)
+    # ask for more neighbours than shown as several designs can share an image
+    neighbors = index.query(row, similar_designs * 4)
+    add_rows(len(neighbors))
+
+    project_folder = Path(project_folder)
+    images = dataset.df[img_column]
+    shown = {selected}
+    children = []
+    for neighbor, distance in neighbors:
+        image = images.iat[neighbor]
+        if image in shown:
+            continue
+        shown.add(image)
+        children.append(
+            html.Img(src=project_folder.joinpath(image).as_posix(),
+                     id={'similar_image': f'{image}'},
+                     className='similar-image',
+                     title=f'Distance: {distance:.3f}'))
+        if len(children) == similar_designs:
+            break
+
+    return children, {}
+
+
 @dash.callback(
     Output('images-container', 'style', allow_duplicate=True),
     Input('img-column', 'data'),
     prevent_initial_call=True
 )
+@instrument
 def update_images_grid_div_display(img_column):
     """If img-column is None, the display is changed to none."""
     if img_column is None:
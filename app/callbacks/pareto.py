@@ -0,0 +1,40 @@
+"""Module for Pareto front callbacks."""
+import dash
+from dash.dependencies import Input, Output, State
+import numpy as np
+
+from datasets import get_dataset
+from metrics import instrument, add_rows
+from pareto import parse_objectives, pareto_front, pareto_levels
+
+
+@dash.callback(
+    Output('pareto-info', 'children'),
+    [Input('pareto-objectives', 'value'),
+     Input('pareto-mode', 'value'),
+     State('dataset-version', 'data')],
+    prevent_initial_call=True
+)
+@instrument
+def update_pareto_info(pareto_objectives, pareto_mode, dataset_version):
+    """If the Pareto objectives or mode change, show the size of the front.
+
+    The front and the levels are cached per dataset version, so the grid and
+    the records callbacks reuse them. The levels are only computed when the
+    grid is ranked by front."""
+    objectives = parse_objectives(pareto_objectives)
+    if not objectives:
+        return 'Select at least one objective.' if pareto_mode != 'off' else None
+
+    dataset = get_dataset(dataset_version)
+    if dataset is None or \
+            not all(o[0] in dataset.df.columns for o in objectives):
+        return dash.no_update
+
+    add_rows(len(dataset.df))
+    front = int(np.count_nonzero(pareto_front(dataset, objectives)))
+    info = f'{front} of {len(dataset.df)} designs on the Pareto front'
+    if pareto_mode == 'rank' and len(dataset.df):
+        levels = pareto_levels(dataset, objectives)
+        info += f', {int(levels.max()) + 1} fronts in total'
+    return info + '.'
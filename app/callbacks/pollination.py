@@ -1,19 +1,27 @@
 """Module for Pollination callbacks."""
 import base64
+import shutil
 import zipfile
 from io import BytesIO
 from pathlib import Path
 import dash
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
-import pandas as pd
 import plotly.express as px
 import pollination_dash_io
 from pollination_io.api.client import ApiClient
 
-from containers import create_color_by_children, create_sort_by_children
-from helper import process_dataframe
-from config import pollination_path, base_path
+from containers import create_color_by_children, create_sort_by_children, \
+    create_pareto_children, create_table_columns
+from helper import default_axes, process_dataframe
+from blobs import content_hash, store_files, store_images, write_file
+from columnstore import load_columns
+from sqlstore import select_database
+from config import pollination_path, base_path, max_axes
+from datasets import register
+from manifest import build_manifest, load_manifest, write_manifest
+from metrics import instrument, add_rows
+from storage import pollination_projects
 
 
 @dash.callback(
@@ -22,6 +30,7 @@ from config import pollination_path, base_path
      State('auth-user', 'apiKey')],
     prevent_initial_call=True
 )
+@instrument
 def update_select_artifact_container(project, apiKey):
     """Function to change the children of select-artifact-container."""
     if project is None:
@@ -42,6 +51,7 @@ def update_select_artifact_container(project, apiKey):
      State('auth-user', 'apiKey')],
     prevent_initial_call=True
 )
+@instrument
 def update_select_project_container(account, apiKey):
     """Function to change the children of select-project-container."""
     if account is None:
@@ -61,6 +71,7 @@ def update_select_project_container(account, apiKey):
      State('auth-user', 'apiKey')],
     prevent_initial_call=True
 )
+@instrument
 def update_select_account_container(value, apiKey):
     """Function to change the children of select-account-container."""
     if value:
@@ -74,9 +85,9 @@ def update_select_account_container(value, apiKey):
 
 @dash.callback(
     [Output('project-folder', 'data', allow_duplicate=True),
-     Output('df', 'data', allow_duplicate=True),
-     Output('active-records', 'data', allow_duplicate=True),
+     Output('active-rows', 'data', allow_duplicate=True),
      Output('active-filters', 'data', allow_duplicate=True),
+     Output('dataset-version', 'data', allow_duplicate=True),
      Output('df-columns', 'data', allow_duplicate=True),
      Output('labels', 'data', allow_duplicate=True),
      Output('img-column', 'data', allow_duplicate=True),
@@ -84,6 +95,7 @@ def update_select_account_container(value, apiKey):
      Output('parallel-coordinates', 'figure', allow_duplicate=True),
      Output('sort-by', 'children', allow_duplicate=True),
      Output('color-by', 'children', allow_duplicate=True),
+     Output('pareto', 'children', allow_duplicate=True),
      Output('table', 'columns', allow_duplicate=True),
      Output('selected-image-info', 'children', allow_duplicate=True),
      Output('selected-image-container', 'style', allow_duplicate=True),
@@ -96,6 +108,7 @@ def update_select_account_container(value, apiKey):
      State('auth-user', 'apiKey')],
     prevent_initial_call=True
 )
+@instrument
 def load_project_from_pollination(value, name, key, project, api_key):
     if value is None or name is None or key is None:
         raise PreventUpdate
@@ -108,15 +121,38 @@ def load_project_from_pollination(value, name, key, project, api_key):
         output_folder = pollination_path.joinpath(
             project['owner']['id'], project['id'], file.stem)
         project_folder = f'pollination/{project["owner"]["id"]}/{project["id"]}/{file.stem}'
-        with zipfile.ZipFile(zip_file_like, 'r') as zip_file:
-            zip_file.extractall(output_folder)
-        csv_file = output_folder.joinpath('data.csv')
-        assert csv_file.exists(), 'File data.csv does not exists in zip file.'
-        dff = pd.read_csv(csv_file)
-        df_records = dff.to_dict('records')
+        storage_path = output_folder.relative_to(pollination_path)
+        digest = content_hash(bytes_value)
+        # the same artifact was extracted before
+        if pollination_projects.archive(storage_path) != digest:
+            # the images of the previous extraction are links to shared blobs,
+            # extracting over them would write through the links
+            shutil.rmtree(output_folder, ignore_errors=True)
+            with zipfile.ZipFile(zip_file_like, 'r') as zip_file:
+                zip_file.extractall(output_folder)
+            digests = store_images(output_folder)
+            csv_file = output_folder.joinpath('data.csv')
+            assert csv_file.exists(), 'File data.csv does not exists in zip file.'
+            write_manifest(output_folder, build_manifest(
+                output_folder, csv_file, digests))
+            pollination_projects.set_archive(storage_path, digest)
+        manifest = load_manifest(output_folder)
+        assert manifest is not None, 'File data.csv does not exists in zip file.'
+        csv_file = output_folder.joinpath(manifest['csv'])
+        dff, dataset_version = load_columns(csv_file)
+        add_rows(len(dff))
+        dataset_version = register(
+            dff, dataset_version, select_database(csv_file), source=csv_file)
+        pollination_projects.track(storage_path)
+        pollination_projects.enforce(keep=[storage_path])
 
-        labels, parameters, input_columns, output_columns, image_columns = \
-            process_dataframe(dff)
+        labels, parameters = manifest['labels'], manifest['parameters']
+        input_columns = manifest['input_columns']
+        output_columns = manifest['output_columns']
+        image_columns = manifest['image_columns']
+
+        # wide studies start with some of their columns on the plot
+        axes = default_axes(input_columns, output_columns, max_axes)
 
         if output_columns:
             color_by = output_columns[0]
@@ -125,33 +161,26 @@ def load_project_from_pollination(value, name, key, project, api_key):
             color_by = input_columns[0]
             sort_by = output_columns[0]
 
-        fig = px.parallel_coordinates(dff, color=color_by, labels=labels)
+        fig = px.parallel_coordinates(
+            dff, dimensions=axes, color=color_by, labels=labels)
 
-        img_column = dff.filter(regex=f'^img:').columns[0]
+        img_column = image_columns[0]
 
-        columns = []
-        for value in parameters.values():
-            if value['type'] != 'img':
-                columns.append(
-                    {'id': value['label'],
-                     'name': value['display_name']})
-            else:
-                columns.append(
-                    {'id': value['label'],
-                     'name': value['display_name'],
-                     'hidden': True})
+        columns = create_table_columns(parameters, axes)
 
         sort_by_children = create_sort_by_children(parameters, sort_by)
         color_by_children = create_color_by_children(parameters, color_by)
+        pareto_children = create_pareto_children(parameters)
 
         active_filters = {}
         selected_image_info = None
         selected_image_container_style = {}
         image_grid_style = {}
 
-        return (project_folder, df_records, df_records, active_filters, dff.columns,
-                labels, img_column, parameters, fig, sort_by_children,
-                color_by_children, columns, selected_image_info,
+        return (project_folder, None, active_filters,
+                dataset_version, axes, labels, img_column, parameters,
+                fig, sort_by_children, color_by_children, pareto_children,
+                columns, selected_image_info,
                 selected_image_container_style, image_grid_style, {})
     else:
         csv_pollination_folder = Path(key).parent
@@ -160,16 +189,22 @@ def load_project_from_pollination(value, name, key, project, api_key):
         project_folder = f'pollination/{project["owner"]["id"]}/{project["id"]}/{csv_pollination_folder}'
         csv_path = output_folder.joinpath(name)
         csv_path.parent.mkdir(parents=True, exist_ok=True)
-        bytes_value = BytesIO(bytes_value)
-        with open(csv_path, 'wb') as file:
-            file.write(bytes_value.getvalue())
+        write_file(csv_path, bytes_value)
 
-        dff = pd.read_csv(csv_path)
-        df_records = dff.to_dict('records')
+        dff, dataset_version = load_columns(csv_path)
+        add_rows(len(dff))
+        dataset_version = register(
+            dff, dataset_version, select_database(csv_path), source=csv_path)
+        storage_path = output_folder.relative_to(pollination_path)
+        pollination_projects.track(storage_path)
+        pollination_projects.enforce(keep=[storage_path])
 
         labels, parameters, input_columns, output_columns, image_columns = \
             process_dataframe(dff)
 
+        # wide studies start with some of their columns on the plot
+        axes = default_axes(input_columns, output_columns, max_axes)
+
         if output_columns:
             color_by = output_columns[0]
             sort_by = output_columns[0]
@@ -177,7 +212,8 @@ def load_project_from_pollination(value, name, key, project, api_key):
             color_by = input_columns[0]
             sort_by = output_columns[0]
 
-        fig = px.parallel_coordinates(dff, color=color_by, labels=labels)
+        fig = px.parallel_coordinates(
+            dff, dimensions=axes, color=color_by, labels=labels)
 
         img_columns = dff.filter(regex=f'^img:').columns
         if img_columns.empty:
@@ -185,33 +221,26 @@ def load_project_from_pollination(value, name, key, project, api_key):
         else:
             img_column = img_columns[0]
 
-        columns = []
-        for value in parameters.values():
-            if value['type'] != 'img':
-                columns.append(
-                    {'id': value['label'],
-                     'name': value['display_name']})
-            else:
-                columns.append(
-                    {'id': value['label'],
-                     'name': value['display_name'],
-                     'hidden': True})
+        columns = create_table_columns(parameters, axes)
 
         sort_by_children = create_sort_by_children(parameters, sort_by)
         color_by_children = create_color_by_children(parameters, color_by)
+        pareto_children = create_pareto_children(parameters)
 
         active_filters = {}
         selected_image_info = None
         selected_image_container_style = {}
         image_grid_style = {}
 
+        digests = {}
         if img_column:
             client = ApiClient(host=base_path, api_token=api_key)
             url = Path(
                 'projects', project['owner']['name'],
                 project['name'],
                 'artifacts', 'download')
-            images = dff[img_column]
+            images = dff[img_column].dropna().unique()
+            img_paths = []
             for image in images:
                 params = {
                     'path': csv_pollination_folder.joinpath(image).as_posix()
@@ -219,10 +248,18 @@ def load_project_from_pollination(value, name, key, project, api_key):
                 signed_url = client.get(url.as_posix(), params=params)
                 img_bytes = client.download_artifact(signed_url)
                 img_path = output_folder.joinpath(image)
-                with img_path.open('wb') as file:
-                    file.write(img_bytes.getvalue())
+                # the previous download can be a link to a shared blob
+                write_file(img_path, img_bytes.getvalue())
+                img_paths.append(img_path)
+            # images identical to the ones of other projects are stored once
+            digests = store_files(img_paths)
+
+        # the images are in the folder now
+        write_manifest(output_folder, build_manifest(
+            output_folder, csv_path, digests))
 
-        return (project_folder, df_records, df_records, active_filters, dff.columns,
-                labels, img_column, parameters, fig, sort_by_children,
-                color_by_children, columns, selected_image_info,
+        return (project_folder, None, active_filters,
+                dataset_version, axes, labels, img_column, parameters,
+                fig, sort_by_children, color_by_children, pareto_children,
+                columns, selected_image_info,
                 selected_image_container_style, image_grid_style, {})
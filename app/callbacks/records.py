@@ -1,21 +1,104 @@
 """Module for records callbacks."""
 import dash
-from dash import Patch
+from dash import Patch, ctx
 from dash.dependencies import Input, Output, State
-import pandas as pd
+from dash.exceptions import PreventUpdate
+
+import coalesce
+from callbacks.image import render_images_grid
+from callbacks.table import selection_page
+from datasets import get_dataset
+from metrics import instrument, add_rows, drop_request
+from pareto import parse_objectives
+from selection import make_selection, selection_spec, select_rows
+
+
+# Debounce the restyleData events of a brush: the brush store is set once no
+# event came for brush-debounce milliseconds. It has the constraint ranges of
+# every dimension of the plot, not only of the last one, and the session and
+# number of the brush in this tab, so the server can drop stale brushes.
+# Clientside callbacks return a Promise since Dash 2.5, the app needs 2.9 for
+# Patch and allow_duplicate.
+dash.clientside_callback(
+    """
+    function(restyleData, interval) {
+        const dc = window.dash_clientside;
+        if (!restyleData) {
+            return dc.no_update;
+        }
+        const ranges = {};
+        const graph = document.querySelector(
+            '#parallel-coordinates .js-plotly-plot');
+        const trace = graph && graph.data && graph.data[0];
+        // like restyleData, a range is wrapped in a list of the traces
+        ((trace && trace.dimensions) || []).forEach((dimension, index) => {
+            ranges[index] = dimension.constraintrange ?
+                [dimension.constraintrange] : null;
+        });
+        Object.entries(restyleData[0]).forEach(([key, value]) => {
+            ranges[parseInt(key.split('[')[1])] =
+                value && value[0] != null ? value : null;
+        });
+        const brush = window.designExplorerBrush = window.designExplorerBrush ||
+            {session: Math.random().toString(36).slice(2), seq: 0};
+        const seq = ++brush.seq;
+        return new Promise(resolve => setTimeout(() => resolve(
+            seq === brush.seq ?
+                {session: brush.session, seq: seq, ranges: ranges} :
+                dc.no_update), interval || 0));
+    }
+    """,
+    Output('brush', 'data'),
+    [Input('parallel-coordinates', 'restyleData'),
+     State('brush-debounce', 'data')],
+    prevent_initial_call=True,
+)
 
 
 @dash.callback(
-    Output('active-records', 'data', allow_duplicate=True),
-    [Input('active-filters', 'data'),
-     State('df', 'data')],
+    [Output('active-filters', 'data', allow_duplicate=True),
+     Output('active-rows', 'data', allow_duplicate=True),
+     Output('table', 'data', allow_duplicate=True),
+     Output('table', 'page_count', allow_duplicate=True),
+     Output('table', 'page_current', allow_duplicate=True),
+     Output('images-grid', 'children', allow_duplicate=True)],
+    [Input('brush', 'data'),
+     Input('active-filters', 'data'),
+     Input('pareto-mode', 'value'),
+     Input('pareto-objectives', 'value'),
+     Input('images-available-only', 'value'),
+     State('active-rows', 'data'),
+     State('df-columns', 'data'),
+     State('dataset-version', 'data'),
+     State('img-column', 'data'),
+     State('project-folder', 'data'),
+     State('table', 'page_current'),
+     State('table', 'page_size'),
+     State('table', 'sort_by'),
+     State('table', 'columns'),
+     State('color-by-column', 'data'),
+     State('sort-by-column', 'data'),
+     State('sort-ascending', 'data'),
+     State('color-scheme', 'data'),
+     State('selected-image-data', 'data'),
+     State('grid-mode', 'value'),
+     State('grid-cluster', 'data')],
     prevent_initial_call=True,
 )
-def update_active_records(data, df_records):
-    """If the data in active-filters is changed, the data will be updated in
-    active-records.
-    
-    The data coming from active-filters is a dictionary. Here is an example:
+@instrument
+def update_selection(
+        brush, filters, pareto_mode, pareto_objectives, images_only,
+        active_rows, df_columns, dataset_version, img_column, project_folder,
+        page_current, page_size, sort_by, table_columns, color_by_column,
+        sort_by_column, sort_ascending, color_scheme, selected_image_data,
+        grid_mode, grid_cluster):
+    """If a selection is made in the parallel coordinate plot, or the filters,
+    the Pareto mode or the image switch change, update the active rows, the
+    table and the images grid in one request.
+
+    The data coming from the brush store has the ranges of every dimension of
+    the plot, by index, the active-filters are a dictionary. Here is an
+    example:
     {
         'In:X': [
             [3.37548768432072, 5.8024196759539395]
@@ -33,40 +116,69 @@ def update_active_records(data, df_records):
     i.e., [min, max], and one column can have multiple selections. The value can
     also be None if a selection has previously been made for this column but
     since removed.
+
+    If pareto-mode is 'front' only the rows on the Pareto front of the selected
+    objectives are kept. If images-available-only is on, only the rows whose
+    image file exists are kept. active-rows gets the selection, see the
+    selection module, not the row ids.
+
+    When the filters are reset by a loader, the loader also sets active-rows
+    and the table columns, so only the grid is rendered here.
+
+    A brush is dropped, see the coalesce module, when a newer brush of the tab
+    arrived before or while its rows are computed.
     """
-    if data:
-        dff = pd.DataFrame.from_records(df_records)
-        for col in data:
-            if data[col]:
-                # there is a selection, i.e., the value is not None
-                rng = data[col][0]
-                if isinstance(rng[0], list):
-                    # if multiple choices combine df
-                    dff3 = pd.DataFrame(columns=dff.columns)
-                    for i in rng:
-                        dff2 = dff[dff[col].between(i[0], i[1])]
-                        dff3 = pd.concat([dff3, dff2])
-                    dff = dff3
-                else:
-                    # there is one selection
-                    dff = dff[dff[col].between(rng[0], rng[1])]
-        return dff.to_dict('records')
-    return dash.no_update
+    triggered_id = ctx.triggered_id
+    if triggered_id == 'pareto-objectives' and \
+            pareto_mode not in ('front', 'rank'):
+        # the objectives only change the rows or the grid with a Pareto mode
+        return (dash.no_update,) * 6
+    new_filters = dash.no_update
+    if triggered_id == 'brush':
+        if not brush:
+            return (dash.no_update,) * 6
+        if not coalesce.start(brush['session'], brush['seq']):
+            drop_request()
+            raise PreventUpdate
+        filters = dict(filters or {})
+        new_filters = Patch()
+        for index, ranges in brush['ranges'].items():
+            index = int(index)
+            if index < len(df_columns) and \
+                    filters.get(df_columns[index]) != ranges:
+                new_filters[df_columns[index]] = ranges
+                filters[df_columns[index]] = ranges
 
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return (new_filters,) + (dash.no_update,) * 5
+    objectives = parse_objectives(pareto_objectives) \
+        if pareto_mode == 'front' else ()
+    spec = selection_spec(
+        dataset, filters, objectives, img_column if images_only else None,
+        project_folder)
+    rows = select_rows(dataset, spec)
+    add_rows(len(dataset.df))
+    if triggered_id == 'brush' and \
+            not coalesce.is_latest(brush['session'], brush['seq']):
+        # a newer brush arrived while the rows were computed
+        drop_request()
+        raise PreventUpdate
+    selection = make_selection(spec, rows)
+    changed = (selection or {}).get('id') != (active_rows or {}).get('id')
 
-@dash.callback(
-    Output('active-filters', 'data', allow_duplicate=True),
-    [Input('parallel-coordinates', 'restyleData'),
-     State('df-columns', 'data')],
-    prevent_initial_call=True,
-)
-def update_active_filters(data, df_columns):
-    """If a selection is made in the parallel coordinate plot, the data will be
-    updated in active-filters."""
-    if data:
-        key = list(data[0].keys())[0]
-        col = df_columns[int(key.split('[')[1].split(']')[0])]
-        new_data = Patch()
-        new_data[col] = data[0][key]
-        return new_data
-    return dash.no_update
+    grid = render_images_grid(
+        dataset, selection, rows, color_by_column, sort_by_column,
+        sort_ascending, color_scheme, img_column, project_folder,
+        selected_image_data, pareto_mode, pareto_objectives, grid_mode,
+        # new rows show the representatives, see update_grid_cluster
+        None if changed else grid_cluster)
+    if not changed:
+        # the same rows, e.g. new objectives of the ranked grid or a reset
+        return new_filters, dash.no_update, dash.no_update, dash.no_update, \
+            dash.no_update, grid
+    data, page_count, _ = selection_page(
+        dataset, selection, 0, page_size, sort_by, table_columns, rows)
+    # the table callback is not fired again if the page does not change
+    page = dash.no_update if not page_current else 0
+    return new_filters, selection, data, page_count, page, grid
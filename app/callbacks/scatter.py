@@ -0,0 +1,164 @@
+"""Module for scatter plot callbacks."""
+import dash
+from dash import Patch
+from dash.dependencies import Input, Output, State
+import numpy as np
+import plotly.graph_objects as go
+
+from color_schemes import get_color_schemes, rgb_to_hex
+from config import scatter_max_points
+from datasets import get_dataset, cached
+from metrics import instrument, add_rows
+from selection import selection_rows
+
+
+def _permutation(dataset) -> np.ndarray:
+    # a fixed random order of the rows, the first rows of a selection in this
+    # order are the ones drawn, so the sample does not change between brushes
+    return cached(dataset, 'scatter_permutation', None,
+                  lambda: np.random.default_rng(0).permutation(len(dataset.df)))
+
+
+def _sample(dataset, mask: np.ndarray, limit: int) -> np.ndarray:
+    """Return at most limit row ids where mask is True."""
+    if mask.sum() <= limit:
+        return np.flatnonzero(mask)
+    order = _permutation(dataset)
+    return np.sort(order[mask[order]][:limit])
+
+
+@dash.callback(
+    [Output('scatter-x', 'options'),
+     Output('scatter-x', 'value'),
+     Output('scatter-y', 'options'),
+     Output('scatter-y', 'value')],
+    Input('parameters', 'data'),
+)
+@instrument
+def update_scatter_axes(parameters):
+    """If a project is loaded, list its in: and out: columns as axes. The first
+    two outputs are selected, or the first input and output."""
+    options, outputs, inputs = [], [], []
+    for value in parameters.values():
+        if value['type'] not in ('in', 'out'):
+            continue
+        options.append({'label': value['display_name'], 'value': value['label']})
+        (outputs if value['type'] == 'out' else inputs).append(value['label'])
+    axes = (outputs + inputs)[:2]
+    if not axes:
+        return [], None, [], None
+    x, y = axes if len(axes) == 2 else (axes[0], axes[0])
+    return options, x, options, y
+
+
+@dash.callback(
+    [Output('scatter-graph', 'figure'),
+     Output('scatter-info', 'children')],
+    [Input('scatter-x', 'value'),
+     Input('scatter-y', 'value'),
+     Input('active-rows', 'data'),
+     Input('color-by-column', 'data'),
+     Input('color-scheme', 'data'),
+     State('dataset-version', 'data'),
+     State('labels', 'data')],
+)
+@instrument
+def update_scatter_figure(x, y, active_rows, color_by_column, color_scheme,
+                          dataset_version, labels):
+    """Draw the active designs over the other designs with scattergl.
+
+    Above scatter_max_points the designs are downsampled, always keeping the
+    same rows for a dataset."""
+    dataset = get_dataset(dataset_version)
+    if dataset is None or not x or not y or x not in dataset.df or \
+            y not in dataset.df:
+        return {}, None
+
+    df = dataset.df
+    active = np.zeros(len(df), dtype=bool)
+    if active_rows is None:
+        active[:] = True
+    else:
+        active[selection_rows(dataset, active_rows)] = True
+    active_sample = _sample(dataset, active, scatter_max_points)
+    other_sample = _sample(
+        dataset, ~active, max(scatter_max_points - len(active_sample), 0))
+    add_rows(len(active_sample) + len(other_sample))
+
+    color_schemes = get_color_schemes()
+    scheme = color_schemes.get(color_scheme, color_schemes['Original'])
+    colorscale = [rgb_to_hex(rgb) for rgb in scheme['colors']]
+    marker = {'size': 5, 'opacity': 0.8}
+    if color_by_column and color_by_column in df:
+        color = df[color_by_column]
+        title = labels.get(color_by_column, color_by_column)
+        marker.update(
+            color=color.to_numpy()[active_sample], colorscale=colorscale,
+            cmin=color.min(), cmax=color.max(),
+            colorbar={'title': {'text': title}, 'thickness': 12})
+
+    fig = go.Figure([
+        go.Scattergl(
+            x=df[x].to_numpy()[other_sample], y=df[y].to_numpy()[other_sample],
+            mode='markers', name='Other designs', hoverinfo='skip',
+            marker={'size': 4, 'color': '#cbd5e1', 'opacity': 0.5}),
+        go.Scattergl(
+            x=df[x].to_numpy()[active_sample], y=df[y].to_numpy()[active_sample],
+            mode='markers', name='Active designs', marker=marker,
+            hovertemplate='%{x}, %{y}<extra></extra>'),
+    ])
+    fig.update_layout(
+        dragmode='select',
+        showlegend=False,
+        height=450,
+        margin={'l': 10, 'r': 10, 't': 10, 'b': 10},
+        xaxis_title=labels.get(x, x),
+        yaxis_title=labels.get(y, y),
+        # keep zoom and selection while the same axes are shown
+        uirevision=f'{dataset.version}:{x}:{y}',
+    )
+
+    shown = len(active_sample) + len(other_sample)
+    info = None
+    if shown < len(df):
+        info = f'Showing {shown} of {len(df)} designs.'
+    return fig, info
+
+
+@dash.callback(
+    [Output('active-filters', 'data', allow_duplicate=True),
+     Output('parallel-coordinates', 'figure', allow_duplicate=True)],
+    [Input('scatter-graph', 'selectedData'),
+     State('scatter-x', 'value'),
+     State('scatter-y', 'value'),
+     State('df-columns', 'data')],
+    prevent_initial_call=True,
+)
+@instrument
+def update_scatter_filters(selected_data, x, y, df_columns):
+    """If a box selection is made in the scatter plot, filter the X and Y
+    columns to the selected ranges, like a brush on the parallel coordinates
+    plot. The lasso is removed from the mode bar, a polygon is not a range of
+    the columns.
+
+    The ranges are also drawn on the parallel coordinates plot."""
+    if not x or not y:
+        return dash.no_update, dash.no_update
+    if selected_data and not selected_data.get('range'):
+        # not a box, only a box is a range of the columns
+        return dash.no_update, dash.no_update
+
+    ranges = {x: None, y: None}
+    if selected_data:
+        bounds = selected_data['range']
+        ranges[x] = [min(bounds['x']), max(bounds['x'])]
+        ranges[y] = [min(bounds['y']), max(bounds['y'])]
+
+    new_filters = Patch()
+    new_fig = Patch()
+    for col, rng in ranges.items():
+        new_filters[col] = [rng] if rng else None
+        if col in df_columns:
+            dimension = new_fig['data'][0]['dimensions'][df_columns.index(col)]
+            dimension['constraintrange'] = rng
+    return new_filters, new_fig
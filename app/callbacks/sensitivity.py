@@ -0,0 +1,79 @@
+"""Module for sensitivity callbacks."""
+import dash
+from dash.dependencies import Input, Output, State
+import plotly.graph_objects as go
+
+import background
+from datasets import get_dataset, rows_key
+from metrics import instrument, add_rows
+from selection import selection_rows
+from sensitivity import dataset_sensitivity
+
+
+MEASURE_RANGES = {
+    'pearson': (-1, 1),
+    'spearman': (-1, 1),
+    'main_effect': (0, 1),
+}
+
+
+def create_sensitivity_figure(result, measure, labels) -> go.Figure:
+    """Heatmap of a measure with the outputs as rows and the inputs as
+    columns."""
+    matrix = result[measure]
+    z = [[matrix[i][j] for i in range(len(result['inputs']))]
+         for j in range(len(result['outputs']))]
+    zmin, zmax = MEASURE_RANGES[measure]
+    fig = go.Figure(go.Heatmap(
+        z=z,
+        x=[labels.get(c, c) for c in result['inputs']],
+        y=[labels.get(c, c) for c in result['outputs']],
+        zmin=zmin, zmax=zmax,
+        colorscale='RdBu' if zmin < 0 else 'Blues',
+        reversescale=zmin < 0,
+        texttemplate='%{z:.2f}',
+        hovertemplate='%{x} → %{y}: %{z:.3f}<extra></extra>',
+    ))
+    fig.update_layout(
+        height=120 + 40 * len(result['outputs']),
+        margin={'l': 10, 'r': 10, 't': 10, 'b': 10},
+        yaxis={'autorange': 'reversed'},
+    )
+    return fig
+
+
+@dash.callback(
+    [Output('sensitivity-graph', 'figure'),
+     Output('sensitivity-interval', 'disabled'),
+     Output('sensitivity-status', 'children')],
+    [Input('sensitivity-measure', 'value'),
+     Input('sensitivity-scope', 'value'),
+     Input('active-rows', 'data'),
+     Input('dataset-version', 'data'),
+     Input('sensitivity-interval', 'n_intervals'),
+     State('labels', 'data')],
+)
+@instrument
+def update_sensitivity(measure, scope, active_rows, dataset_version,
+                       n_intervals, labels):
+    """If the measure, the scope or the brushed designs change, update the
+    sensitivity heatmap.
+
+    The matrix is computed in a background thread and cached per dataset
+    version and row ids. While it runs, the interval is enabled and polls this
+    callback, so brushing is never blocked by the computation."""
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return dash.no_update, True, None
+
+    rows = selection_rows(dataset, active_rows) if scope == 'brushed' else None
+    result = background.result(
+        (dataset.version, rows_key(rows)), dataset_sensitivity, dataset, rows)
+    if result is None:
+        return dash.no_update, False, 'Computing...'
+
+    add_rows(result['rows'])
+    if not result['inputs'] or not result['outputs']:
+        return {}, True, 'At least one in: and one out: column are needed.'
+    status = f'{result["rows"]} designs'
+    return create_sensitivity_figure(result, measure, labels), True, status
@@ -3,6 +3,8 @@ import dash
 from dash import ALL, ctx
 from dash.dependencies import Input, Output, State
 
+from metrics import instrument
+
 
 @dash.callback(
     [Output(component_id='sort-ascending', component_property='data'),
@@ -11,6 +13,7 @@ from dash.dependencies import Input, Output, State
      State(component_id='sort-ascending', component_property='data')],
     prevent_initial_call=True
 )
+@instrument
 def update_sort_ascending(n_clicks, sort_ascending):
     """If a click is registered in the button-ascending, the data is updated in
     sort-ascending, the className is updated in button-ascending-icon, and the
@@ -28,6 +31,7 @@ def update_sort_ascending(n_clicks, sort_ascending):
      State('labels', 'data')],
     prevent_initial_call=True
 )
+@instrument
 def update_sort_by(n_clicks, labels):
     """If a click is registered in the sort by dropdown, the data is updated in
     sort-by-column, and the label is updated in sort-by-dropdown."""
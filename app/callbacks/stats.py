@@ -0,0 +1,40 @@
+"""Module for column statistics callbacks."""
+import dash
+from dash.dependencies import Input, Output, State
+
+from containers import create_column_stats_children
+from datasets import get_dataset
+from metrics import instrument, add_rows
+from selection import selection_rows
+from stats import column_stats
+
+
+@dash.callback(
+    Output('column-stats', 'children'),
+    [Input('active-rows', 'data'),
+     Input('dataset-version', 'data'),
+     Input('df-columns', 'data'),
+     State('parameters', 'data')],
+)
+@instrument
+def update_column_stats(active_rows, dataset_version, df_columns, parameters):
+    """If active-rows, the dataset or the plotted columns change, update the
+    statistics and the histograms of the plotted columns next to the parallel
+    coordinates plot.
+
+    The statistics of the full dataset are cached per dataset version and
+    column. The brushed subset is summarized from the row ids of the selection
+    in active-rows, None meaning that every row is active."""
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return []
+
+    stats = column_stats(dataset)
+    subset = None
+    if active_rows is not None:
+        rows = selection_rows(dataset, active_rows)
+        subset = stats.summarize(rows, df_columns)
+        add_rows(len(rows))
+
+    return create_column_stats_children(
+        stats.summarize(None, df_columns), subset, parameters)
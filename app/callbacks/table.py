@@ -1,13 +1,92 @@
 """Module for table callbacks."""
 import dash
-from dash.dependencies import Input, Output
+from dash import ctx
+from dash.dependencies import Input, Output, State
+import numpy as np
+
+from datasets import get_dataset
+from metrics import instrument, add_rows
+from selection import selection_count, selection_rows, sorted_rows
+
+
+DATABASE_SORT_ROWS = 100000
+
+
+def table_page(df, rows, page_current: int, page_size: int, columns=None):
+    """Return the records of a page of the active rows, in their order, None
+    meaning all the rows, and the number of pages. columns limits the records
+    to some columns. Sorted rows come from selection.sorted_rows.
+
+    Only the rows of the page are read from the DataFrame, so a table backed by
+    a column store stays cheap for millions of rows."""
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows, dtype=np.int64)
+    page_count = max((len(rows) + page_size - 1) // page_size, 1)
+    page_current = min(page_current or 0, page_count - 1)
+    page_rows = rows[page_current * page_size:(page_current + 1) * page_size]
+    page = df.iloc[page_rows]
+    if columns is not None:
+        page = page[[c for c in columns if c in df.columns]]
+    return page.to_dict('records'), page_count
+
+
+def selection_page(dataset, selection, page_current: int, page_size: int,
+                   sort_by, table_columns, rows=None):
+    """Return the records of a page of the active rows of a dataset, the number
+    of pages and the current page. rows are the row ids of the selection when
+    they are known already.
+
+    Sorted pages of at least DATABASE_SORT_ROWS rows of a large project are
+    queried from its database with the active filters, unless only the Pareto
+    front or the designs with an image are shown."""
+    columns = [c['id'] for c in table_columns] if table_columns else None
+    count = selection_count(dataset, selection)
+    database = dataset.database
+    if database is not None and database.ready and sort_by and \
+            not (selection and (selection['pareto'] or selection['images'])) and \
+            count >= DATABASE_SORT_ROWS:
+        filters = selection['filters'] if selection else None
+        data, page_count = database.page(
+            filters, count, page_current, page_size, sort_by, columns)
+    elif sort_by:
+        # the sort order of the selection is cached, see selection.sorted_rows
+        rows = sorted_rows(dataset, selection, sort_by[0]['column_id'],
+                           sort_by[0]['direction'] != 'desc')
+        data, page_count = table_page(
+            dataset.df, rows, page_current, page_size, columns)
+    else:
+        if rows is None:
+            rows = selection_rows(dataset, selection)
+        data, page_count = table_page(
+            dataset.df, rows, page_current, page_size, columns)
+    add_rows(len(data))
+    return data, page_count, min(page_current or 0, page_count - 1)
 
 
 @dash.callback(
-    Output('table', 'data', allow_duplicate=True),
-    Input('active-records', 'data'),
+    [Output('table', 'data', allow_duplicate=True),
+     Output('table', 'page_count', allow_duplicate=True),
+     Output('table', 'page_current', allow_duplicate=True)],
+    [Input('dataset-version', 'data'),
+     Input('table', 'page_current'),
+     Input('table', 'page_size'),
+     Input('table', 'sort_by'),
+     Input('table', 'columns'),
+     State('active-rows', 'data')],
     prevent_initial_call=True,
 )
-def update_table_data(active_records):
-    """If the active-records is changed, the data will be updated in table."""
-    return active_records
+@instrument
+def update_table_data(dataset_version, page_current, page_size, sort_by,
+                      table_columns, active_rows):
+    """If the page, the sorting or the columns of the table change, send the
+    records of the current page to the table. The records only have the
+    columns of the table.
+
+    A new project starts from the first page. A new selection is sent with the
+    active rows by callbacks.records.update_selection."""
+    dataset = get_dataset(dataset_version)
+    if dataset is None:
+        return [], 1, 0
+    if ctx.triggered_id == 'dataset-version':
+        page_current = 0
+    return selection_page(dataset, active_rows, page_current, page_size,
+                          sort_by, table_columns)
@@ -8,12 +8,19 @@ import dash
 from dash import ctx
 from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
-import pandas as pd
 import plotly.express as px
 
-from containers import create_color_by_children, create_sort_by_children
-from helper import process_dataframe
-from config import assets_path, upload_path, static_path
+from containers import create_color_by_children, create_sort_by_children, \
+    create_pareto_children, create_table_columns
+from blobs import content_hash, store_images
+from columnstore import load_columns
+from helper import default_axes
+from sqlstore import select_database
+from config import assets_path, upload_path, static_path, max_axes
+from datasets import register
+from manifest import build_manifest, load_manifest, write_manifest
+from metrics import instrument, add_rows
+from storage import uploads
 
 
 @dash.callback(
@@ -21,6 +28,7 @@ from config import assets_path, upload_path, static_path
      Output('select-pollination-project', 'style')],
     [Input('radio-items-input', 'value')]
 )
+@instrument
 def toggle_input_method(load_from_zip):
     """Toggle between sample project selection and ZIP upload."""
     if load_from_zip:
@@ -31,6 +39,20 @@ def toggle_input_method(load_from_zip):
         return {'display': 'block'}, {'display': 'none'}
 
 
+def _select_project(existing_projects, project_id):
+    # Add to existing projects if not present
+    if project_id not in [p['value'] for p in existing_projects]:
+        existing_projects.append({'label': project_id, 'value': project_id})
+
+    # Update options
+    options = existing_projects
+
+    # Show dropdown
+    style = {'display': 'block', 'width': '100%'}
+
+    return existing_projects, options, project_id, style
+
+
 @dash.callback(
     [Output('uploaded-projects-store', 'data'),
      Output('select-uploaded-project-dropdown', 'options'),
@@ -41,6 +63,7 @@ def toggle_input_method(load_from_zip):
      State('uploaded-projects-store', 'data')],
     prevent_initial_call=True
 )
+@instrument
 def process_upload(contents, filename, existing_projects):
     """Process uploaded ZIP file and update project list."""
     if contents is None:
@@ -59,7 +82,14 @@ def process_upload(contents, filename, existing_projects):
     # Use stem as unique identifier/folder name
     project_id = file_path.stem
     extract_dir = upload_path.joinpath(project_id)
-    
+
+    # the same archive was extracted before, maybe under another name
+    digest = content_hash(decoded)
+    extracted = uploads.find_archive(digest)
+    if extracted is not None:
+        uploads.touch(extracted.name, force=True)
+        return _select_project(existing_projects, extracted.name)
+
     # Clean up existing directory if it exists
     if extract_dir.exists():
         shutil.rmtree(extract_dir)
@@ -84,17 +114,19 @@ def process_upload(contents, filename, existing_projects):
                 # TODO: Handle error - no data.csv found
                 raise PreventUpdate
 
-        # Add to existing projects if not present
-        if project_id not in [p['value'] for p in existing_projects]:
-            existing_projects.append({'label': project_id, 'value': project_id})
-        
-        # Update options
-        options = existing_projects
-        
-        # Show dropdown
-        style = {'display': 'block', 'width': '100%'}
+        # images identical to the ones of other projects are stored once
+        digests = store_images(extract_dir)
+        # the column store, and the database of a large project
+        select_database(csv_file)
+        write_manifest(
+            extract_dir, build_manifest(extract_dir, csv_file, digests))
+        uploads.set_archive(project_id, digest)
+
+        # make room for the new project, it is never removed itself
+        uploads.track(project_id)
+        uploads.enforce(keep=[project_id])
 
-        return existing_projects, options, project_id, style
+        return _select_project(existing_projects, project_id)
 
     except Exception as e:
         print(f"Error processing upload: {e}")
@@ -103,9 +135,9 @@ def process_upload(contents, filename, existing_projects):
 
 @dash.callback(
     [Output('project-folder', 'data', allow_duplicate=True),
-     Output('df', 'data', allow_duplicate=True),
-     Output('active-records', 'data', allow_duplicate=True),
+     Output('active-rows', 'data', allow_duplicate=True),
      Output('active-filters', 'data', allow_duplicate=True),
+     Output('dataset-version', 'data', allow_duplicate=True),
      Output('df-columns', 'data', allow_duplicate=True),
      Output('labels', 'data', allow_duplicate=True),
      Output('img-column', 'data', allow_duplicate=True),
@@ -113,6 +145,7 @@ def process_upload(contents, filename, existing_projects):
      Output('parallel-coordinates', 'figure', allow_duplicate=True),
      Output('sort-by', 'children', allow_duplicate=True),
      Output('color-by', 'children', allow_duplicate=True),
+     Output('pareto', 'children', allow_duplicate=True),
      Output('table', 'columns', allow_duplicate=True),
      Output('selected-image-info', 'children', allow_duplicate=True),
      Output('selected-image-container', 'style', allow_duplicate=True),
@@ -121,6 +154,7 @@ def process_upload(contents, filename, existing_projects):
     [Input('select-uploaded-project-dropdown', 'value')],
     prevent_initial_call=True
 )
+@instrument
 def load_uploaded_project_data(project_id):
     """Load data when an uploaded project is selected."""
     if not project_id:
@@ -128,15 +162,14 @@ def load_uploaded_project_data(project_id):
 
     # Construct path based on project_id
     project_dir = upload_path.joinpath(project_id)
+    uploads.touch(project_id, force=True)
     
-    # Find data.csv again (could optimize by storing path in store)
-    csv_file = project_dir.joinpath('data.csv')
-    if not csv_file.exists():
-        csv_files = list(project_dir.rglob('data.csv'))
-        if csv_files:
-            csv_file = csv_files[0]
-        else:
-            raise PreventUpdate
+    # The manifest written at ingest has the location of data.csv and the
+    # schema, projects extracted before it existed get one now
+    manifest = load_manifest(project_dir)
+    if manifest is None:
+        raise PreventUpdate
+    csv_file = project_dir.joinpath(manifest['csv'])
             
     # Set project folder for serving static files
     # The app serves /static/uploaded at static/uploaded
@@ -150,11 +183,20 @@ def load_uploaded_project_data(project_id):
     rel_path = csv_file.parent.relative_to(upload_path)
     project_folder = f'uploaded/{rel_path.as_posix()}'
 
-    dff = pd.read_csv(csv_file)
-    df_records = dff.to_dict('records')
+    dff, dataset_version = load_columns(csv_file)
+    add_rows(len(dff))
+    dataset_version = register(
+        dff, dataset_version, select_database(csv_file), source=csv_file)
+
+    labels, parameters = manifest['labels'], manifest['parameters']
+    input_columns = manifest['input_columns']
+    output_columns = manifest['output_columns']
+    image_columns = manifest['image_columns']
+    img_column = image_columns[0] if image_columns else None
 
-    labels, parameters, input_columns, output_columns, image_columns = \
-        process_dataframe(dff)
+    # wide studies start with some of their columns on the plot, the others
+    # are read from the column store when they are picked
+    axes = default_axes(input_columns, output_columns, max_axes)
 
     # color by first output column, or first input column
     if output_columns:
@@ -164,28 +206,14 @@ def load_uploaded_project_data(project_id):
         color_by = input_columns[0]
         sort_by = input_columns[0]
 
-    fig = px.parallel_coordinates(dff, color=color_by, labels=labels)
+    fig = px.parallel_coordinates(
+        dff, dimensions=axes, color=color_by, labels=labels)
 
-    img_columns = dff.filter(regex=f'^img:').columns
-    if img_columns.empty:
-        img_column = None
-    else:
-        img_column = img_columns[0]
-
-    columns = []
-    for value in parameters.values():
-        if value['type'] != 'img':
-            columns.append(
-                {'id': value['label'],
-                 'name': value['display_name']})
-        else:
-            columns.append(
-                {'id': value['label'],
-                 'name': value['display_name'],
-                 'hidden': True})
+    columns = create_table_columns(parameters, axes)
 
     sort_by_children = create_sort_by_children(parameters, sort_by)
     color_by_children = create_color_by_children(parameters, color_by)
+    pareto_children = create_pareto_children(parameters)
 
     active_filters = {}
     selected_image_info = None
@@ -196,9 +224,11 @@ def load_uploaded_project_data(project_id):
     if not img_column:
         main_images_container_style = {'display': 'none'} # Or hidden
 
-    return (project_folder, df_records, df_records, active_filters, list(dff.columns),
+    return (project_folder, None, active_filters,
+            dataset_version, axes,
             labels, img_column, parameters, fig,
-            sort_by_children, color_by_children, columns, selected_image_info,
+            sort_by_children, color_by_children, pareto_children, columns,
+            selected_image_info,
             selected_image_container_style, main_images_container_style,
             images_grid_style)
 
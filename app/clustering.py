@@ -0,0 +1,132 @@
+"""Module to pick representative designs of a large set of rows.
+
+Farthest-point sampling is used on the normalized in: columns (the points of
+the nearest-neighbour index). It starts from the design closest to the mean
+and adds the design farthest from every representative picked so far. Every
+row belongs to its closest representative. Each step is a vectorized pass
+over the rows, so k representatives of n rows cost O(nk). Above SAMPLE_ROWS
+rows the representatives are picked in a random sample and every row is then
+assigned to the closest one in chunks.
+
+The clusters of the recent subsets are kept in a least recently used cache of
+the process, bounded to representatives_cache_mb like the selections, since
+every brush has its own subset.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config import representatives_cache_mb
+from datasets import Dataset, rows_key
+from metrics import record_cache
+from neighbors import neighbor_index
+
+
+SAMPLE_ROWS = 50000
+ASSIGN_CHUNK_ROWS = 1 << 16
+
+_lock = threading.Lock()
+_clusters = OrderedDict()
+
+
+class Clusters:
+    """Representative row ids, and the cluster of every row of a subset."""
+
+    def __init__(self, rows: np.ndarray, centers: np.ndarray,
+                 labels: np.ndarray):
+        self.rows = rows
+        self.centers = centers
+        self.labels = labels
+        self.sizes = np.bincount(labels, minlength=len(centers))
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes + self.centers.nbytes + \
+            self.labels.nbytes + self.sizes.nbytes
+
+    def members(self, center: int) -> np.ndarray:
+        """Row ids of the cluster of a representative row id."""
+        position = np.flatnonzero(self.centers == center)
+        if not len(position):
+            return np.empty(0, dtype=np.int64)
+        return self.rows[self.labels == position[0]]
+
+
+def farthest_point_sampling(points: np.ndarray, k: int):
+    """Return the positions of k representative points and the index of the
+    closest representative of every point."""
+    n = len(points)
+    labels = np.zeros(n, dtype=np.int32)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), labels
+    first = int(np.argmin(np.square(points - points.mean(axis=0)).sum(axis=1)))
+    centers = [first]
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2 with a matrix-vector product per step
+    norms = np.einsum('ij,ij->i', points, points)
+    distances = norms - 2 * (points @ points[first]) + norms[first]
+    for c in range(1, min(k, n)):
+        following = int(np.argmax(distances))
+        if distances[following] <= 1e-6:
+            # every remaining point is a duplicate of a representative
+            break
+        new = norms - 2 * (points @ points[following]) + norms[following]
+        closer = new < distances
+        np.minimum(distances, new, out=distances)
+        labels[closer] = c
+        centers.append(following)
+    return np.asarray(centers, dtype=np.int64), labels
+
+
+def assign(points: np.ndarray, centers: np.ndarray,
+           chunk_rows: int = ASSIGN_CHUNK_ROWS) -> np.ndarray:
+    """Return the index of the closest center of every point."""
+    labels = np.empty(len(points), dtype=np.int32)
+    center_norms = np.einsum('ij,ij->i', centers, centers)
+    for start in range(0, len(points), chunk_rows):
+        chunk = points[start:start + chunk_rows]
+        # |x|^2 is the same for every center and is left out
+        distances = center_norms - 2 * (chunk @ centers.T)
+        labels[start:start + chunk_rows] = distances.argmin(axis=1)
+    return labels
+
+
+def _trim():
+    """Drop the least recently used clusters above representatives_cache_mb."""
+    limit = representatives_cache_mb * 1024 ** 2
+    total = sum(clusters.nbytes for clusters in _clusters.values())
+    while len(_clusters) > 1 and total > limit:
+        _, clusters = _clusters.popitem(last=False)
+        total -= clusters.nbytes
+
+
+def _compute(dataset: Dataset, rows, k: int) -> Clusters:
+    subset = np.arange(len(dataset.df)) if rows is None else \
+        np.asarray(rows, dtype=np.int64)
+    points = neighbor_index(dataset, 'in').points[subset]
+    if len(points) <= SAMPLE_ROWS:
+        centers, labels = farthest_point_sampling(points, k)
+    else:
+        # pick the representatives in a sample and assign every row after
+        sample = np.sort(np.random.default_rng(0).choice(
+            len(points), SAMPLE_ROWS, replace=False))
+        centers, _ = farthest_point_sampling(points[sample], k)
+        centers = sample[centers]
+        labels = assign(points, points[centers])
+    return Clusters(subset, subset[centers], labels)
+
+
+def representatives(dataset: Dataset, rows, k: int) -> Clusters:
+    """Cached clusters of the active row ids of a dataset, all rows if None."""
+    key = (dataset.version, rows_key(rows), k)
+    with _lock:
+        clusters = _clusters.get(key)
+        if clusters is not None:
+            _clusters.move_to_end(key)
+    record_cache('representatives', clusters is not None)
+    if clusters is None:
+        clusters = _compute(dataset, rows, k)
+        with _lock:
+            clusters = _clusters.setdefault(key, clusters)
+            _trim()
+    return clusters
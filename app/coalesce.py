@@ -0,0 +1,38 @@
+"""Module to drop stale brush requests.
+
+The browser numbers the brushes of a tab, see callbacks.records. Every brush
+carries the complete brush state of the plot, so only the latest one of a tab
+needs to be computed: a request is dropped when it arrives after a newer one
+of its tab, or when a newer one arrives while it is computed.
+
+The latest numbers live in the memory of the current process, so requests of
+a tab that land on different workers are not compared.
+"""
+import threading
+from collections import OrderedDict
+
+
+MAX_SESSIONS = 4096
+
+_lock = threading.Lock()
+_latest = OrderedDict()
+
+
+def start(session: str, seq: int) -> bool:
+    """Record a brush request of a tab, False if a newer one was received."""
+    with _lock:
+        latest = _latest.get(session)
+        if latest is not None and latest > seq:
+            return False
+        _latest[session] = seq
+        _latest.move_to_end(session)
+        while len(_latest) > MAX_SESSIONS:
+            _latest.popitem(last=False)
+    return True
+
+
+def is_latest(session: str, seq: int) -> bool:
+    """Return False if a newer brush request of the tab was received."""
+    with _lock:
+        latest = _latest.get(session)
+    return latest is None or latest <= seq
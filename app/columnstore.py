@@ -0,0 +1,231 @@
+"""Module to store the data.csv of a project as memory-mapped columns.
+
+The store of ``data.csv`` is the folder ``STORE_FOLDER/data`` next to it, so
+it is removed with the project. Numeric columns are ``<i>.npy`` arrays of the
+narrowest lossless dtype and text columns (img: paths) are ``<i>.offsets.npy``
+byte offsets into a ``<i>.blob`` file. ``meta.json`` holds the columns, the
+number of rows, the dataset version and the size and time of the CSV it was
+built from. A store is rebuilt when the CSV changes.
+
+The CSV is read in chunks of CHUNK_ROWS rows, once to find the type of every
+column and once to write it, so building a store does not need the whole
+table in memory. The numeric columns of the DataFrame returned by
+``load_columns`` are views of the memory maps: only the pages that are read
+are resident, and every worker process shares them through the OS cache.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helper import narrow_dtype
+
+
+STORE_FOLDER = '.columns'
+# stores of an older format are built again
+STORE_FORMAT = 2
+CHUNK_ROWS = 100000
+
+
+class StringColumn:
+    """Text values stored as offsets into a blob of UTF-8 bytes."""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def take(self, rows) -> list:
+        """Return the values of some row ids, None for missing values."""
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows].tolist()
+        ends = self.offsets[rows + 1].tolist()
+        blob = self.blob
+        return [self._decode(blob[start:end].tobytes())
+                for start, end in zip(starts, ends)]
+
+    def values(self) -> list:
+        offsets = self.offsets.tolist()
+        data = self.blob.tobytes()
+        return [self._decode(data[start:end])
+                for start, end in zip(offsets, offsets[1:])]
+
+    @staticmethod
+    def _decode(value: bytes):
+        # a missing value is stored as a single NUL byte
+        return None if value == b'\0' else value.decode('utf-8')
+
+
+class ColumnStore:
+    """Read access to the columns of a built store."""
+
+    def __init__(self, folder: Path):
+        self.folder = folder
+        self.meta = json.loads(folder.joinpath('meta.json').read_text())
+        self.rows = self.meta['rows']
+        self.version = self.meta['version']
+        self.columns = [c['name'] for c in self.meta['columns']]
+
+    def column(self, name: str):
+        """Return a read-only memory map, or a StringColumn for text."""
+        i = self.columns.index(name)
+        if self.meta['columns'][i]['kind'] == 'numeric':
+            return np.load(self.folder.joinpath(f'{i}.npy'), mmap_mode='r')
+        offsets = np.load(self.folder.joinpath(f'{i}.offsets.npy'), mmap_mode='r')
+        blob_file = self.folder.joinpath(f'{i}.blob')
+        if blob_file.stat().st_size == 0:
+            blob = np.empty(0, dtype=np.uint8)
+        else:
+            blob = np.memmap(blob_file, dtype=np.uint8, mode='r')
+        return StringColumn(offsets, blob)
+
+    def frame(self) -> pd.DataFrame:
+        """Return a DataFrame whose numeric columns are the memory maps."""
+        data = {}
+        for name in self.columns:
+            column = self.column(name)
+            if isinstance(column, StringColumn):
+                data[name] = pd.Series(column.values(), dtype='str')
+            else:
+                data[name] = column
+        return pd.DataFrame(data, copy=False)
+
+
+def store_folder(csv_file: Path) -> Path:
+    return csv_file.parent.joinpath(STORE_FOLDER, csv_file.stem)
+
+
+def _source(csv_file: Path) -> dict:
+    stat = csv_file.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _kinds(csv_file: Path, chunk_rows: int):
+    """Return the rows, and the kind and dtype of every column.
+
+    Numeric columns get the narrowest dtype that holds all their values, see
+    helper.narrow_dtype."""
+    rows = 0
+    dtypes = {}
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_rows):
+        rows += len(chunk)
+        for name, series in chunk.items():
+            previous = dtypes.get(name)
+            if previous is object or not (pd.api.types.is_numeric_dtype(series)
+                                          or pd.api.types.is_bool_dtype(series)):
+                dtypes[name] = object
+                continue
+            # the narrowest type of every chunk, promoted across chunks
+            dtype = series.dtype if pd.api.types.is_bool_dtype(series) else \
+                narrow_dtype(series.to_numpy())
+            if previous is None:
+                dtypes[name] = dtype
+            else:
+                dtypes[name] = np.result_type(previous, dtype)
+    return rows, dtypes
+
+
+def build(csv_file: Path, chunk_rows: int = CHUNK_ROWS) -> ColumnStore:
+    """Build the store of a CSV file and return it."""
+    folder = store_folder(csv_file)
+    folder.parent.mkdir(exist_ok=True)
+    source = _source(csv_file)
+    rows, dtypes = _kinds(csv_file, chunk_rows)
+    names = list(dtypes)
+    # build next to the final folder and rename it, so readers never see a
+    # partial store
+    temp = Path(tempfile.mkdtemp(prefix='.build-', dir=folder.parent))
+    try:
+        arrays, offsets, blobs = {}, {}, {}
+        for i, name in enumerate(names):
+            if dtypes[name] is object:
+                offsets[name] = np.lib.format.open_memmap(
+                    temp.joinpath(f'{i}.offsets.npy'), mode='w+',
+                    dtype=np.int64, shape=(rows + 1,))
+                offsets[name][0] = 0
+                blobs[name] = open(temp.joinpath(f'{i}.blob'), 'wb')
+            else:
+                arrays[name] = np.lib.format.open_memmap(
+                    temp.joinpath(f'{i}.npy'), mode='w+', dtype=dtypes[name],
+                    shape=(rows,))
+
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update('\x1f'.join(map(str, names)).encode())
+        start = 0
+        for chunk in pd.read_csv(csv_file, chunksize=chunk_rows):
+            end = start + len(chunk)
+            for name in names:
+                if name in arrays:
+                    arrays[name][start:end] = chunk[name].to_numpy(dtypes[name])
+                    chunk[name] = arrays[name][start:end]
+                    continue
+                values = chunk[name].astype('str')
+                missing = chunk[name].isna().tolist()
+                encoded = [b'\0' if m else v.encode('utf-8')
+                           for v, m in zip(values.tolist(), missing)]
+                lengths = np.fromiter(map(len, encoded), np.int64, len(encoded))
+                offsets[name][start + 1:end + 1] = \
+                    offsets[name][start] + np.cumsum(lengths)
+                blobs[name].write(b''.join(encoded))
+                chunk[name] = values.where(chunk[name].notna(), None)
+            # the same hash as datasets.dataset_version of the whole table
+            digest.update(pd.util.hash_pandas_object(chunk, index=False)
+                          .to_numpy(np.uint64).tobytes())
+            start = end
+
+        for array in list(arrays.values()) + list(offsets.values()):
+            array.flush()
+        for blob in blobs.values():
+            blob.close()
+        meta = {
+            'format': STORE_FORMAT,
+            'source': source,
+            'rows': rows,
+            'version': digest.hexdigest(),
+            'columns': [
+                {'name': name,
+                 'kind': 'text' if dtypes[name] is object else 'numeric',
+                 'dtype': 'str' if dtypes[name] is object else
+                 np.dtype(dtypes[name]).str}
+                for name in names],
+        }
+        temp.joinpath('meta.json').write_text(json.dumps(meta))
+        del arrays, offsets
+        if folder.exists():
+            shutil.rmtree(folder, ignore_errors=True)
+        try:
+            os.replace(temp, folder)
+        except OSError:
+            # another process built the store meanwhile
+            shutil.rmtree(temp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(temp, ignore_errors=True)
+        raise
+    return ColumnStore(folder)
+
+
+def open_store(csv_file: Path) -> ColumnStore:
+    """Return the store of a CSV file, built if missing or out of date."""
+    folder = store_folder(csv_file)
+    try:
+        store = ColumnStore(folder)
+        if store.meta.get('format') == STORE_FORMAT and \
+                store.meta['source'] == _source(csv_file):
+            return store
+    except (OSError, ValueError, KeyError):
+        pass
+    return build(csv_file)
+
+
+def load_columns(csv_file: Path):
+    """Return the DataFrame of a CSV file backed by its column store, and its
+    dataset version."""
+    store = open_store(Path(csv_file))
+    return store.frame(), store.version
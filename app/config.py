@@ -1,9 +1,109 @@
 """Config."""
 import os
+import sys
 from pathlib import Path
 
 assets_path = Path(__file__).parent.joinpath('assets')
-static_path = Path(__file__).parent.joinpath('static')
+# the fast launch build keeps the samples next to the executable, see build.py
+samples_path = Path(sys.executable).parent.joinpath('samples')
+if not (getattr(sys, 'frozen', False) and samples_path.exists()):
+    samples_path = assets_path.joinpath('samples')
+
+
+def user_data_path() -> Path:
+    """The folder of the data of the current user, kept across launches."""
+    if sys.platform == 'win32':
+        base = os.getenv('LOCALAPPDATA') or Path.home().joinpath('AppData', 'Local')
+    elif sys.platform == 'darwin':
+        base = Path.home().joinpath('Library', 'Application Support')
+    else:
+        base = os.getenv('XDG_DATA_HOME') or Path.home().joinpath('.local', 'share')
+    return Path(base).joinpath('Design Explorer')
+
+
+# projects, blobs and caches written at run time, below the app folder unless
+# DESIGN_EXPLORER_DATA_DIR points elsewhere, e.g. for a read-only install. The
+# app folder of a single executable is a temporary folder removed on exit, so
+# frozen builds use the data folder of the user: the sample copies, column
+# stores and projects are kept between launches.
+if os.getenv('DESIGN_EXPLORER_DATA_DIR'):
+    data_path = Path(os.getenv('DESIGN_EXPLORER_DATA_DIR'))
+elif getattr(sys, 'frozen', False):
+    data_path = user_data_path()
+else:
+    data_path = Path(__file__).parent
+static_path = data_path.joinpath('static')
 upload_path = static_path.joinpath('uploaded')
-pollination_path = Path(__file__).parent.joinpath('pollination')
+# image files shared by the projects, see blobs.py
+blob_path = static_path.joinpath('blobs')
+# the column store of every registered dataset version, see datasets.py
+dataset_path = static_path.joinpath('datasets')
+# copies of the sample projects, registered with their column stores
+sample_data_path = static_path.joinpath('samples')
+pollination_path = data_path.joinpath('pollination')
 base_path = os.getenv('POLLINATION_API_URL', 'https://api.staging.pollination.solutions')
+
+# log callbacks slower than this many milliseconds, 0 disables the slow log
+slow_callback_ms = float(os.getenv('DESIGN_EXPLORER_SLOW_CALLBACK_MS', '0'))
+
+# negotiate gzip/brotli compression of JSON, HTML, CSS and JS responses
+compress_responses = os.getenv('DESIGN_EXPLORER_COMPRESS', '1') != '0'
+
+# production server, see serve.py
+server_backend = os.getenv('DESIGN_EXPLORER_SERVER', 'auto')
+server_workers = int(os.getenv('DESIGN_EXPLORER_WORKERS', '2'))
+server_threads = int(os.getenv('DESIGN_EXPLORER_THREADS', '8'))
+server_keepalive = int(os.getenv('DESIGN_EXPLORER_KEEPALIVE', '30'))
+# let a reverse proxy send image files with X-Sendfile
+x_sendfile = os.getenv('DESIGN_EXPLORER_X_SENDFILE', '0') == '1'
+
+# number of designs in the similar designs strip of the selected image
+similar_designs = int(os.getenv('DESIGN_EXPLORER_SIMILAR_DESIGNS', '8'))
+
+# threads computing results in the background, e.g. the sensitivity of a subset
+background_workers = int(os.getenv('DESIGN_EXPLORER_BACKGROUND_WORKERS', '2'))
+
+# tiles shown by the representatives grid mode, one per cluster of designs
+representative_tiles = int(os.getenv('DESIGN_EXPLORER_REPRESENTATIVES', '200'))
+
+# points drawn by the scatter plot, larger selections are downsampled
+scatter_max_points = int(os.getenv('DESIGN_EXPLORER_SCATTER_POINTS', '50000'))
+
+# disk space shared by the extracted uploaded and Pollination projects and the
+# image blobs before the least recently used projects are removed, 0 disables
+# the quota
+storage_quota_mb = float(os.getenv('DESIGN_EXPLORER_STORAGE_QUOTA_MB', '10240'))
+# a project accessed in the last minutes is in use by a session and is kept
+storage_active_minutes = float(os.getenv('DESIGN_EXPLORER_STORAGE_ACTIVE_MINUTES', '30'))
+
+# rows per page of the data table, pages are read from the dataset on demand
+table_page_size = int(os.getenv('DESIGN_EXPLORER_TABLE_PAGE_SIZE', '100'))
+
+# projects with at least this many rows are filtered and paged with SQLite,
+# see sqlstore.py, 0 always uses NumPy
+sqlite_min_rows = int(os.getenv('DESIGN_EXPLORER_SQLITE_ROWS', '1000000'))
+
+# threads checking the image files of a project, a stat and a header read each
+image_check_threads = int(os.getenv('DESIGN_EXPLORER_IMAGE_CHECK_THREADS', '32'))
+
+# axes of the parallel coordinates plot when a project is loaded, the others
+# are added from the axes picker, 0 shows every in: and out: column
+max_axes = int(os.getenv('DESIGN_EXPLORER_MAX_AXES', '12'))
+
+# memory of the row ids and sort orders of the recent selections of each
+# process, see selection.py
+selection_cache_mb = float(os.getenv('DESIGN_EXPLORER_SELECTION_CACHE_MB', '256'))
+# memory of the clusters of the recent representatives grids of each process,
+# see clustering.py
+representatives_cache_mb = float(os.getenv('DESIGN_EXPLORER_REPRESENTATIVES_CACHE_MB', '128'))
+# brushed ranges are rounded outwards to this many significant digits of the
+# axis, so nearly identical brushes share their cached rows
+filter_precision = int(os.getenv('DESIGN_EXPLORER_FILTER_PRECISION', '4'))
+
+# a brush of the parallel coordinates plot is sent once the brushing pauses
+# for this many milliseconds, 0 sends every brush event
+brush_debounce_ms = int(os.getenv('DESIGN_EXPLORER_BRUSH_DEBOUNCE_MS', '150'))
+
+# the selected image is shown from deep zoom tiles when its width or height is
+# at least this many pixels and Pillow is installed, see deepzoom.py
+deepzoom_min_size = int(os.getenv('DESIGN_EXPLORER_DEEPZOOM_MIN_SIZE', '2048'))
@@ -293,6 +293,193 @@ def create_color_by_container(parameters, color_by) -> html.Div:
     return color_by_container
 
 
+def create_pareto_children(parameters) -> List:
+    """Function to create the children for selecting the objectives of the
+    Pareto front and how the front is used."""
+    options = []
+    for value in parameters.values():
+        if value['type'] == 'out':
+            label = value['label']
+            options.append({'label': f'Minimize {value["display_name"]}',
+                            'value': f'min:{label}'})
+            options.append({'label': f'Maximize {value["display_name"]}',
+                            'value': f'max:{label}'})
+
+    pareto_label = html.Label(children='Pareto front', className='color-by-label')
+    objectives_dropdown = dcc.Dropdown(
+        id='pareto-objectives',
+        options=options,
+        value=[],
+        multi=True,
+        placeholder='Select objectives',
+        style={'minWidth': '320px'}
+    )
+    mode_radio = dbc.RadioItems(
+        id='pareto-mode',
+        options=[
+            {'label': 'Off', 'value': 'off'},
+            {'label': 'Front only', 'value': 'front'},
+            {'label': 'Rank by front', 'value': 'rank'},
+        ],
+        value='off',
+        inline=True
+    )
+    pareto_info = html.Span(id='pareto-info', className='upload-tip')
+
+    return [pareto_label, objectives_dropdown, mode_radio, pareto_info]
+
+
+def create_pareto_container(parameters) -> html.Div:
+    """Function to create the Div that contains the Pareto front options."""
+    children = create_pareto_children(parameters)
+
+    pareto_container = html.Div(
+        className='color-by',
+        id='pareto',
+        children=children
+    )
+
+    return pareto_container
+
+
+def _format_number(value) -> str:
+    return f'{value:.4g}' if value is not None else '-'
+
+
+def create_column_stats_children(full, subset, parameters) -> List[html.Div]:
+    """Function to create the summary statistics and histograms of every
+    column, for the full dataset and the brushed subset.
+
+    full and subset are dictionaries from stats.ColumnStats.summarize. subset
+    is None if there is no selection."""
+    children = []
+    for column, stats in full.items():
+        subset_stats = subset[column] if subset is not None else None
+        histogram = stats['histogram']
+        highest = max(histogram) or 1
+        bars = []
+        for b, count in enumerate(histogram):
+            layers = [html.Div(className='column-stats-bar',
+                               style={'height': f'{100 * count / highest:.1f}%'})]
+            if subset_stats is not None:
+                brushed = subset_stats['histogram'][b]
+                layers.append(html.Div(
+                    className='column-stats-bar brushed',
+                    style={'height': f'{100 * brushed / highest:.1f}%'}))
+            bars.append(html.Div(layers, className='column-stats-bin'))
+
+        lines = [html.Div(
+            f'All: {stats["count"]} · mean {_format_number(stats.get("mean"))} · '
+            f'median {_format_number(stats.get("median"))} · '
+            f'[{_format_number(stats.get("min"))}, '
+            f'{_format_number(stats.get("max"))}]')]
+        if subset_stats is not None:
+            lines.append(html.Div(
+                f'Brushed: {subset_stats["count"]} · '
+                f'mean {_format_number(subset_stats.get("mean"))} · '
+                f'median {_format_number(subset_stats.get("median"))} · '
+                f'[{_format_number(subset_stats.get("min"))}, '
+                f'{_format_number(subset_stats.get("max"))}]',
+                className='column-stats-brushed'))
+
+        display_name = parameters[column]['display_name'] \
+            if column in parameters else column
+        children.append(html.Div([
+            html.Span(display_name, className='label-bold'),
+            html.Div(bars, className='column-stats-histogram'),
+            html.Div(lines, className='column-stats-text'),
+        ], className='column-stats-item'))
+
+    return children
+
+
+def create_axes_options(parameters) -> List[dict]:
+    """Function to create the options of the axes picker, every in: and out:
+    column."""
+    return [{'label': value['display_name'], 'value': value['label']}
+            for value in parameters.values() if value['type'] != 'img']
+
+
+def create_axes_container(parameters, axes) -> html.Div:
+    """Function to create the Div with the picker of the columns shown as axes
+    of the parallel coordinates plot."""
+    axes_label = html.Label(children='Axes', className='color-by-label')
+    axes_dropdown = dcc.Dropdown(
+        id='axes-picker',
+        options=create_axes_options(parameters),
+        value=axes,
+        multi=True,
+        clearable=False,
+        style={'minWidth': '320px', 'flex': '1'})
+    return html.Div([axes_label, axes_dropdown], className='color-by',
+                    id='axes')
+
+
+def create_table_columns(parameters, columns) -> List[dict]:
+    """Function to create the columns of the data table from the axes of the
+    parallel coordinates plot."""
+    return [{'id': parameters[column]['label'],
+             'name': parameters[column]['display_name']}
+            for column in columns if column in parameters]
+
+
+def create_scatter_container() -> html.Div:
+    """Function to create the Div with the X/Y scatter plot. Only its box
+    selections filter the designs, like the parallel coordinates plot, the
+    lasso is removed from the mode bar."""
+    scatter_label = html.Label(children='Scatter', className='color-by-label')
+    x_dropdown = dcc.Dropdown(id='scatter-x', placeholder='X axis',
+                              clearable=False, style={'minWidth': '200px'})
+    y_dropdown = dcc.Dropdown(id='scatter-y', placeholder='Y axis',
+                              clearable=False, style={'minWidth': '200px'})
+    container = html.Div([
+        html.Div([scatter_label, x_dropdown, y_dropdown,
+                  html.Span(id='scatter-info', className='upload-tip')],
+                 className='color-by'),
+        # a lasso is not a range of the X and Y columns, only box selections
+        dcc.Graph(id='scatter-graph',
+                  config={'modeBarButtonsToRemove': ['autoScale2d', 'lasso2d']}),
+    ], id='scatter')
+
+    return container
+
+
+def create_sensitivity_container() -> html.Div:
+    """Function to create the Div with the correlation and main effect matrix
+    between the inputs and the outputs."""
+    sensitivity_label = html.Label(
+        children='Sensitivity', className='color-by-label')
+    measure_radio = dbc.RadioItems(
+        id='sensitivity-measure',
+        options=[
+            {'label': 'Pearson', 'value': 'pearson'},
+            {'label': 'Spearman', 'value': 'spearman'},
+            {'label': 'Main effect', 'value': 'main_effect'},
+        ],
+        value='spearman',
+        inline=True
+    )
+    scope_radio = dbc.RadioItems(
+        id='sensitivity-scope',
+        options=[
+            {'label': 'All designs', 'value': 'all'},
+            {'label': 'Brushed designs', 'value': 'brushed'},
+        ],
+        value='all',
+        inline=True
+    )
+    container = html.Div([
+        html.Div([sensitivity_label, measure_radio, scope_radio,
+                  html.Span(id='sensitivity-status', className='upload-tip')],
+                 className='color-by'),
+        dcc.Graph(id='sensitivity-graph', config={'displayModeBar': False}),
+        # polls the background computation of the brushed designs
+        dcc.Interval(id='sensitivity-interval', interval=500, disabled=True),
+    ], id='sensitivity')
+
+    return container
+
+
 def create_sort_by_children(parameters, sort_by) -> html.Div:
     """Function to create the Div that contains the options for sorting the
     images in the grid."""
@@ -336,8 +523,24 @@ def create_sort_by_children(parameters, sort_by) -> html.Div:
                                id='sort-by-label',
                                className='sort-by-label')
 
+    grid_mode_radio = dbc.RadioItems(
+        id='grid-mode',
+        options=[
+            {'label': 'All designs', 'value': 'all'},
+            {'label': 'Representatives', 'value': 'representatives'},
+        ],
+        value='all',
+        inline=True
+    )
+    grid_cluster_back = dbc.Button(children='Back to representatives',
+                                   id='grid-cluster-back',
+                                   size='sm',
+                                   style={'display': 'none'})
+    grid_cluster_store = dcc.Store(id='grid-cluster', data=None)
+
     children = [sort_by_label, dropdown_menu, button_ascending, sort_by_store,
-                sort_ascending_store]
+                sort_ascending_store, grid_mode_radio, grid_cluster_back,
+                grid_cluster_store]
 
     return children
 
@@ -375,6 +578,29 @@ def create_images_grid_children(
     return children
 
 
+def create_similar_images_container() -> html.Div:
+    """Function to create the Div for the designs that are most similar to the
+    selected image."""
+    similar_label = html.Label(
+        children='Similar designs', className='color-by-label')
+    space_radio = dbc.RadioItems(
+        id='similar-space',
+        options=[
+            {'label': 'Inputs', 'value': 'in'},
+            {'label': 'Inputs and outputs', 'value': 'all'},
+        ],
+        value='in',
+        inline=True
+    )
+    container = html.Div(
+        [html.Div([similar_label, space_radio],
+                  className='similar-images-header'),
+         html.Div(id='similar-images', className='similar-images')],
+        id='similar-images-container', className='similar-images-container')
+
+    return container
+
+
 def create_images_container(images_div, parameters, sort_by) -> html.Div:
     """Function to create a Div for images."""
     children = create_sort_by_children(parameters, sort_by)
@@ -386,23 +612,39 @@ def create_images_container(images_div, parameters, sort_by) -> html.Div:
 
     images_container = html.Div(
         [dcc.Store(id='selected-image-data'),
+         dcc.Store(id='selected-image-dzi'),
          html.Div(
              [html.Div(
                  id='selected-image-info', className='selected-image-info'),
               html.Div(
                   children=[html.Img(
                       id='selected-image',
-                      className='selected-image')],
+                      className='selected-image'),
+                            html.Div(
+                                id='selected-image-zoom',
+                                className='selected-image-zoom')],
                   id='selected-image-wrapper',
-                  className='selected-image-wrapper')],
+                  className='selected-image-wrapper'),
+              create_similar_images_container()],
              id='selected-image-container',
              className='selected-image-container'),
          html.Div(
              children=images_div, id='images-grid', className='images-grid')],
         id='images-container', className='images-container')
 
+    # the designs whose image file is missing, see manifest.image_available
+    image_check = html.Div(
+        [dbc.Checklist(
+            id='images-available-only',
+            options=[{'label': 'Only designs with an image', 'value': 'on'}],
+            value=[],
+            switch=True,
+            inline=True),
+         html.Span(id='image-report', className='upload-tip')],
+        id='image-check', className='image-check')
+
     main_images_container = html.Div([
-        sort_container, images_container
+        sort_container, image_check, images_container
     ],
         id='main-images-container', className='main-images-container'
     )
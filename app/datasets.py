@@ -0,0 +1,217 @@
+"""Module with the server-side registry of loaded datasets.
+
+Loaders register the DataFrame of a project and put the returned dataset
+version, a hash of its content, in the dataset-version store. Callbacks use the
+version to get the DataFrame back, the browser never sends the rows, and to
+cache data derived from it (Pareto fronts, statistics, ...).
+
+The registry lives in the memory of the current process. When a version is not
+found, because another worker loaded the project or it was evicted, it is
+opened again from the column store it was registered with. Every loader,
+the samples included, registers its column store as source.
+
+A registered DataFrame is stored with the compact dtypes of
+``helper.dataframe_schema``: narrow numeric types and dictionary encoded text.
+The schema is cached per dataset version, so a DataFrame opened again is not
+scanned twice. The stable sort orders of its numeric columns are computed in
+the background when a callback first gets the dataset, see column_order.
+Registering, which also runs when the app is imported, never starts background
+work.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import background
+from columnstore import load_columns
+from config import dataset_path
+from helper import dataframe_schema
+from metrics import record_cache
+from sqlstore import select_database
+
+
+MAX_DATASETS = 8
+MAX_SCHEMAS = 64
+
+_lock = threading.Lock()
+_datasets = OrderedDict()
+_schemas = OrderedDict()
+
+
+class Dataset:
+    """A registered DataFrame and the values cached for it.
+
+    Large projects also have a database (see sqlstore.SqlStore) to filter and
+    page their rows with indexed queries."""
+
+    def __init__(self, version: str, df: pd.DataFrame, database=None):
+        self.version = version
+        self.df = df
+        self.database = database
+        self.cache = {}
+        self.presorted = False
+
+
+def dataset_version(df: pd.DataFrame) -> str:
+    """Return a short hash of the column names and values of a DataFrame."""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update('\x1f'.join(map(str, df.columns)).encode())
+    digest.update(
+        pd.util.hash_pandas_object(df, index=False).to_numpy(np.uint64).tobytes())
+    return digest.hexdigest()
+
+
+def rows_key(rows) -> str:
+    """Short hash of a list of row ids, 'all' for None. Used to cache values
+    derived from a subset of a dataset."""
+    if rows is None:
+        return 'all'
+    return hashlib.blake2b(
+        np.asarray(rows, dtype=np.int64).tobytes(), digest_size=8).hexdigest()
+
+
+def compact(version: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Return a DataFrame with the compact dtypes of its dataset version.
+
+    Columns that keep their dtype, e.g. the memory maps of a column store, are
+    not copied."""
+    with _lock:
+        schema = _schemas.get(version)
+    record_cache('schemas', schema is not None)
+    if schema is None:
+        schema = dataframe_schema(df)
+        with _lock:
+            _schemas[version] = schema
+            while len(_schemas) > MAX_SCHEMAS:
+                _schemas.popitem(last=False)
+    schema = {k: v for k, v in schema.items() if k in df.columns}
+    return df.astype(schema) if schema else df
+
+
+def _store(version: str, df: pd.DataFrame, database=None) -> Dataset:
+    with _lock:
+        known = version in _datasets
+    if not known:
+        # outside of the lock, the schema pass reads every column
+        df = compact(version, df)
+    with _lock:
+        dataset = _datasets.get(version)
+        if dataset is None:
+            dataset = _datasets[version] = Dataset(version, df, database)
+        elif database is not None:
+            dataset.database = database
+        _datasets.move_to_end(version)
+        while len(_datasets) > MAX_DATASETS:
+            _datasets.popitem(last=False)
+    return dataset
+
+
+def register(df: pd.DataFrame, version: str = None, database=None,
+             source=None) -> str:
+    """Register a DataFrame and return its dataset version.
+
+    A column store passes the version it computed when it was built, so the
+    memory-mapped columns are not read to hash them again, and its CSV file as
+    source, so every worker can open the dataset of the version."""
+    df = df.reset_index(drop=True)
+    if version is None:
+        version = dataset_version(df)
+    _store(version, df, database)
+    if source is not None:
+        dataset_path.mkdir(parents=True, exist_ok=True)
+        dataset_path.joinpath(version).write_text(str(Path(source).resolve()))
+    return version
+
+
+def remove_sources(folder: Path) -> int:
+    """Remove the pointers of the versions whose CSV file is below a removed
+    project folder, and return their number."""
+    folder = Path(folder).resolve()
+    removed = 0
+    if not dataset_path.exists():
+        return removed
+    for pointer in dataset_path.iterdir():
+        try:
+            if folder in Path(pointer.read_text()).parents:
+                pointer.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def _open_source(version: str):
+    """Return the dataset of a version from its column store, or None."""
+    if not version.isalnum():
+        # the version comes from the browser, never a path
+        return None
+    try:
+        csv_file = Path(dataset_path.joinpath(version).read_text())
+        df, stored_version = load_columns(csv_file)
+    except (OSError, ValueError):
+        # the project was removed, or the version is not a column store
+        return None
+    if stored_version != version:
+        return None
+    return _store(version, df, select_database(csv_file))
+
+
+def get_dataset(version: str) -> Dataset:
+    """Return the dataset for a version.
+
+    If the version is unknown to this process it is opened from its column
+    store. None is returned when it is not available."""
+    with _lock:
+        dataset = _datasets.get(version)
+        if dataset is not None:
+            _datasets.move_to_end(version)
+    record_cache('datasets', dataset is not None)
+    if dataset is None and version:
+        dataset = _open_source(version)
+    if dataset is not None and not dataset.presorted:
+        # the sort orders are ready by the time the grid is sorted
+        dataset.presorted = True
+        background.submit(('presort', version), presort, dataset)
+    return dataset
+
+
+def cached(dataset: Dataset, name: str, key, compute):
+    """Return dataset.cache[(name, key)], calling compute() on a miss.
+
+    Hits and misses are reported to the metrics under name."""
+    cache_key = (name, key)
+    value = dataset.cache.get(cache_key)
+    record_cache(name, value is not None)
+    if value is None:
+        value = compute()
+        dataset.cache[cache_key] = value
+    return value
+
+
+def column_order(dataset: Dataset, column: str) -> np.ndarray:
+    """Cached stable argsort of a column, the row ids in ascending order with
+    NaN last. int32 row ids when they fit, to halve the memory."""
+    def compute():
+        order = np.argsort(dataset.df[column].to_numpy(), kind='stable')
+        return order.astype(np.int32) if len(order) < 2 ** 31 else order
+    return cached(dataset, 'column-order', column, compute)
+
+
+def presort(dataset: Dataset):
+    """Compute the column orders of the numeric columns of a dataset."""
+    for column in dataset.df.columns:
+        if pd.api.types.is_numeric_dtype(dataset.df[column]):
+            column_order(dataset, column)
+
+
+def first_rows(dataset: Dataset, column: str) -> dict:
+    """Cached dictionary of the values of a column to the first row id that
+    has the value."""
+    def compute():
+        values = dataset.df[column].drop_duplicates()
+        return dict(zip(values.tolist(), values.index.tolist()))
+    return cached(dataset, 'first_rows', column, compute)
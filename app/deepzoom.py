@@ -0,0 +1,174 @@
+"""Module for the deep zoom tiles of the selected image.
+
+Large renders are shown from a Deep Zoom Image (DZI) pyramid instead of the
+original file. Level 0 is one pixel, every level doubles the size and the last
+level is the original image. A level is cut in tiles of TILE_SIZE pixels with
+TILE_OVERLAP pixels of overlap. The tiles are cut when the browser asks for
+them and cached in the .deepzoom folder of the project, so only the tiles in
+view are ever cut or downloaded.
+
+Pillow is needed to cut the tiles. Without it, and for images smaller than
+deepzoom_min_size, the original file is shown.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+from config import deepzoom_min_size
+from manifest import image_header
+from storage import project_path
+
+
+TILE_SIZE = 254
+TILE_OVERLAP = 1
+CACHE_FOLDER = '.deepzoom'
+# decoded images kept in memory while their tiles are cut
+MAX_IMAGES = 4
+# the formats Pillow writes the tiles in, others are cut to PNG
+TILE_FORMATS = {'jpeg': 'jpg', 'png': 'png'}
+# <image>_files/<level>/<col>_<row>.<format> below the project folder
+TILE_PATH = re.compile(
+    r'^(?P<image>.+)_files/(?P<level>\d+)/(?P<col>\d+)_(?P<row>\d+)'
+    r'\.(?P<format>png|jpg)$')
+
+_lock = threading.Lock()
+_images = OrderedDict()
+
+
+def pyramid(path: Path):
+    """Return the tile format, width and height of an image that is shown
+    from tiles, None if it is shown from its file."""
+    if Image is None:
+        return None
+    try:
+        image_format, width, height = image_header(path)
+    except OSError:
+        return None
+    if not width or not height or max(width, height) < deepzoom_min_size:
+        return None
+    return TILE_FORMATS.get(image_format, 'png'), width, height
+
+
+def max_level(width: int, height: int) -> int:
+    """Return the level of the original size."""
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_size(width: int, height: int, level: int):
+    """Return the width and height of a level."""
+    scale = 2 ** (max_level(width, height) - level)
+    return math.ceil(width / scale), math.ceil(height / scale)
+
+
+def descriptor(path: Path) -> str:
+    """Return the DZI descriptor of an image, None if it is shown from its
+    file."""
+    image = pyramid(path)
+    if image is None:
+        return None
+    extension, width, height = image
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+        f'Format="{extension}" Overlap="{TILE_OVERLAP}" '
+        f'TileSize="{TILE_SIZE}"><Size Width="{width}" Height="{height}"/>'
+        '</Image>')
+
+
+def deepzoom_url(project_folder: str, image: str):
+    """Return the URL of the DZI descriptor of an image of a project, None if
+    it is shown from its file."""
+    folder = project_path(project_folder)
+    if folder is None or pyramid(folder.joinpath(image)) is None:
+        return None
+    return f'deepzoom/{project_folder}/{image}.dzi'
+
+
+def parse_path(path: str):
+    """Return the image and the level, column, row and format of a tile from
+    the path of a deep zoom request below a project folder, with None for the
+    tile if the descriptor is requested. None if the path is neither."""
+    match = TILE_PATH.match(path)
+    if match is not None:
+        return match.group('image'), (
+            int(match.group('level')), int(match.group('col')),
+            int(match.group('row')), match.group('format'))
+    if path.endswith('.dzi') and len(path) > 4:
+        return path[:-4], None
+    return None
+
+
+def _cache_folder(path: Path) -> Path:
+    """The tiles of an image are kept per size and modification time, so a
+    replaced image gets new tiles."""
+    stat = path.stat()
+    stamp = hashlib.blake2b(
+        f'{stat.st_size}:{stat.st_mtime_ns}'.encode(), digest_size=6).hexdigest()
+    return path.parent.joinpath(CACHE_FOLDER, f'{path.name}_{stamp}_files')
+
+
+def _decoded(path: Path):
+    with _lock:
+        image = _images.get(path)
+        if image is not None:
+            _images.move_to_end(path)
+            return image
+    image = Image.open(path)
+    image.load()
+    with _lock:
+        _images[path] = image
+        while len(_images) > MAX_IMAGES:
+            _images.popitem(last=False)
+    return image
+
+
+def tile(path: Path, level: int, col: int, row: int, extension: str):
+    """Return the file of a tile of an image, cutting it if it is not cached.
+    None if the image is not shown from tiles or the tile is outside of the
+    pyramid or not in the format of the descriptor."""
+    image = pyramid(path)
+    if image is None or image[0] != extension:
+        return None
+    _, width, height = image
+    if not 0 <= level <= max_level(width, height):
+        return None
+    level_width, level_height = level_size(width, height, level)
+    if not (0 <= col * TILE_SIZE < level_width and
+            0 <= row * TILE_SIZE < level_height):
+        return None
+
+    target = _cache_folder(path).joinpath(
+        str(level), f'{col}_{row}.{extension}')
+    if target.exists():
+        return target
+
+    # the box of the tile in the level, with the overlap inside the level
+    left = max(col * TILE_SIZE - TILE_OVERLAP, 0)
+    top = max(row * TILE_SIZE - TILE_OVERLAP, 0)
+    right = min((col + 1) * TILE_SIZE + TILE_OVERLAP, level_width)
+    bottom = min((row + 1) * TILE_SIZE + TILE_OVERLAP, level_height)
+    scale = 2 ** (max_level(width, height) - level)
+    box = (left * scale, top * scale,
+           min(right * scale, width), min(bottom * scale, height))
+    cut = _decoded(path).resize(
+        (right - left, bottom - top), Image.BILINEAR, box=box,
+        reducing_gap=2.0)
+    if extension == 'jpg' and cut.mode != 'RGB':
+        cut = cut.convert('RGB')
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # another request can cut the same tile, the last rename wins
+    partial = target.with_name(f'{target.name}.{threading.get_ident()}.part')
+    cut.save(partial, format='JPEG' if extension == 'jpg' else 'PNG',
+             **({'quality': 85} if extension == 'jpg' else {}))
+    os.replace(partial, target)
+    return target
@@ -1,8 +1,15 @@
 """Module with helper functions."""
+import numpy as np
 import pandas as pd
 import socket
 
 
+# integer types tried by narrow_dtype, narrowest first
+INTEGER_DTYPES = (np.int8, np.int16, np.int32)
+# text columns with at most this ratio of distinct values are categorical
+CATEGORY_RATIO = 0.5
+
+
 def process_dataframe(df: pd.DataFrame):
     labels = {}
     parameters = {}
@@ -28,6 +35,58 @@ def process_dataframe(df: pd.DataFrame):
     return labels, parameters, input_columns, output_columns, image_columns
 
 
+def default_axes(input_columns, output_columns, max_axes: int = 0) -> list:
+    """Return the columns on the parallel coordinates plot of a new project.
+
+    Every in: and out: column, or at most max_axes of them. Outputs get at
+    least half of the axes when there are enough of them."""
+    columns = input_columns + output_columns
+    if not max_axes or len(columns) <= max_axes:
+        return columns
+    inputs = min(len(input_columns),
+                 max_axes - min(len(output_columns), max_axes // 2))
+    return input_columns[:inputs] + output_columns[:max_axes - inputs]
+
+
+def narrow_dtype(values: np.ndarray) -> np.dtype:
+    """Return the narrowest dtype that holds every value of a numeric array
+    exactly: int8, int16 or int32 for integers, float32 for floats."""
+    dtype = values.dtype
+    if dtype.kind in 'iu' and len(values):
+        low, high = values.min(), values.max()
+        for candidate in INTEGER_DTYPES:
+            info = np.iinfo(candidate)
+            if info.min <= low and high <= info.max:
+                return np.dtype(candidate)
+    elif dtype.kind == 'f' and dtype.itemsize > 4:
+        with np.errstate(over='ignore', invalid='ignore'):
+            narrow = values.astype(np.float32)
+        if np.array_equal(narrow.astype(dtype), values, equal_nan=True):
+            return np.dtype(np.float32)
+    return dtype
+
+
+def dataframe_schema(df: pd.DataFrame) -> dict:
+    """Return the compact dtype of the columns of a DataFrame that can be
+    stored in less memory without losing a value.
+
+    Numeric columns get the dtype of narrow_dtype, text columns that repeat
+    their values (categories, shared images) are dictionary encoded as
+    'category'. The other columns are left out."""
+    schema = {}
+    for name, series in df.items():
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_numeric_dtype(series):
+            dtype = narrow_dtype(series.to_numpy())
+            if dtype != series.dtype:
+                schema[name] = dtype.str
+        elif not isinstance(series.dtype, pd.CategoricalDtype) and \
+                series.nunique() <= len(series) * CATEGORY_RATIO:
+            schema[name] = 'category'
+    return schema
+
+
 def find_free_port(start_port=8050, max_tries=50):
     """
     Try to find an available TCP port starting from start_port.
@@ -68,4 +127,5 @@ def print_startup_banner(port: int=8050, app_name: str="Design Explorer"):
     print("  - Close this window, or")
     print("  - Press Ctrl+C in this console.")
     print("============================================")
-    print("")
\ No newline at end of file
+    # flush when the output is a pipe, e.g. benchmarks/launch.py
+    print("", flush=True)
\ No newline at end of file
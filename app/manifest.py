@@ -0,0 +1,359 @@
+"""Module for the manifest of an extracted project.
+
+The manifest is written once at ingest to MANIFEST_FILE in the project folder.
+It records where data.csv is, the schema returned by ``process_dataframe``,
+the number of rows and, for every image referenced by the img: columns, its
+size, content hash, format and pixel dimensions, or that it is missing.
+Loaders read it instead of searching the folder for data.csv. A manifest is
+built again when data.csv changed since it was written.
+
+The entries of the images are written to IMAGES_FILE next to it, so loading a
+project does not parse one entry per image. They are only read when the
+available images are needed, see ``image_available``. The files are encoded
+with orjson when it is installed, json otherwise.
+
+The images are checked by ``image_check_threads`` threads: a stat and a
+read of the first bytes of the file for the format and dimensions, the image
+is never decoded. The manifest keeps a report of the check, and
+``image_available`` gives the rows whose image exists to the grid and the
+filters.
+"""
+import itertools
+import json
+import logging
+import os
+import struct
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is optional
+    Image = None
+
+from blobs import file_hash
+from columnstore import open_store
+from config import image_check_threads, upload_path, pollination_path
+from datasets import Dataset, cached
+from helper import process_dataframe
+
+
+MANIFEST_FILE = '.manifest.json'
+IMAGES_FILE = '.manifest-images.json'
+MANIFEST_VERSION = 3
+HEADER_BYTES = 64
+JPEG_SCAN_BYTES = 1 << 16
+# missing images listed by the report, the others are only counted
+REPORT_MISSING = 100
+
+logger = logging.getLogger(__name__)
+
+
+def _jpeg_size(f):
+    # walk the segments until a start of frame marker
+    f.seek(2)
+    data = f.read(JPEG_SCAN_BYTES)
+    i = 0
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7 or marker == 0xFF:
+            i += 1 if marker == 0xFF else 2
+            continue
+        length = struct.unpack('>H', data[i + 2:i + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None, None
+
+
+def _pillow_size(path: Path):
+    # Pillow parses the segments of the whole file, e.g. a large EXIF block
+    # before the start of frame, without decoding the image
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def _header(f, path: Path):
+    head = f.read(HEADER_BYTES)
+    if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+        return ('png',) + struct.unpack('>II', head[16:24])
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return ('gif',) + struct.unpack('<HH', head[6:10])
+    if head.startswith(b'\xff\xd8'):
+        width, height = _jpeg_size(f)
+        if width is None:
+            width, height = _pillow_size(path)
+        return 'jpeg', width, height
+    if head.startswith(b'BM') and len(head) >= 26:
+        width, height = struct.unpack('<ii', head[18:26])
+        return 'bmp', width, abs(height)
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        chunk = head[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', head[26:30])
+            return 'webp', width & 0x3FFF, height & 0x3FFF
+        if chunk == b'VP8L':
+            bits = int.from_bytes(head[21:25], 'little')
+            return 'webp', (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b'VP8X':
+            return ('webp', int.from_bytes(head[24:27], 'little') + 1,
+                    int.from_bytes(head[27:30], 'little') + 1)
+    suffix = Path(path).suffix.lower().lstrip('.')
+    return suffix or None, None, None
+
+
+def image_header(path: Path):
+    """Return the format, width and height of an image from its header.
+
+    The dimensions are None when the format is not known."""
+    with open(path, 'rb') as f:
+        return _header(f, path)
+
+
+def inspect_image(path: Path, digest: str = None, hashed: bool = True) -> dict:
+    """Return the manifest entry of an image file."""
+    try:
+        # one open for the size and the header, a missing file fails here
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            image_format, width, height = _header(f, path)
+    except OSError:
+        return {'missing': True}
+    entry = {'missing': False, 'size': size,
+             'format': image_format, 'width': width, 'height': height}
+    if hashed:
+        entry['hash'] = digest or file_hash(path)
+    return entry
+
+
+def _inspect_chunk(paths, digests: dict, hashed: bool) -> list:
+    return [inspect_image(path, digests.get(path), hashed) for path in paths]
+
+
+def check_images(folder: Path, references, digests=None,
+                 hashed: bool = True) -> dict:
+    """Return the manifest entries of the images referenced from a folder.
+
+    The files are inspected by image_check_threads threads, the stat and the
+    header reads wait on the disk, not on the GIL."""
+    digests = digests or {}
+    paths = [folder.joinpath(reference) for reference in references]
+    threads = max(image_check_threads, 1)
+    # a task per chunk of images rather than per image, fewer futures
+    size = max(len(paths) // (threads * 4), 1)
+    chunks = [paths[i:i + size] for i in range(0, len(paths), size)]
+    with ThreadPoolExecutor(threads) as executor:
+        entries = executor.map(
+            _inspect_chunk, chunks, [digests] * len(chunks),
+            [hashed] * len(chunks))
+        return dict(zip(references, itertools.chain.from_iterable(entries)))
+
+
+def image_report(images: dict, rows_missing: int, seconds: float) -> dict:
+    """Return the report of an image check."""
+    missing = sorted(r for r, entry in images.items() if entry['missing'])
+    return {
+        'images': len(images),
+        'missing': len(missing),
+        'missing_examples': missing[:REPORT_MISSING],
+        'rows_missing': rows_missing,
+        'formats': dict(Counter(
+            entry['format'] for entry in images.values()
+            if not entry['missing'])),
+        'seconds': round(seconds, 3),
+    }
+
+
+def _source(csv_file: Path) -> dict:
+    stat = csv_file.stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def find_csv(folder: Path):
+    """Return data.csv of a project folder, or the first one below it."""
+    csv_file = folder.joinpath('data.csv')
+    if csv_file.exists():
+        return csv_file
+    return next(iter(sorted(folder.rglob('data.csv'))), None)
+
+
+def build_manifest(folder: Path, csv_file: Path, digests=None) -> dict:
+    """Build the manifest of a project folder.
+
+    digests maps image paths to the content hashes already computed by
+    blobs.store_images, the other images are hashed here."""
+    digests = digests or {}
+    store = open_store(csv_file)
+    df = store.frame()
+    labels, parameters, input_columns, output_columns, image_columns = \
+        process_dataframe(df)
+    # image paths are relative to the folder of data.csv
+    start = time.perf_counter()
+    references = list(dict.fromkeys(
+        value for column in image_columns
+        for value in df[column].dropna().unique().tolist()))
+    images = check_images(csv_file.parent, references, digests)
+    missing = [r for r, entry in images.items() if entry['missing']]
+    rows_missing = int(sum(df[column].isin(missing).sum()
+                           for column in image_columns))
+    report = image_report(images, rows_missing, time.perf_counter() - start)
+    if missing:
+        logger.warning('%d of the %d images of %s are missing, e.g. %s',
+                       report['missing'], report['images'], folder, missing[0])
+    return {
+        'version': MANIFEST_VERSION,
+        'csv': csv_file.relative_to(folder).as_posix(),
+        'source': _source(csv_file),
+        'rows': store.rows,
+        'dataset_version': store.version,
+        'labels': labels,
+        'parameters': parameters,
+        'input_columns': input_columns,
+        'output_columns': output_columns,
+        'image_columns': image_columns,
+        'images': images,
+        'report': report,
+    }
+
+
+def _dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def _loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _write(path: Path, value):
+    temp = path.with_name(f'{path.name}.tmp')
+    temp.write_bytes(_dumps(value))
+    temp.replace(path)
+
+
+def write_manifest(folder: Path, manifest: dict):
+    """Write a manifest from build_manifest, its images to IMAGES_FILE."""
+    manifest = dict(manifest)
+    images = manifest.pop('images')
+    # the images first, a manifest on disk always has its images
+    _write(folder.joinpath(IMAGES_FILE), {
+        'dataset_version': manifest['dataset_version'], 'images': images})
+    _write(folder.joinpath(MANIFEST_FILE), manifest)
+    return manifest
+
+
+def read_manifest(folder: Path):
+    """Return the manifest of a project folder, without its images, or None
+    if it is missing or data.csv changed since it was written."""
+    try:
+        manifest = _loads(folder.joinpath(MANIFEST_FILE).read_bytes())
+        csv_file = folder.joinpath(manifest['csv'])
+        if manifest['version'] == MANIFEST_VERSION and \
+                manifest['source'] == _source(csv_file):
+            return manifest
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def read_images(folder: Path, manifest: dict):
+    """Return the image entries of the manifest of a project folder, or None
+    if they are missing or were written for another data.csv."""
+    try:
+        images = _loads(folder.joinpath(IMAGES_FILE).read_bytes())
+        if images['dataset_version'] == manifest['dataset_version']:
+            return images['images']
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+
+def load_manifest(folder: Path, csv_file: Path = None):
+    """Return the manifest of a project folder, without its images, built
+    and written if needed.
+
+    None is returned when the folder has no data.csv."""
+    manifest = read_manifest(folder)
+    if manifest is not None:
+        return manifest
+    csv_file = csv_file or find_csv(folder)
+    if csv_file is None:
+        return None
+    return write_manifest(folder, build_manifest(folder, csv_file))
+
+
+def _project_root(folder: Path):
+    # the root of the project and its manifest, or None
+    roots = (upload_path.resolve(), pollination_path.resolve())
+    folder = Path(folder).resolve()
+    for root in [folder, *folder.parents]:
+        if root in roots or not any(r in root.parents for r in roots):
+            break
+        manifest = read_manifest(root)
+        if manifest is not None and \
+                root.joinpath(manifest['csv']).parent == folder:
+            return root, manifest
+    return None
+
+
+def project_manifest(folder: Path):
+    """Return the manifest of the project whose data.csv is in a folder, or
+    None.
+
+    The manifest is at the root of the project, which is the folder or one of
+    its parents below the uploaded or Pollination folder."""
+    project = _project_root(folder)
+    return project[1] if project is not None else None
+
+
+def image_available(dataset: Dataset, img_column: str,
+                    folder: Path) -> np.ndarray:
+    """Return whether the image of every row of a dataset exists, folder is
+    the folder of its data.csv.
+
+    The check of the manifest of the project is used when there is one, the
+    images of other projects (the samples) are checked once per dataset."""
+    def compute():
+        images = None
+        project = _project_root(folder)
+        if project is not None and img_column in project[1]['image_columns']:
+            # the references of the manifest are relative to data.csv
+            images = read_images(*project)
+        if images is None:
+            references = dataset.df[img_column].dropna().unique().tolist()
+            images = check_images(folder, references, hashed=False)
+        available = [r for r, entry in images.items() if not entry['missing']]
+        return dataset.df[img_column].isin(available).to_numpy()
+
+    return cached(dataset, 'image-available', (img_column, str(folder)),
+                  compute)
+
+
+def missing_images(dataset: Dataset, img_column: str, folder: Path) -> frozenset:
+    """Return the images of a dataset whose file is missing."""
+    def compute():
+        available = image_available(dataset, img_column, folder)
+        images = dataset.df[img_column].to_numpy()[~available]
+        return frozenset(v for v in set(images.tolist()) if v is not None)
+
+    return cached(dataset, 'missing-images', (img_column, str(folder)),
+                  compute)
@@ -0,0 +1,227 @@
+"""Module for callback performance metrics.
+
+Every Dash callback in ``callbacks/*.py`` is wrapped with ``instrument``. The
+wrapper records the wall time of each call while the Flask hooks in ``app.py``
+attribute the request and response bytes of ``_dash-update-component`` to the
+callback that handled them. Callbacks and caches can add rows processed and
+cache hits/misses through ``add_rows`` and ``record_cache``, and count the
+stale requests they drop with ``drop_request``.
+
+The counters live in the memory of the current process, so every gunicorn
+worker exposes its own numbers at ``/metrics``.
+"""
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from dash.exceptions import PreventUpdate
+from flask import g, has_request_context, request
+
+from config import slow_callback_ms
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_current_callback = ContextVar('current_callback', default=None)
+
+
+class CallbackStats:
+    """Counters for a single callback."""
+    __slots__ = ('calls', 'errors', 'seconds', 'buckets', 'request_bytes',
+                 'response_bytes', 'rows', 'dropped')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.rows = 0
+        self.dropped = 0
+
+
+_callbacks = {}
+_caches = {}
+
+
+def _callback_stats(name: str) -> CallbackStats:
+    stats = _callbacks.get(name)
+    if stats is None:
+        stats = _callbacks.setdefault(name, CallbackStats())
+    return stats
+
+
+def instrument(func):
+    """Decorator that records wall time, errors and rows for a callback.
+
+    It must be placed below ``@dash.callback`` so Dash registers the wrapped
+    function."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_callback.set(name)
+        if has_request_context():
+            g.callback_name = name
+        start = time.perf_counter()
+        failed = False
+        try:
+            return func(*args, **kwargs)
+        except PreventUpdate:
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_callback.reset(token)
+            _record_call(name, elapsed, failed)
+
+    return wrapper
+
+
+def _record_call(name: str, elapsed: float, failed: bool):
+    with _lock:
+        stats = _callback_stats(name)
+        stats.calls += 1
+        stats.seconds += elapsed
+        if failed:
+            stats.errors += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                stats.buckets[i] += 1
+                break
+    if slow_callback_ms and elapsed * 1000 >= slow_callback_ms:
+        logger.warning('Slow callback %s took %.1f ms', name, elapsed * 1000)
+
+
+def add_rows(rows: int):
+    """Add the number of rows processed by the callback that is running."""
+    name = _current_callback.get()
+    if name is None:
+        return
+    with _lock:
+        _callback_stats(name).rows += int(rows)
+
+
+def drop_request():
+    """Count a stale request dropped by the callback that is running."""
+    name = _current_callback.get()
+    if name is None:
+        return
+    with _lock:
+        _callback_stats(name).dropped += 1
+
+
+def record_cache(cache: str, hit: bool):
+    """Record a hit or a miss for the cache with the given name."""
+    with _lock:
+        counts = _caches.setdefault(cache, [0, 0])
+        counts[0 if hit else 1] += 1
+
+
+def cache_hit_rate(cache: str) -> float:
+    """Return the hit rate for a cache, or 0 if it has not been used yet."""
+    hits, misses = _caches.get(cache, (0, 0))
+    total = hits + misses
+    return hits / total if total else 0.0
+
+
+def record_response(response):
+    """Flask after_request hook that attributes payload bytes to a callback."""
+    name = g.get('callback_name')
+    if name is None or response.direct_passthrough:
+        return response
+    request_bytes = request.content_length or 0
+    response_bytes = response.calculate_content_length() or 0
+    with _lock:
+        stats = _callback_stats(name)
+        stats.request_bytes += request_bytes
+        stats.response_bytes += response_bytes
+    return response
+
+
+def reset():
+    """Clear all counters."""
+    with _lock:
+        _callbacks.clear()
+        _caches.clear()
+
+
+def snapshot() -> dict:
+    """Return a copy of the counters as plain dictionaries."""
+    with _lock:
+        callbacks = {
+            name: {slot: list(getattr(stats, slot))
+                   if slot == 'buckets' else getattr(stats, slot)
+                   for slot in CallbackStats.__slots__}
+            for name, stats in _callbacks.items()
+        }
+        caches = {
+            name: {'hits': hits, 'misses': misses}
+            for name, (hits, misses) in _caches.items()
+        }
+    return {'callbacks': callbacks, 'caches': caches}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus() -> str:
+    """Render the counters in the Prometheus text exposition format."""
+    data = snapshot()
+    callbacks = sorted(data['callbacks'].items())
+    lines = [
+        '# HELP design_explorer_callback_seconds Wall time spent in Dash callbacks.',
+        '# TYPE design_explorer_callback_seconds histogram',
+    ]
+    for name, stats in callbacks:
+        label = f'callback="{_escape(name)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+            cumulative += count
+            lines.append(
+                f'design_explorer_callback_seconds_bucket{{{label},le="{bound}"}} '
+                f'{cumulative}')
+        lines.append(
+            f'design_explorer_callback_seconds_bucket{{{label},le="+Inf"}} '
+            f'{stats["calls"]}')
+        lines.append(
+            f'design_explorer_callback_seconds_sum{{{label}}} {stats["seconds"]:.6f}')
+        lines.append(
+            f'design_explorer_callback_seconds_count{{{label}}} {stats["calls"]}')
+
+    counters = [
+        ('errors', 'errors_total', 'Callbacks that raised an exception.'),
+        ('request_bytes', 'request_bytes_total',
+         'Bytes received by _dash-update-component per callback.'),
+        ('response_bytes', 'response_bytes_total',
+         'Uncompressed bytes sent by _dash-update-component per callback.'),
+        ('rows', 'rows_total', 'Data rows processed per callback.'),
+        ('dropped', 'dropped_total',
+         'Stale requests dropped per callback.'),
+    ]
+    for key, suffix, description in counters:
+        metric = f'design_explorer_callback_{suffix}'
+        lines.append(f'# HELP {metric} {description}')
+        lines.append(f'# TYPE {metric} counter')
+        for name, stats in callbacks:
+            lines.append(f'{metric}{{callback="{_escape(name)}"}} {stats[key]}')
+
+    caches = sorted(data['caches'].items())
+    for key in ('hits', 'misses'):
+        metric = f'design_explorer_cache_{key}_total'
+        lines.append(f'# HELP {metric} Cache {key} per cache.')
+        lines.append(f'# TYPE {metric} counter')
+        for name, counts in caches:
+            lines.append(f'{metric}{{cache="{_escape(name)}"}} {counts[key]}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,115 @@
+"""Module to find the designs that are most similar to a selected design.
+
+The numeric in: columns, and optionally the out: columns, are scaled to [0, 1]
+so every parameter has the same weight. Similarity is the Euclidean distance in
+this normalized space.
+
+If SciPy is installed a KD-tree is built for up to MAX_TREE_DIMENSIONS
+columns. Otherwise, or for more columns where a tree is not faster than a
+linear scan, the distances are computed with matrix products in chunks of
+CHUNK_ROWS rows, and only the rows closer than the k-th neighbour within a
+random sample are sorted. The index is built once per dataset version and space.
+"""
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from datasets import Dataset, cached
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # SciPy is optional
+    cKDTree = None
+
+
+MAX_TREE_DIMENSIONS = 16
+CHUNK_ROWS = 1 << 18
+SAMPLE_ROWS = 4096
+
+# column prefixes of each similarity space
+SPACES = {
+    'in': ('in',),
+    'all': ('in', 'out'),
+}
+
+
+class NeighborIndex:
+    """Nearest-neighbour index of the normalized columns of a DataFrame."""
+
+    def __init__(self, df: pd.DataFrame, prefixes=('in',)):
+        # text inputs, e.g. an 'in:option' with names, have no distance
+        self.columns = [
+            c for c in df.columns if c.split(':', 1)[0] in prefixes and
+            pd.api.types.is_numeric_dtype(df[c])]
+        if self.columns:
+            values = df[self.columns].to_numpy(dtype=np.float64)
+        else:
+            values = np.zeros((len(df), 0))
+        minimum = np.nanmin(values, axis=0) if len(values) else 0
+        span = np.nanmax(values, axis=0) - minimum if len(values) else 1
+        span = np.where(span > 0, span, 1)
+        points = (values - minimum) / span
+        # a missing value is put in the middle of the axis
+        points = np.where(np.isnan(points), 0.5, points)
+        self.points = np.ascontiguousarray(points, dtype=np.float32)
+        self.tree = None
+        if cKDTree is not None and 0 < len(self.columns) <= MAX_TREE_DIMENSIONS:
+            self.tree = cKDTree(self.points, balanced_tree=False)
+            self.squared_norms = None
+        else:
+            self.squared_norms = np.einsum(
+                'ij,ij->i', self.points, self.points)
+            self.sample = np.sort(np.random.default_rng(0).choice(
+                len(self.points), min(len(self.points), SAMPLE_ROWS),
+                replace=False))
+
+    def __len__(self):
+        return len(self.points)
+
+    def _distances(self, rows, query: np.ndarray) -> np.ndarray:
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, the last term is the same for
+        # every row so it is left out
+        return self.squared_norms[rows] - 2 * (self.points[rows] @ query)
+
+    def _brute_force(self, query: np.ndarray, k: int):
+        # the k-th distance within a random sample is an upper bound of the
+        # k-th distance overall, only the rows below it need to be sorted
+        sample = self.sample if len(self.sample) >= k else \
+            np.arange(len(self.points))
+        bound = np.partition(self._distances(sample, query), k - 1)[k - 1]
+        bound += 1e-5 * (abs(bound) + 1)
+        candidates = []
+        for start in range(0, len(self.points), CHUNK_ROWS):
+            rows = slice(start, start + CHUNK_ROWS)
+            candidates.append(
+                np.flatnonzero(self._distances(rows, query) <= bound) + start)
+        candidates = np.concatenate(candidates)
+        # the expansion above loses precision, use the exact distances to
+        # sort the few candidates left
+        distances = np.sqrt(
+            np.square(self.points[candidates] - query).sum(axis=1))
+        order = np.argsort(distances, kind='stable')[:k]
+        return candidates[order], distances[order]
+
+    def query(self, row: int, k: int = 8) -> List[Tuple[int, float]]:
+        """Return the (row id, distance) of the k designs closest to a row.
+
+        The row itself is left out."""
+        if not len(self.columns) or len(self.points) < 2:
+            return []
+        k = min(k + 1, len(self.points))
+        query = self.points[row]
+        if self.tree is not None:
+            distances, rows = self.tree.query(query, k=k)
+            rows, distances = np.atleast_1d(rows), np.atleast_1d(distances)
+        else:
+            rows, distances = self._brute_force(query, k)
+        return [(int(r), float(d)) for r, d in zip(rows, distances)
+                if r != row][:k - 1]
+
+
+def neighbor_index(dataset: Dataset, space: str = 'in') -> NeighborIndex:
+    """Cached nearest-neighbour index of a dataset for a space in SPACES."""
+    return cached(dataset, 'neighbors', space, lambda: NeighborIndex(
+        dataset.df, SPACES.get(space, SPACES['in'])))
@@ -0,0 +1,257 @@
+"""Module to find the Pareto fronts of the out: columns.
+
+The functions below minimize every objective. ``objective_values`` flips the
+sign of the columns that are maximized and replaces missing values with a value
+worse than any other. Identical rows are collapsed before the fronts are
+computed, so dominance is always strict and duplicates share the same level.
+
+Two objectives use an O(n log n) sweep. Three objectives drop the rows
+dominated within blocks of SWEEP_BLOCK rows, then compare the remaining rows by
+divide and conquer, with a NumPy sort per level: O(n log² n) at most, with no
+Python loop over the rows. More objectives use a block based non-dominated sort
+where every block of rows is compared with the front found so far using NumPy
+broadcasting.
+"""
+import bisect
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from datasets import Dataset, cached
+
+
+# number of booleans compared at once by the block based sort
+BLOCK_ELEMENTS = 1 << 22
+BLOCK_ROWS = 256
+# rows compared with each other at once by the three objective front
+SWEEP_BLOCK = 32
+
+
+def parse_objectives(values: List[str]) -> Tuple[Tuple[str, str], ...]:
+    """Convert pareto-objectives dropdown values to (column, direction) pairs.
+
+    The values look like 'min:out:Energy' or 'max:out:Daylight'. If a column
+    is selected twice the last direction wins."""
+    objectives = {}
+    for value in values or []:
+        direction, column = value.split(':', 1)
+        objectives.pop(column, None)
+        objectives[column] = direction
+    return tuple(objectives.items())
+
+
+def objective_values(df: pd.DataFrame, objectives) -> np.ndarray:
+    """Return an (n, k) array to minimize for the (column, direction) pairs."""
+    columns = []
+    for column, direction in objectives:
+        values = df[column].to_numpy(dtype=float)
+        if direction == 'max':
+            values = -values
+        missing = np.isnan(values)
+        if missing.any():
+            worst = values[~missing].max() + 1 if (~missing).any() else 0.0
+            values = np.where(missing, worst, values)
+        columns.append(values)
+    return np.column_stack(columns)
+
+
+def _front_2d(values: np.ndarray) -> np.ndarray:
+    # sorted by the first objective, a row is dominated when an earlier row
+    # has a second objective that is smaller or equal
+    order = np.lexsort((values[:, 1], values[:, 0]))
+    second = values[order, 1]
+    best = np.minimum.accumulate(second)
+    dominated = np.empty(len(second), dtype=bool)
+    dominated[0] = False
+    dominated[1:] = second[1:] >= best[:-1]
+    mask = np.empty(len(values), dtype=bool)
+    mask[order] = ~dominated
+    return mask
+
+
+def _lex_order(values: np.ndarray) -> np.ndarray:
+    # the unique rows of non_dominated and front_levels are already sorted
+    head, tail = values[:-1], values[1:]
+    ordered = tail[:, -1] >= head[:, -1]
+    for k in range(values.shape[1] - 2, -1, -1):
+        ordered = (tail[:, k] > head[:, k]) | \
+            ((tail[:, k] == head[:, k]) & ordered)
+    if ordered.all():
+        return np.arange(len(values))
+    return np.lexsort(values.T[::-1])
+
+
+def _block_dominated(second: np.ndarray, third: np.ndarray) -> np.ndarray:
+    # compare every row with the earlier rows of its block
+    n = len(second)
+    pad = -n % SWEEP_BLOCK
+    second = np.append(second, np.full(pad, np.inf)).reshape(-1, SWEEP_BLOCK)
+    third = np.append(third, np.full(pad, np.inf)).reshape(-1, SWEEP_BLOCK)
+    # dominated[b, i, j] is True when row i of block b is not worse than j
+    dominated = (second[:, :, None] <= second[:, None, :]) & \
+        (third[:, :, None] <= third[:, None, :])
+    dominated &= np.triu(np.ones((SWEEP_BLOCK, SWEEP_BLOCK), dtype=bool), 1)
+    return dominated.any(axis=1).reshape(-1)[:n]
+
+
+def _front_3d(values: np.ndarray) -> np.ndarray:
+    # sorted by the first objective, a row is dominated when an earlier row
+    # has second and third objectives that are smaller or equal
+    order = _lex_order(values)
+    second = values[order, 1]
+    # equal values share a rank
+    third = np.unique(values[order, 2], return_inverse=True)[1].reshape(-1)
+    # drop the rows dominated within their block while that removes many
+    rows = np.arange(len(values))
+    while True:
+        dominated = _block_dominated(second[rows], third[rows])
+        if 2 * dominated.sum() < len(rows):
+            break
+        rows = rows[~dominated]
+    second, third = second[rows], third[rows]
+    n = len(rows)
+    top = int(third.max()) + 1
+    by_second = np.argsort(second, kind='stable')
+    # the rows of the second half of a segment are compared with the rows of
+    # its first half, the rows of a block were compared above
+    size = SWEEP_BLOCK
+    while size < n:
+        segment = by_second // (2 * size)
+        segments = (n - 1) // (2 * size) + 1
+        # by segment and second objective, a radix sort for 16 bit keys
+        index = by_second[np.argsort(
+            segment.astype(np.uint16) if segments <= 1 << 16 else segment,
+            kind='stable')]
+        first_half = index % (2 * size) < size
+        # the smallest third objective of the first half so far, shifted so
+        # that the running minimum starts again in every segment
+        shift = (segments - index // (2 * size)) * (top + 1)
+        best = np.minimum.accumulate(
+            np.where(first_half, third[index], top) + shift) - shift
+        dominated[index[~first_half & (best <= third[index])]] = True
+        size *= 2
+    mask = np.zeros(len(values), dtype=bool)
+    mask[order[rows[~dominated]]] = True
+    return mask
+
+
+def _dominates(candidates: np.ndarray, block: np.ndarray) -> np.ndarray:
+    # result[i, j] is True when candidates[j] <= block[i] in every objective
+    result = candidates[None, :, 0] <= block[:, 0, None]
+    for k in range(1, block.shape[1]):
+        result &= candidates[None, :, k] <= block[:, k, None]
+    return result
+
+
+def _front_nd(values: np.ndarray) -> np.ndarray:
+    # a row can only be dominated by rows with a smaller sum, ties are broken
+    # lexicographically so a dominating row always comes first
+    n, d = values.shape
+    keys = tuple(values[:, ::-1].T) + (values.sum(axis=1),)
+    order = np.lexsort(keys)
+    mask = np.zeros(n, dtype=bool)
+    front = np.empty((0, d))
+    for start in range(0, n, BLOCK_ROWS):
+        index = order[start:start + BLOCK_ROWS]
+        block = values[index]
+        chunk = max(1, BLOCK_ELEMENTS // len(block))
+        for f in range(0, len(front), chunk):
+            keep = ~_dominates(front[f:f + chunk], block).any(axis=1)
+            index, block = index[keep], block[keep]
+            if not len(block):
+                break
+        if not len(block):
+            continue
+        inside = _dominates(block, block)
+        np.fill_diagonal(inside, False)
+        keep = ~inside.any(axis=1)
+        front = np.vstack([front, block[keep]])
+        mask[index[keep]] = True
+    return mask
+
+
+def _front(values: np.ndarray) -> np.ndarray:
+    """Non-dominated mask for rows that are all different."""
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    d = values.shape[1]
+    if d == 1:
+        return values[:, 0] == values[:, 0].min()
+    if d == 2:
+        return _front_2d(values)
+    if d == 3:
+        return _front_3d(values)
+    return _front_nd(values)
+
+
+def _levels_2d(values: np.ndarray) -> np.ndarray:
+    # the tail of every front is its smallest second objective so far, a row
+    # goes to the first front whose tail is larger than its second objective
+    order = np.lexsort((values[:, 1], values[:, 0]))
+    levels = np.empty(len(values), dtype=np.int32)
+    tails = []
+    for i, y in zip(order.tolist(), values[order, 1].tolist()):
+        k = bisect.bisect_right(tails, y)
+        if k == len(tails):
+            tails.append(y)
+        else:
+            tails[k] = y
+        levels[i] = k
+    return levels
+
+
+def _levels(values: np.ndarray) -> np.ndarray:
+    d = values.shape[1]
+    if d == 1:
+        return np.argsort(np.argsort(values[:, 0])).astype(np.int32)
+    if d == 2:
+        return _levels_2d(values)
+    levels = np.empty(len(values), dtype=np.int32)
+    remaining = np.arange(len(values))
+    level = 0
+    while remaining.size:
+        mask = _front(values[remaining])
+        levels[remaining[mask]] = level
+        remaining = remaining[~mask]
+        level += 1
+    return levels
+
+
+def _unique_rows(values: np.ndarray):
+    # np.unique(axis=0) is slow on large arrays, sort the rows once instead
+    order = np.lexsort(values.T[::-1])
+    rows = values[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]).any(axis=1)
+    inverse = np.empty(len(rows), dtype=np.intp)
+    inverse[order] = np.cumsum(first) - 1
+    return rows[first], inverse
+
+
+def non_dominated(values: np.ndarray) -> np.ndarray:
+    """Return a boolean mask of the rows on the Pareto front."""
+    if len(values) == 0:
+        return np.zeros(0, dtype=bool)
+    unique, inverse = _unique_rows(values)
+    return _front(unique)[inverse]
+
+
+def front_levels(values: np.ndarray) -> np.ndarray:
+    """Return the front level of every row, 0 being the Pareto front."""
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int32)
+    unique, inverse = _unique_rows(values)
+    return _levels(unique)[inverse]
+
+
+def pareto_front(dataset: Dataset, objectives) -> np.ndarray:
+    """Cached Pareto front mask of a dataset for (column, direction) pairs."""
+    return cached(dataset, 'pareto_front', objectives, lambda: non_dominated(
+        objective_values(dataset.df, objectives)))
+
+
+def pareto_levels(dataset: Dataset, objectives) -> np.ndarray:
+    """Cached front levels of a dataset for (column, direction) pairs."""
+    return cached(dataset, 'pareto_levels', objectives, lambda: front_levels(
+        objective_values(dataset.df, objectives)))
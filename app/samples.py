@@ -1,10 +1,14 @@
 """Module for samples."""
-from pathlib import Path
-import pandas as pd
+import filecmp
+import shutil
+
 import plotly.express as px
 
-from containers import create_images_grid_children
-from helper import process_dataframe
+from containers import create_images_grid_children, create_table_columns
+from helper import default_axes, process_dataframe
+from columnstore import load_columns
+from config import samples_path, sample_data_path, max_axes
+from datasets import register
 
 
 sample_alias = {
@@ -23,11 +27,28 @@ sample_alias = {
 }
 
 
+def load_sample(sample_identifier: str):
+    """Return the DataFrame of a sample and its registered dataset version.
+
+    The data.csv of the sample is copied to sample_data_path and registered
+    with the column store of the copy, so every worker can open it again. A
+    single executable unpacks the samples with a new modification time at
+    every launch, so an existing copy is compared by content and kept, with
+    its column store, when it is the same."""
+    csv = samples_path.joinpath(sample_identifier, 'data.csv')
+    copy = sample_data_path.joinpath(sample_identifier, 'data.csv')
+    if not copy.exists() or not filecmp.cmp(csv, copy, shallow=True):
+        copy.parent.mkdir(parents=True, exist_ok=True)
+        temp = copy.with_name('data.csv.copy')
+        shutil.copy2(csv, temp)
+        temp.replace(copy)
+    df, version = load_columns(copy)
+    return df, register(df, version, source=copy)
+
+
 def load_sample_project(sample_identifier: str = sample_alias['daylight-factor']['id']):
-    project_folder = f'assets/samples/{sample_identifier}'
-    csv = Path(__file__).parent.joinpath('assets', 'samples', sample_identifier, 'data.csv')
-    df = pd.read_csv(csv)
-    df_records = df.to_dict('records')
+    project_folder = f'samples/{sample_identifier}'
+    df, dataset_version = load_sample(sample_identifier)
 
     labels, parameters, input_columns, output_columns, image_columns = \
         process_dataframe(df)
@@ -40,7 +61,9 @@ def load_sample_project(sample_identifier: str = sample_alias['daylight-factor']
         color_by = input_columns[0]
         sort_by = output_columns[0]
 
-    fig = px.parallel_coordinates(df, color=color_by, labels=labels)
+    axes = default_axes(input_columns, output_columns, max_axes)
+    fig = px.parallel_coordinates(
+        df, dimensions=axes, color=color_by, labels=labels)
 
     img_column = df.filter(regex=f'^img:').columns[0]
 
@@ -50,13 +73,7 @@ def load_sample_project(sample_identifier: str = sample_alias['daylight-factor']
     images_grid_children = create_images_grid_children(
         sorted_df_records, color_by, minimum, maximum, img_column, project_folder, 'Original')
 
-    columns = []
-    for value in parameters.values():
-        if value['type'] != 'img':
-            columns.append({'id': value['label'], 'name': value['display_name']})
-        else:
-            columns.append(
-                {'id': value['label'], 'name': value['display_name'], 'hidden': True})
+    columns = create_table_columns(parameters, axes)
 
     return (parameters, color_by, fig, images_grid_children, sort_by, project_folder,
-            df_records, df, labels, img_column, columns)
+            df, labels, img_column, columns, dataset_version, axes)
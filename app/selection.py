@@ -0,0 +1,238 @@
+"""Module for the selection of active rows.
+
+The active designs are the rows inside the brushed ranges of the parallel
+coordinates plot, optionally on the Pareto front of some objectives and with
+an image file. The active-rows store does not hold the row ids, which can be
+millions, but a small selection: the specification of these conditions, an id
+and the number of rows. Any worker resolves it to row ids with selection_rows.
+
+A selection looks like this:
+{
+    'id': '3f2a9c0d1e4b5a67',
+    'count': 1204,
+    'filters': {'in:X': [[[3.3, 5.8]]]},
+    'pareto': [['out:Energy', 'min']],
+    'images': ['img:Perspective', 'uploaded/project']
+}
+
+None means that every row is active.
+
+The brushed ranges are rounded outwards to filter_precision significant
+digits of their axis, much less than a pixel of the plot, and the row ids of
+a selection and their orders by column are kept in an LRU cache of the
+process, keyed by dataset version and selection id. Going back to a previous
+brush, or another session of the same project brushing the same ranges, skips
+the filtering and the sorting. The hit rate is reported as the 'selection'
+and 'selection-order' caches of the metrics.
+"""
+import hashlib
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from config import filter_precision, selection_cache_mb
+from datasets import Dataset, cached, column_order
+from manifest import image_available
+from metrics import record_cache
+from pareto import pareto_front
+from storage import project_path
+
+
+# a selection of at least 1 / WALK_RATIO of the rows is sorted by walking the
+# column order of the dataset
+WALK_RATIO = 32
+
+_lock = threading.Lock()
+_results = OrderedDict()
+
+
+class SelectionResult:
+    """The row ids of a selection, None for every row, and their orders by
+    column."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.orders = {}
+
+    @property
+    def nbytes(self) -> int:
+        if self.rows is None:
+            # the orders of every row are the column orders of the dataset
+            return 0
+        return self.rows.nbytes + sum(
+            order.nbytes for order in self.orders.values())
+
+
+def filter_rows(df: pd.DataFrame, filters) -> np.ndarray:
+    """Return the row ids of a DataFrame inside the ranges of active-filters.
+
+    A row is kept if it is inside any of the ranges of every filtered column.
+    The columns are compared as NumPy arrays, so the memory maps of a column
+    store are only read, never copied."""
+    mask = np.ones(len(df), dtype=bool)
+    for col, selection in (filters or {}).items():
+        if not selection:
+            # the selection has been removed, i.e., the value is None
+            continue
+        rng = selection[0]
+        # one selection [min, max] or multiple choices [[min, max], ...]
+        ranges = rng if isinstance(rng[0], list) else [rng]
+        values = df[col].to_numpy()
+        inside = np.zeros(len(df), dtype=bool)
+        for low, high in ranges:
+            # as floats, the column can be a narrow integer type
+            inside |= (values >= float(low)) & (values <= float(high))
+        mask &= inside
+    return np.flatnonzero(mask)
+
+
+def _axis_decimals(dataset: Dataset, column: str) -> int:
+    """Cached number of decimals of filter_precision significant digits of the
+    range of a column."""
+    def compute():
+        values = dataset.df[column].to_numpy()
+        span = float(np.nanmax(values) - np.nanmin(values)) if len(values) else 0
+        if not span > 0:
+            return filter_precision
+        return filter_precision - math.floor(math.log10(span))
+    return cached(dataset, 'axis-decimals', column, compute)
+
+
+def normalize_filters(dataset: Dataset, filters) -> dict:
+    """Return active-filters with the removed selections and unknown columns
+    dropped and the ranges of every column sorted and rounded outwards to the
+    precision of its axis, as {column: [[[min, max], ...]]}."""
+    normalized = {}
+    for col, selection in sorted((filters or {}).items()):
+        if not selection or col not in dataset.df.columns:
+            continue
+        rng = selection[0]
+        ranges = rng if isinstance(rng[0], list) else [rng]
+        scale = 10.0 ** _axis_decimals(dataset, col)
+        normalized[col] = [sorted(
+            [math.floor(float(low) * scale) / scale,
+             math.ceil(float(high) * scale) / scale]
+            for low, high in ranges)]
+    return normalized
+
+
+def selection_spec(dataset: Dataset, filters, objectives=(), img_column=None,
+                   project_folder=None):
+    """Return the specification of the active rows, None if every row is
+    active.
+
+    objectives are the (column, direction) pairs of the Pareto front to keep,
+    img_column and project_folder keep the rows whose image file exists."""
+    filters = normalize_filters(dataset, filters)
+    objectives = [list(o) for o in objectives if o[0] in dataset.df.columns]
+    images = None
+    if img_column is not None and project_path(project_folder) is not None:
+        images = [img_column, project_folder]
+    if not filters and not objectives and not images:
+        return None
+    return {'filters': filters, 'pareto': objectives, 'images': images}
+
+
+def selection_id(spec: dict) -> str:
+    """Short hash of a selection specification."""
+    text = json.dumps(
+        [spec['filters'], spec['pareto'], spec['images']], sort_keys=True)
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def _select_rows(dataset: Dataset, spec) -> np.ndarray:
+    rows = filter_rows(dataset.df, spec['filters'])
+    if spec['pareto']:
+        objectives = tuple(tuple(o) for o in spec['pareto'])
+        rows = rows[pareto_front(dataset, objectives)[rows]]
+    if spec['images']:
+        img_column, project_folder = spec['images']
+        available = image_available(
+            dataset, img_column, project_path(project_folder))
+        rows = rows[available[rows]]
+    return rows
+
+
+def _trim():
+    """Drop the least recently used results above selection_cache_mb."""
+    limit = selection_cache_mb * 1024 ** 2
+    total = sum(result.nbytes for result in _results.values())
+    while len(_results) > 1 and total > limit:
+        _, result = _results.popitem(last=False)
+        total -= result.nbytes
+
+
+def selection_result(dataset: Dataset, spec) -> SelectionResult:
+    """Return the cached SelectionResult of a selection specification, or of
+    every row if spec is None."""
+    key = (dataset.version, selection_id(spec) if spec else 'all')
+    with _lock:
+        result = _results.get(key)
+        if result is not None:
+            _results.move_to_end(key)
+    record_cache('selection', result is not None)
+    if result is None:
+        result = SelectionResult(_select_rows(dataset, spec) if spec else None)
+        with _lock:
+            result = _results.setdefault(key, result)
+            _trim()
+    return result
+
+
+def select_rows(dataset: Dataset, spec) -> np.ndarray:
+    """Return the row ids of a selection specification, None for every row."""
+    return selection_result(dataset, spec).rows
+
+
+def sorted_rows(dataset: Dataset, selection, column: str,
+                ascending: bool = True) -> np.ndarray:
+    """Return the row ids of a selection, or of every row if None, stably
+    sorted by a column.
+
+    The rows are picked from the order of the column computed when the
+    dataset was registered, a walk over the rows with a mask instead of a
+    sort, unless the selection is much smaller than the dataset. The
+    ascending order is cached with the rows of the selection, descending is
+    its reversal."""
+    result = selection_result(dataset, selection)
+    order = result.orders.get(column)
+    record_cache('selection-order', order is not None)
+    if order is None:
+        rows = result.rows
+        if rows is None:
+            order = column_order(dataset, column)
+        elif len(rows) * WALK_RATIO >= len(dataset.df):
+            order = column_order(dataset, column)
+            mask = np.zeros(len(dataset.df), dtype=bool)
+            mask[rows] = True
+            order = order[mask[order]]
+        else:
+            values = dataset.df[column].to_numpy()
+            order = rows[np.argsort(values[rows], kind='stable')]
+        with _lock:
+            order = result.orders.setdefault(column, order)
+            _trim()
+    return order if ascending else order[::-1]
+
+
+def make_selection(spec, rows) -> dict:
+    """Return the value of the active-rows store for a specification and its
+    row ids."""
+    if spec is None:
+        return None
+    return {'id': selection_id(spec), 'count': len(rows), **spec}
+
+
+def selection_rows(dataset: Dataset, selection) -> np.ndarray:
+    """Return the row ids of the value of the active-rows store, None for
+    every row."""
+    return select_rows(dataset, selection)
+
+
+def selection_count(dataset: Dataset, selection) -> int:
+    """Return the number of active rows."""
+    return len(dataset.df) if selection is None else selection['count']
@@ -0,0 +1,113 @@
+"""Module to estimate how much every in: column drives every out: column.
+
+Three measures are computed for every (input, output) pair using only the rows
+without missing values:
+
+* Pearson correlation, from the standardized columns and one matrix product.
+* Spearman correlation, the Pearson correlation of the ranks.
+* Main effect, the share of the variance of the output explained by the mean
+  output at each level of the input (first-order correlation ratio). Inputs
+  with more than MAIN_EFFECT_BINS distinct values are binned by quantiles.
+"""
+import numpy as np
+import pandas as pd
+
+from datasets import Dataset, cached
+
+
+MAIN_EFFECT_BINS = 10
+MEASURES = ('pearson', 'spearman', 'main_effect')
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    centered = values - values.mean(axis=0)
+    norm = np.sqrt(np.square(centered).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return centered / np.where(norm > 0, norm, np.nan)
+
+
+def pearson(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Pearson correlation between the columns of x and y, NaN if constant."""
+    return _standardize(x).T @ _standardize(y)
+
+
+def _ranks(values: np.ndarray) -> np.ndarray:
+    """Rank the values of every column, tied values get their average rank."""
+    ranks = np.empty(values.shape)
+    for i in range(values.shape[1]):
+        order = np.argsort(values[:, i])
+        ordered = values[order, i]
+        # the average of the positions first..last of a group of ties
+        first = np.concatenate(([True], ordered[1:] != ordered[:-1]))
+        starts = np.flatnonzero(first)
+        ends = np.append(starts[1:], len(ordered))
+        group = np.cumsum(first) - 1
+        ranks[order, i] = (starts + ends + 1)[group] / 2
+    return ranks
+
+
+def spearman(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Spearman correlation between the columns of x and y, ties averaged."""
+    return pearson(_ranks(x), _ranks(y))
+
+
+def _levels(values: np.ndarray, bins: int) -> np.ndarray:
+    levels, index = np.unique(values, return_inverse=True)
+    if len(levels) <= bins:
+        return index
+    edges = np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1])
+    return np.searchsorted(edges, values, side='right')
+
+
+def main_effects(x: np.ndarray, y: np.ndarray,
+                 bins: int = MAIN_EFFECT_BINS) -> np.ndarray:
+    """Share of the variance of every y column explained by every x column."""
+    mean = y.mean(axis=0)
+    total = np.square(y - mean).sum(axis=0)
+    effects = np.full((x.shape[1], y.shape[1]), np.nan)
+    for i in range(x.shape[1]):
+        index = _levels(x[:, i], bins)
+        counts = np.bincount(index)
+        sums = np.column_stack([
+            np.bincount(index, weights=y[:, j], minlength=len(counts))
+            for j in range(y.shape[1])])
+        used = counts > 0
+        level_means = sums[used] / counts[used, None]
+        explained = (counts[used, None] * np.square(level_means - mean)).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            effects[i] = np.where(total > 0, explained / total, np.nan)
+    return effects
+
+
+def sensitivity(df: pd.DataFrame) -> dict:
+    """Return the inputs, outputs and an (inputs, outputs) matrix per measure.
+
+    The matrices are lists of lists with None for undefined values."""
+    inputs = [c for c in df.columns if c.startswith('in:')
+              and pd.api.types.is_numeric_dtype(df[c])]
+    outputs = [c for c in df.columns if c.startswith('out:')
+               and pd.api.types.is_numeric_dtype(df[c])]
+    x = df[inputs].to_numpy(dtype=np.float64)
+    y = df[outputs].to_numpy(dtype=np.float64)
+    complete = ~(np.isnan(x).any(axis=1) | np.isnan(y).any(axis=1))
+    x, y = x[complete], y[complete]
+
+    result = {'inputs': inputs, 'outputs': outputs, 'rows': int(len(x))}
+    for measure, func in zip(MEASURES, (pearson, spearman, main_effects)):
+        if len(x) > 2 and inputs and outputs:
+            matrix = func(x, y)
+        else:
+            matrix = np.full((len(inputs), len(outputs)), np.nan)
+        result[measure] = np.where(
+            np.isnan(matrix), None, np.round(matrix, 4)).tolist()
+    return result
+
+
+def dataset_sensitivity(dataset: Dataset, rows=None) -> dict:
+    """Sensitivity of a dataset, or of a subset of its row ids.
+
+    The result for the full dataset is cached with the dataset version."""
+    if rows is None:
+        return cached(dataset, 'sensitivity', None,
+                      lambda: sensitivity(dataset.df))
+    return sensitivity(dataset.df.iloc[rows])
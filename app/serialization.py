@@ -0,0 +1,72 @@
+"""Module for fast JSON serialization of callback responses.
+
+Dash serializes every callback response with ``plotly.io.json.to_json_plotly``.
+Its orjson engine only works on plain data: as soon as a response contains a
+Dash component, a Patch or a pandas object it falls back to a recursive Python
+pass over the whole response, including every record. ``to_json`` instead lets
+orjson call ``_default`` for the few objects it does not know, so records,
+figures and NumPy arrays are encoded in C.
+"""
+import numpy as np
+import pandas as pd
+import plotly.io.json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is listed in requirements.txt
+    orjson = None
+
+
+_plotly_to_json = plotly.io.json.to_json_plotly
+
+# same escaping as plotly so the output can be embedded in HTML
+_SWAP = (
+    ('<', '\\u003c'),
+    ('>', '\\u003e'),
+    ('/', '\\u002f'),
+    ('\u2028', '\\u2028'),
+    ('\u2029', '\\u2029'),
+)
+
+
+def _default(obj):
+    if hasattr(obj, 'to_plotly_json'):
+        return obj.to_plotly_json()
+    if isinstance(obj, (pd.Series, pd.Index)):
+        if obj.dtype.kind in 'biuf':
+            return np.ascontiguousarray(obj.to_numpy())
+        return obj.tolist()
+    if isinstance(obj, np.ndarray):
+        # non-contiguous or object arrays
+        if obj.dtype.kind in 'biuf':
+            return np.ascontiguousarray(obj)
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    raise TypeError
+
+
+def to_json(plotly_object, pretty=False, engine=None):
+    """Drop-in replacement for plotly.io.json.to_json_plotly."""
+    if orjson is None or pretty or engine == 'json':
+        return _plotly_to_json(plotly_object, pretty=pretty, engine=engine)
+    try:
+        out = orjson.dumps(
+            plotly_object, default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        ).decode('utf8')
+    except TypeError:
+        # dates, sets and other types plotly knows how to clean
+        return _plotly_to_json(plotly_object, pretty=pretty, engine=engine)
+    for unsafe_char, safe_char in _SWAP:
+        if unsafe_char in out:
+            out = out.replace(unsafe_char, safe_char)
+    return out
+
+
+def install():
+    """Make Dash use to_json for layouts and callback responses."""
+    if orjson is not None:
+        plotly.io.json.to_json_plotly = to_json
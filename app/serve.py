@@ -0,0 +1,128 @@
+"""Module to run the app with a production WSGI server.
+
+Waitress is used for the desktop build. It is pure Python and works on Windows
+and inside PyInstaller. Gunicorn is used in the container, with gthread workers
+so each process serves several requests at once.
+
+The image and asset routes return file responses. Gunicorn sends them with
+sendfile(2) and waitress writes them from its I/O thread, so a grid of image
+requests only holds a worker thread for a moment and does not wait for the
+Dash callbacks that run at the same time.
+
+Gunicorn workers import the app themselves after the fork. The master never
+imports it, so no dataset, cache or thread of the app is shared by the
+workers.
+
+    python serve.py
+    python serve.py --server gunicorn --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import os
+import sys
+
+from config import server_backend, server_workers, server_threads, \
+    server_keepalive
+
+
+def choose_backend(name: str = 'auto') -> str:
+    """Return waitress or gunicorn for a backend name that may be auto."""
+    if name != 'auto':
+        return name
+    if getattr(sys, 'frozen', False) or os.name == 'nt':
+        return 'waitress'
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return 'waitress'
+    return 'gunicorn'
+
+
+def import_server():
+    """Import the app and return its Flask server."""
+    from app import server
+    return server
+
+
+def run_waitress(server, host: str, port: int, threads: int, keepalive: int):
+    from waitress import serve
+    serve(
+        server, host=host, port=port, threads=threads,
+        # close idle keep-alive connections after this many seconds
+        channel_timeout=keepalive,
+        connection_limit=max(100, threads * 16),
+        asyncore_use_poll=True,
+        ident='Design Explorer'
+    )
+
+
+def run_gunicorn(server, host: str, port: int, workers: int, threads: int,
+                 keepalive: int):
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        'bind': f'{host}:{port}',
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread',
+        'keepalive': keepalive,
+        'sendfile': True,
+        # loading a large project can take longer than the default 30 s
+        'timeout': 300,
+        'graceful_timeout': 30,
+    }
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # called in every worker, after the fork
+            return server if server is not None else import_server()
+
+    Application().run()
+
+
+def run(server, backend: str = server_backend, host: str = '127.0.0.1',
+        port: int = 8050, workers: int = server_workers,
+        threads: int = server_threads, keepalive: int = server_keepalive):
+    """Serve the Flask server with waitress or gunicorn.
+
+    With server None the app is imported by the gunicorn workers, or here for
+    the other servers."""
+    backend = choose_backend(backend)
+    if server is None and backend != 'gunicorn':
+        server = import_server()
+    if backend == 'waitress':
+        run_waitress(server, host, port, threads, keepalive)
+    elif backend == 'gunicorn':
+        run_gunicorn(server, host, port, workers, threads, keepalive)
+    elif backend == 'flask':
+        server.run(host=host, port=port, threaded=True)
+    else:
+        raise ValueError(f'Unknown server: {backend}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run Design Explorer.')
+    parser.add_argument('--server', default=server_backend,
+                        choices=['auto', 'waitress', 'gunicorn', 'flask'])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=server_workers,
+                        help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=server_threads,
+                        help='threads per process')
+    parser.add_argument('--keepalive', type=int, default=server_keepalive,
+                        help='seconds to keep an idle connection open')
+    args = parser.parse_args(argv)
+
+    backend = choose_backend(args.server)
+    print(f'Serving Design Explorer with {backend} on '
+          f'http://{args.host}:{args.port}/')
+    run(None, backend, args.host, args.port, args.workers, args.threads,
+        args.keepalive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""Module to query large projects with SQLite.
+
+Projects with at least ``sqlite_min_rows`` rows get a SQLite database next to
+their column store, ``.columns/<csv stem>.sqlite``. Every row is stored with
+its row id as the primary key, and every in:/out: column has an index.
+
+A sorted page of the data table becomes a WHERE ... ORDER BY ... LIMIT query
+built from active-filters. SQLite walks the index of the sorted column and
+stops after the page, where NumPy has to sort every active row. Brushing
+keeps the NumPy masks over the column store: with several brushed columns
+they are faster than SQLite, which uses one index per table.
+
+The database is built in the background from the column store and keeps its
+dataset version. Until it is ready the NumPy path is used. Every query opens
+its own read-only connection, so the workers and their threads never share
+one.
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import closing
+from pathlib import Path
+
+import background
+from columnstore import ColumnStore, open_store, store_folder
+from config import sqlite_min_rows
+
+
+INSERT_ROWS = 50000
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def where_clause(filters):
+    """Return the WHERE clause and parameters of active-filters.
+
+    The columns are prefixed with a unary + so SQLite does not use their
+    index. Pages are queried for large selections, for which walking the index
+    of the sorted column is much faster than sorting the selected rows."""
+    clauses, parameters = [], []
+    for col, selection in (filters or {}).items():
+        if not selection:
+            continue
+        rng = selection[0]
+        ranges = rng if isinstance(rng[0], list) else [rng]
+        clauses.append('(' + ' OR '.join(
+            f'+{_quote(col)} BETWEEN ? AND ?' for _ in ranges) + ')')
+        for low, high in ranges:
+            parameters.extend((low, high))
+    if not clauses:
+        return '', parameters
+    return 'WHERE ' + ' AND '.join(clauses), parameters
+
+
+class SqlStore:
+    """Indexed queries on the rows of a project."""
+
+    def __init__(self, path: Path, columns: list, version: str):
+        self.path = path
+        self.columns = columns
+        self.version = version
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        """True once the database of this dataset version is built."""
+        if not self._ready:
+            self._ready = _version(self.path) == self.version
+        return self._ready
+
+    def _connect(self):
+        return closing(sqlite3.connect(
+            f'{self.path.resolve().as_uri()}?mode=ro', uri=True,
+            check_same_thread=False))
+
+    def page(self, filters, count: int, page_current: int, page_size: int,
+             sort_by=None, columns=None):
+        """Return the records of a page of the count rows inside active-filters
+        and the number of pages, like callbacks.table.table_page."""
+        where, parameters = where_clause(filters)
+        order = 'row_id'
+        if sort_by:
+            column = _quote(sort_by[0]['column_id'])
+            if sort_by[0]['direction'] == 'desc':
+                # the reverse of the ascending order, missing values first
+                order = f'{column} DESC NULLS FIRST, row_id DESC'
+            else:
+                order = f'{column} ASC NULLS LAST, row_id'
+        page_count = max((count + page_size - 1) // page_size, 1)
+        page_current = min(page_current or 0, page_count - 1)
+        if columns is None:
+            columns = self.columns
+        columns = [c for c in columns if c in self.columns] or self.columns
+        select = ', '.join(map(_quote, columns))
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f'SELECT {select} FROM data {where} ORDER BY {order} '
+                'LIMIT ? OFFSET ?',
+                parameters + [page_size, page_current * page_size])
+            data = [dict(zip(columns, values)) for values in cursor]
+        return data, page_count
+
+
+def database_path(csv_file: Path) -> Path:
+    folder = store_folder(csv_file)
+    return folder.parent.joinpath(f'{folder.name}.sqlite')
+
+
+def _version(path: Path):
+    if not path.exists():
+        return None
+    try:
+        with closing(sqlite3.connect(
+                f'{path.resolve().as_uri()}?mode=ro', uri=True)) as connection:
+            return connection.execute(
+                "SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+    except (sqlite3.Error, TypeError):
+        return None
+
+
+def build(store: ColumnStore, path: Path, insert_rows: int = INSERT_ROWS):
+    """Write the rows of a column store to a SQLite database."""
+    descriptor, temp = tempfile.mkstemp(prefix='.build-', dir=path.parent)
+    os.close(descriptor)
+    temp = Path(temp)
+    kinds = {c['name']: c['kind'] for c in store.meta['columns']}
+    definitions = ', '.join(
+        f'{_quote(name)} {"REAL" if kinds[name] == "numeric" else "TEXT"}'
+        for name in store.columns)
+    columns = [store.column(name) for name in store.columns]
+    try:
+        with closing(sqlite3.connect(temp)) as connection:
+            connection.execute('PRAGMA journal_mode = OFF')
+            connection.execute('PRAGMA synchronous = OFF')
+            connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+            connection.execute(
+                f'CREATE TABLE data (row_id INTEGER PRIMARY KEY, {definitions})')
+            insert = (f'INSERT INTO data VALUES '
+                      f'({", ".join(["?"] * (len(columns) + 1))})')
+            for start in range(0, store.rows, insert_rows):
+                rows = range(start, min(start + insert_rows, store.rows))
+                values = [
+                    column.take(rows) if kinds[name] == 'text' else
+                    # NaN is stored as NULL
+                    [None if v != v else v
+                     for v in column[start:rows.stop].tolist()]
+                    for name, column in zip(store.columns, columns)]
+                connection.executemany(insert, zip(rows, *values))
+            for i, name in enumerate(store.columns):
+                if name.startswith(('in:', 'out:')) and kinds[name] == 'numeric':
+                    connection.execute(
+                        f'CREATE INDEX index_{i} ON data ({_quote(name)})')
+            connection.execute(
+                "INSERT INTO meta VALUES ('version', ?)", (store.version,))
+            connection.commit()
+        temp.replace(path)
+    except BaseException:
+        temp.unlink(missing_ok=True)
+        raise
+
+
+def select_database(csv_file):
+    """Return the SqlStore of a project with at least sqlite_min_rows rows, or
+    None to use the NumPy path. A missing or out of date database is built in
+    the background."""
+    csv_file = Path(csv_file)
+    store = open_store(csv_file)
+    if not sqlite_min_rows or store.rows < sqlite_min_rows:
+        return None
+    path = database_path(csv_file)
+    database = SqlStore(path, store.columns, store.version)
+    if not database.ready:
+        background.submit(('database', store.version), build, store, path)
+    return database
@@ -0,0 +1,103 @@
+"""Module to summarize the in: and out: columns of a dataset.
+
+The statistics of the full dataset are computed once per dataset version and
+column. The histogram bins are fixed by the full dataset and the bin of every
+value is kept per column, so the histogram of a brushed subset is a bincount
+of the active rows instead of a new pass over the records. The bins of a
+column are only computed when the column is first summarized, so a wide study
+only pays for the columns on the plot. The values themselves stay in the
+column store.
+"""
+import numpy as np
+import pandas as pd
+
+from datasets import Dataset, cached
+
+
+HISTOGRAM_BINS = 20
+QUANTILES = (0.25, 0.5, 0.75)
+
+
+class ColumnStats:
+    """Histogram edges, bin of every row and summary of the full dataset for
+    the numeric in: and out: columns of a dataset.
+
+    The values are read one column at a time from the DataFrame, which is
+    backed by the memory mapped column store, so no dense copy of the numeric
+    columns is kept. The edges, bins and full summary of a column are computed
+    the first time it is summarized."""
+
+    def __init__(self, df, bins: int = HISTOGRAM_BINS):
+        self.columns = [
+            c for c in df.columns if c.split(':', 1)[0] in ('in', 'out')
+            and pd.api.types.is_numeric_dtype(df[c])]
+        self.bins = bins
+        self.df = df
+        self._row_bins = {}
+        self._full = {}
+
+    def column_bins(self, column: str):
+        """Return the histogram edges of a column and the bin of every row,
+        -1 for a missing value."""
+        result = self._row_bins.get(column)
+        if result is None:
+            # a view of the column store, not a copy
+            values = np.asarray(self.df[column].to_numpy(), dtype=np.float64)
+            valid = ~np.isnan(values)
+            if valid.any():
+                low, high = values[valid].min(), values[valid].max()
+            else:
+                low, high = 0.0, 1.0
+            if low == high:
+                low, high = low - 0.5, high + 0.5
+            edges = np.linspace(low, high, self.bins + 1)
+            row_bins = np.full(len(values), -1, dtype=np.int16)
+            # the last bin includes its right edge like np.histogram
+            row_bins[valid] = np.clip(
+                np.searchsorted(edges, values[valid], side='right') - 1,
+                0, self.bins - 1)
+            result = self._row_bins[column] = edges, row_bins
+        return result
+
+    def _summarize_column(self, column: str, rows) -> dict:
+        _, row_bins = self.column_bins(column)
+        values = self.df[column].to_numpy()
+        if rows is not None:
+            values, row_bins = values[rows], row_bins[rows]
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        histogram = np.bincount(row_bins[row_bins >= 0], minlength=self.bins)
+        stats = {'count': int(len(values)), 'histogram': histogram.tolist()}
+        if len(values):
+            quantiles = np.quantile(values, QUANTILES)
+            stats.update(
+                min=float(values.min()),
+                max=float(values.max()),
+                mean=float(values.mean()),
+                q25=float(quantiles[0]),
+                median=float(quantiles[1]),
+                q75=float(quantiles[2]))
+        return stats
+
+    def summarize(self, rows=None, columns=None) -> dict:
+        """Return the statistics of columns, every column if None, for a list
+        of row ids, or for every row if rows is None."""
+        summary = {}
+        for column in self.columns if columns is None else columns:
+            if column not in self.columns:
+                continue
+            if rows is not None:
+                summary[column] = self._summarize_column(column, rows)
+                continue
+            stats = self._full.get(column)
+            if stats is None:
+                stats = self._full[column] = \
+                    self._summarize_column(column, None)
+            summary[column] = stats
+        return summary
+
+
+def column_stats(dataset: Dataset) -> ColumnStats:
+    """Cached ColumnStats of a dataset."""
+    return cached(dataset, 'column_stats', None,
+                  lambda: ColumnStats(dataset.df))
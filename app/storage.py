@@ -0,0 +1,252 @@
+"""Module to keep the extracted projects under a disk quota.
+
+Every project is a folder at a fixed depth below a storage root, for example
+``static/uploaded/<project>`` or ``pollination/<owner>/<project>/<artifact>``.
+Derived files of a project (column stores, tiles...) are written inside its
+folder, so they are removed with it.
+
+The last access of a project is the modification time of an ACCESS_FILE in its
+folder. The image routes and the loaders touch it, at most once every
+TOUCH_SECONDS per process, so the time is shared by every worker and survives
+restarts. The uploaded and Pollination projects share one quota, which also
+counts the image blobs they link to. When they grow over it, the least
+recently used projects of either root are removed. A project accessed in the
+last ``storage_active_minutes`` is in use by a session and is never removed,
+nor is a project passed in ``keep``.
+
+Every file is counted once by inode. The image of a project is a hardlink to
+its blob, so it is counted with the blobs and only freed when no other project
+links to it anymore.
+
+The hash of the archive a project was extracted from is kept in ARCHIVE_FILE,
+so the same archive uploaded again reuses the project.
+"""
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import blobs
+from config import upload_path, pollination_path, samples_path, blob_path, \
+    storage_quota_mb, storage_active_minutes
+from datasets import remove_sources
+
+
+ACCESS_FILE = '.last-access'
+ARCHIVE_FILE = '.archive-hash'
+TOUCH_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+_enforce_lock = threading.Lock()
+
+
+def _file_stats(folder: Path):
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                yield os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+
+
+def folder_size(folder: Path) -> int:
+    """Bytes used by the files below a folder, hardlinked files once."""
+    size = 0
+    seen = set()
+    for stat in _file_stats(folder):
+        if stat.st_nlink > 1:
+            if (stat.st_dev, stat.st_ino) in seen:
+                continue
+            seen.add((stat.st_dev, stat.st_ino))
+        size += stat.st_size
+    return size
+
+
+def private_size(folder: Path) -> int:
+    """Bytes of the files below a folder that are not linked elsewhere, the
+    linked images are counted with the blobs."""
+    return sum(stat.st_size for stat in _file_stats(folder)
+               if stat.st_nlink == 1)
+
+
+def freed_size(folder: Path) -> int:
+    """Bytes freed by removing a folder and the blobs only it links to."""
+    links = {}
+    for stat in _file_stats(folder):
+        key = (stat.st_dev, stat.st_ino)
+        count, _, _ = links.get(key, (0, 0, 0))
+        links[key] = count + 1, stat.st_nlink, stat.st_size
+    # the one link left outside of the folder is its blob
+    return sum(size for count, nlink, size in links.values()
+               if nlink - count <= 1)
+
+
+class ProjectStorage:
+    """Projects stored at a depth below a root folder."""
+
+    def __init__(self, root: Path, depth: int = 1):
+        self.root = root
+        self.depth = depth
+        self._lock = threading.Lock()
+        self._touched = {}
+        self._sizes = {}
+
+    def project_dir(self, path):
+        """Return the project folder of a path relative to the root, or None."""
+        parts = Path(path).parts[:self.depth]
+        if len(parts) < self.depth or any(p in ('..', '/', '') for p in parts):
+            return None
+        return self.root.joinpath(*parts)
+
+    def touch(self, path, force: bool = False):
+        """Record an access to the project of a path relative to the root."""
+        folder = self.project_dir(path)
+        if folder is None:
+            return
+        now = time.time()
+        with self._lock:
+            if not force and now - self._touched.get(folder, 0) < TOUCH_SECONDS:
+                return
+            self._touched[folder] = now
+        try:
+            folder.joinpath(ACCESS_FILE).touch()
+        except OSError:
+            # the project is not extracted or was removed
+            pass
+
+    def track(self, path):
+        """Record a new or replaced project, its size is measured again."""
+        folder = self.project_dir(path)
+        if folder is None:
+            return
+        with self._lock:
+            self._sizes.pop(folder, None)
+        self.touch(path, force=True)
+
+    def archive(self, path):
+        """Return the hash of the archive of a project, or None."""
+        folder = self.project_dir(path)
+        try:
+            return folder.joinpath(ARCHIVE_FILE).read_text().strip()
+        except (AttributeError, OSError):
+            return None
+
+    def set_archive(self, path, digest: str):
+        folder = self.project_dir(path)
+        if folder is not None:
+            folder.joinpath(ARCHIVE_FILE).write_text(digest)
+
+    def find_archive(self, digest: str):
+        """Return the project folder extracted from an archive, or None."""
+        for folder in self.projects():
+            if self.archive(folder.relative_to(self.root)) == digest:
+                return folder
+        return None
+
+    def last_access(self, folder: Path) -> float:
+        try:
+            return folder.joinpath(ACCESS_FILE).stat().st_mtime
+        except OSError:
+            return folder.stat().st_mtime
+
+    def size(self, folder: Path) -> int:
+        """Bytes of a project that are not in the blobs."""
+        with self._lock:
+            size = self._sizes.get(folder)
+        if size is None:
+            size = private_size(folder)
+            with self._lock:
+                self._sizes[folder] = size
+        return size
+
+    def projects(self) -> list:
+        """Return the project folders below the root."""
+        if not self.root.exists():
+            return []
+        return [p for p in self.root.glob('/'.join(['*'] * self.depth))
+                if p.is_dir()]
+
+    def usage(self) -> dict:
+        """Return the size and last access of every project."""
+        return {folder: (self.size(folder), self.last_access(folder))
+                for folder in self.projects()}
+
+    def remove(self, folder: Path):
+        """Remove a project folder and the dataset versions read from it."""
+        shutil.rmtree(folder, ignore_errors=True)
+        remove_sources(folder)
+        with self._lock:
+            self._sizes.pop(folder, None)
+            self._touched.pop(folder, None)
+
+    def enforce(self, keep=()) -> list:
+        """Enforce the shared quota, keeping the projects of the paths
+        relative to the root, and return the removed folders."""
+        return enforce({self.project_dir(path) for path in keep})
+
+
+uploads = ProjectStorage(upload_path, 1)
+pollination_projects = ProjectStorage(pollination_path, 3)
+storages = (uploads, pollination_projects)
+quota_bytes = int(storage_quota_mb * 1024 * 1024)
+active_seconds = storage_active_minutes * 60
+
+
+def enforce(keep=()) -> list:
+    """Remove the least recently used projects of every storage until they
+    and the blobs are within the quota, and return the removed folders."""
+    if not quota_bytes:
+        return []
+    with _enforce_lock:
+        usage = [(storage, folder, size, accessed)
+                 for storage in storages
+                 for folder, (size, accessed) in storage.usage().items()]
+        blob_size = folder_size(blob_path) if blob_path.exists() else 0
+        total = blob_size + sum(size for _, _, size, _ in usage)
+        now = time.time()
+        evicted = []
+        for storage, folder, _, accessed in sorted(
+                usage, key=lambda item: item[3]):
+            if total <= quota_bytes:
+                break
+            if folder in keep or now - accessed < active_seconds:
+                continue
+            freed = freed_size(folder)
+            storage.remove(folder)
+            total -= freed
+            evicted.append(folder)
+            logger.info('Removed project %s (%d bytes) to stay within the '
+                        'storage quota', folder, freed)
+        if evicted:
+            # the images only the removed projects linked to
+            blobs.remove_orphans()
+        if total > quota_bytes:
+            logger.warning('Projects and blobs use %d bytes, over the quota '
+                           'of %d bytes, but are in use', total, quota_bytes)
+        return evicted
+
+
+def touch_project(project_folder):
+    """Record an access to a project from its URL folder, e.g.
+    ``uploaded/<project>`` or ``pollination/<owner>/<project>/<artifact>``."""
+    if not project_folder:
+        return
+    prefix, _, path = project_folder.partition('/')
+    if prefix == 'uploaded':
+        uploads.touch(path)
+    elif prefix == 'pollination':
+        pollination_projects.touch(path)
+
+
+def project_path(project_folder):
+    """Return the folder on disk of a project from its URL folder, or None."""
+    if not project_folder:
+        return None
+    prefix, _, path = project_folder.partition('/')
+    roots = {'uploaded': upload_path, 'pollination': pollination_path,
+             'samples': samples_path}
+    if prefix not in roots:
+        return None
+    return roots[prefix].joinpath(path)
@@ -0,0 +1,5 @@
+"""The modules of the app are imported by name from the app folder."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
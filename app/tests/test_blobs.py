@@ -0,0 +1,78 @@
+"""Check that identical images of the projects are stored once."""
+import os
+import shutil
+
+import pytest
+
+import blobs
+from blobs import remove_orphans, store_images, write_file
+
+
+@pytest.fixture
+def blob_path(tmp_path, monkeypatch):
+    path = tmp_path.joinpath('blobs')
+    monkeypatch.setattr(blobs, 'blob_path', path)
+    return path
+
+
+def make_project(root, name, images):
+    folder = root.joinpath('uploaded', name)
+    folder.joinpath('images').mkdir(parents=True)
+    for name, data in images.items():
+        folder.joinpath('images', name).write_bytes(data)
+    folder.joinpath('data.csv').write_bytes(b'in:x\n1\n')
+    return folder
+
+
+def test_store_images(tmp_path, blob_path):
+    first = make_project(tmp_path, 'first', {'a.png': b'render a', 'b.png': b'render b'})
+    second = make_project(tmp_path, 'second', {'a.png': b'render a', 'c.JPG': b'c'})
+    digests = store_images(first)
+    assert digests == {path: blobs.file_hash(path)
+                       for path in first.joinpath('images').iterdir()}
+    assert len(store_images(second)) == 2
+    # the same render is one file on disk, the CSV is not an image
+    assert os.path.samefile(
+        first.joinpath('images', 'a.png'), second.joinpath('images', 'a.png'))
+    assert first.joinpath('images', 'a.png').read_bytes() == b'render a'
+    assert first.joinpath('data.csv').stat().st_nlink == 1
+    assert len(list(blob_path.glob('*/*'))) == 3
+    # storing again does not add links
+    assert store_images(first) == digests
+    assert first.joinpath('images', 'a.png').stat().st_nlink == 3
+    assert not list(first.rglob('.*.link'))
+
+
+def test_write_file(tmp_path, blob_path):
+    first = make_project(tmp_path, 'first', {'a.png': b'render a'})
+    second = make_project(tmp_path, 'second', {'a.png': b'render a'})
+    store_images(first)
+    store_images(second)
+    write_file(first.joinpath('images', 'a.png'), b'new render')
+    # the other project and the blob keep the old render
+    assert first.joinpath('images', 'a.png').read_bytes() == b'new render'
+    assert second.joinpath('images', 'a.png').read_bytes() == b'render a'
+    assert second.joinpath('images', 'a.png').stat().st_nlink == 2
+    assert not list(first.rglob('.*.write'))
+
+
+def test_remove_orphans(tmp_path, blob_path):
+    first = make_project(tmp_path, 'first', {'a.png': b'render a', 'b.png': b'render b'})
+    second = make_project(tmp_path, 'second', {'a.png': b'render a'})
+    store_images(first)
+    store_images(second)
+    shutil.rmtree(first)
+    # only the blob of b.png is not linked anymore
+    assert remove_orphans() == 1
+    assert len(list(blob_path.glob('*/*'))) == 1
+    assert second.joinpath('images', 'a.png').read_bytes() == b'render a'
+
+
+def test_store_files_in_chunks(tmp_path, blob_path, monkeypatch):
+    monkeypatch.setattr(blobs, 'image_check_threads', 3)
+    images = {f'{i}.png': b'render %d' % (i % 7) for i in range(50)}
+    folder = make_project(tmp_path, 'many', images)
+    digests = store_images(folder)
+    assert len(digests) == 50
+    assert digests == {path: blobs.file_hash(path) for path in digests}
+    assert len(list(blob_path.glob('*/*'))) == 7
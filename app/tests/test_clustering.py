@@ -0,0 +1,88 @@
+"""Check the representatives against a plain farthest-point sampling."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import clustering
+from clustering import assign, farthest_point_sampling, representatives
+from datasets import get_dataset, register
+
+
+def brute_sampling(points, k):
+    centers = [int(np.argmin(
+        np.square(points - points.mean(axis=0)).sum(axis=1)))]
+    while len(centers) < k:
+        distances = np.square(
+            points[:, None, :] - points[centers][None, :, :]).sum(axis=2)
+        centers.append(int(distances.min(axis=1).argmax()))
+    return np.asarray(centers)
+
+
+def closest(points, centers):
+    return np.square(
+        points[:, None, :] - centers[None, :, :]).sum(axis=2).argmin(axis=1)
+
+
+@pytest.fixture
+def points():
+    return np.random.default_rng(0).uniform(size=(600, 3))
+
+
+def test_farthest_point_sampling(points):
+    centers, labels = farthest_point_sampling(points, 12)
+    np.testing.assert_array_equal(centers, brute_sampling(points, 12))
+    np.testing.assert_array_equal(labels, closest(points, points[centers]))
+
+
+def test_duplicates():
+    points = np.repeat([[0.0, 0.0], [1.0, 1.0]], 5, axis=0)
+    centers, labels = farthest_point_sampling(points, 4)
+    assert len(centers) == 2
+    np.testing.assert_array_equal(labels, closest(points, points[centers]))
+
+
+def test_assign(points):
+    centers = points[[3, 50, 400]]
+    np.testing.assert_array_equal(
+        assign(points, centers, chunk_rows=64), closest(points, centers))
+
+
+def test_representatives(monkeypatch):
+    monkeypatch.setattr(clustering, '_clusters', clustering.OrderedDict())
+    # pick the representatives in a sample and assign every row after
+    monkeypatch.setattr(clustering, 'SAMPLE_ROWS', 100)
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'in:x': rng.uniform(0, 10, 1000),
+                       'in:y': rng.uniform(0, 1, 1000),
+                       'out:z': rng.normal(size=1000)})
+    dataset = get_dataset(register(df))
+    rows = np.flatnonzero(df['in:x'] < 5)
+    clusters = representatives(dataset, rows, 10)
+    assert len(clusters.centers) == 10
+    assert np.isin(clusters.centers, rows).all()
+    points = (df[['in:x', 'in:y']] - df[['in:x', 'in:y']].min()) / \
+        (df[['in:x', 'in:y']].max() - df[['in:x', 'in:y']].min())
+    points = points.to_numpy()
+    np.testing.assert_array_equal(
+        clusters.labels, closest(points[rows], points[clusters.centers]))
+    assert clusters.sizes.sum() == len(rows)
+    members = clusters.members(clusters.centers[2])
+    np.testing.assert_array_equal(members, rows[clusters.labels == 2])
+    assert representatives(dataset, rows, 10) is clusters
+
+
+def test_representatives_cache(monkeypatch):
+    monkeypatch.setattr(clustering, '_clusters', clustering.OrderedDict())
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({'in:x': rng.uniform(size=1000)})
+    dataset = get_dataset(register(df))
+    subsets = [np.arange(start, 1000) for start in (0, 100, 200)]
+    first = representatives(dataset, subsets[0], 5)
+    # room for about two subsets of this size
+    monkeypatch.setattr(
+        clustering, 'representatives_cache_mb', 2.5 * first.nbytes / 1024 ** 2)
+    last = [representatives(dataset, rows, 5) for rows in subsets[1:]][-1]
+    # the least recently used subset was dropped
+    assert len(clustering._clusters) == 2
+    assert representatives(dataset, subsets[2], 5) is last
+    assert representatives(dataset, subsets[0], 5) is not first
@@ -0,0 +1,63 @@
+"""Check that only the latest brush of a tab is computed."""
+import pytest
+
+import coalesce
+import metrics
+from metrics import drop_request, instrument, snapshot
+
+
+@pytest.fixture(autouse=True)
+def empty_sessions():
+    coalesce._latest.clear()
+    metrics.reset()
+    yield
+    coalesce._latest.clear()
+    metrics.reset()
+
+
+def test_start():
+    assert coalesce.start('tab', 1)
+    assert coalesce.start('tab', 3)
+    # a brush that arrives after a newer one of its tab
+    assert not coalesce.start('tab', 2)
+    # the same brush sent again, and the brushes of other tabs
+    assert coalesce.start('tab', 3)
+    assert coalesce.start('other', 1)
+
+
+def test_is_latest():
+    assert coalesce.is_latest('tab', 1)
+    coalesce.start('tab', 1)
+    assert coalesce.is_latest('tab', 1)
+    # a newer brush arrives while the first one is computed
+    coalesce.start('tab', 2)
+    assert not coalesce.is_latest('tab', 1)
+    assert coalesce.is_latest('tab', 2)
+
+
+def test_sessions_bounded(monkeypatch):
+    monkeypatch.setattr(coalesce, 'MAX_SESSIONS', 3)
+    for seq, session in enumerate('abcd'):
+        coalesce.start(session, seq)
+    assert list(coalesce._latest) == ['b', 'c', 'd']
+    # a forgotten tab starts again from any number
+    assert coalesce.start('a', 0)
+
+
+def test_drop_request():
+    @instrument
+    def update_selection(session, seq):
+        if not coalesce.start(session, seq):
+            drop_request()
+            return None
+        return seq
+
+    assert update_selection('tab', 2) == 2
+    assert update_selection('tab', 1) is None
+    # outside of a callback nothing is counted
+    drop_request()
+    stats = snapshot()['callbacks']['update_selection']
+    assert stats['calls'] == 2
+    assert stats['dropped'] == 1
+    assert 'design_explorer_callback_dropped_total' in \
+        metrics.render_prometheus()
@@ -0,0 +1,67 @@
+"""Check the column store against pandas reading the same CSV."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from columnstore import StringColumn, build, load_columns, open_store
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 50
+    df = pd.DataFrame({
+        'in:x': rng.uniform(0, 1, rows),
+        'in:n': rng.integers(0, 300, rows),
+        'out:y': rng.normal(size=rows),
+        'img:a': [f'images/{i}.png' for i in range(rows)],
+        'note': ['déjà vu, "quoted"', 'a\nb', '😀', 'plain', None] * 10,
+    })
+    df.loc[3, 'out:y'] = np.nan
+    df.loc[[5, 17], 'img:a'] = None
+    csv_file = tmp_path.joinpath('data.csv')
+    df.to_csv(csv_file, index=False)
+    return csv_file
+
+
+def text_values(series):
+    return [None if pd.isna(v) else v for v in series.tolist()]
+
+
+def test_frame(csv_file):
+    expected = pd.read_csv(csv_file)
+    # chunks of 7 rows, so the offsets continue across chunks
+    store = build(csv_file, chunk_rows=7)
+    df = store.frame()
+    assert list(df.columns) == list(expected.columns)
+    for column in ('in:x', 'in:n', 'out:y'):
+        np.testing.assert_array_equal(
+            df[column].to_numpy(dtype=float), expected[column].to_numpy(float))
+    assert df['in:n'].dtype.itemsize < expected['in:n'].dtype.itemsize
+    for column in ('img:a', 'note'):
+        assert text_values(df[column]) == text_values(expected[column])
+
+
+def test_string_column(csv_file):
+    expected = text_values(pd.read_csv(csv_file)['note'])
+    column = build(csv_file, chunk_rows=7).column('note')
+    assert isinstance(column, StringColumn)
+    assert len(column) == len(expected)
+    offsets = np.asarray(column.offsets)
+    assert offsets[0] == 0 and (np.diff(offsets) > 0).all()
+    assert offsets[-1] == len(column.blob)
+    assert column.values() == expected
+    rows = [49, 0, 4, 4, 23]
+    assert column.take(rows) == [expected[i] for i in rows]
+    assert column.take([]) == []
+
+
+def test_rebuilt_when_changed(csv_file):
+    df, version = load_columns(csv_file)
+    assert open_store(csv_file).version == version
+    changed = pd.read_csv(csv_file)
+    changed.loc[0, 'in:x'] = 2.0
+    changed.to_csv(csv_file, index=False)
+    df, changed_version = load_columns(csv_file)
+    assert changed_version != version
+    assert df['in:x'].iat[0] == 2.0
@@ -0,0 +1,42 @@
+"""Check that a dataset is opened again from the column store it was
+registered with."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import datasets
+from columnstore import load_columns
+from datasets import get_dataset, register
+
+
+@pytest.fixture
+def csv_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, 'dataset_path', tmp_path.joinpath('datasets'))
+    rng = np.random.default_rng(0)
+    csv_file = tmp_path.joinpath('project', 'data.csv')
+    csv_file.parent.mkdir()
+    pd.DataFrame({'in:x': rng.uniform(size=20),
+                  'img:a': [f'{i}.png' for i in range(20)]}).to_csv(
+        csv_file, index=False)
+    return csv_file
+
+
+def test_open_source(csv_file, monkeypatch):
+    df, version = load_columns(csv_file)
+    assert register(df, version, source=csv_file) == version
+    # another worker does not have the dataset in its registry
+    monkeypatch.setattr(datasets, '_datasets', type(datasets._datasets)())
+    dataset = get_dataset(version)
+    assert dataset is not None
+    pd.testing.assert_frame_equal(dataset.df, df)
+    assert get_dataset(version) is dataset
+
+
+def test_unknown_version(csv_file, monkeypatch):
+    df, version = load_columns(csv_file)
+    register(df, version)
+    monkeypatch.setattr(datasets, '_datasets', type(datasets._datasets)())
+    # registered without a source
+    assert get_dataset(version) is None
+    assert get_dataset('../project') is None
+    assert get_dataset(None) is None
@@ -0,0 +1,77 @@
+"""Check the deep zoom pyramid and its tiles against Pillow."""
+import numpy as np
+import pytest
+
+import deepzoom
+from deepzoom import TILE_OVERLAP, TILE_SIZE, descriptor, level_size, \
+    max_level, parse_path, pyramid, tile
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def image_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(deepzoom, 'deepzoom_min_size', 512)
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (600, 700, 3), dtype=np.uint8)
+    path = tmp_path.joinpath('render.png')
+    Image.fromarray(pixels).save(path)
+    deepzoom._images.clear()
+    return path
+
+
+def test_pyramid(image_file, tmp_path):
+    assert pyramid(image_file) == ('png', 700, 600)
+    assert 'Width="700" Height="600"' in descriptor(image_file)
+    small = tmp_path.joinpath('small.jpg')
+    Image.new('RGB', (300, 200)).save(small)
+    assert pyramid(small) is None
+    assert descriptor(small) is None
+    assert pyramid(tmp_path.joinpath('missing.png')) is None
+
+
+def test_levels():
+    assert max_level(700, 600) == 10
+    assert level_size(700, 600, 10) == (700, 600)
+    assert level_size(700, 600, 9) == (350, 300)
+    assert level_size(700, 600, 0) == (1, 1)
+
+
+def test_parse_path():
+    assert parse_path('images/a.png.dzi') == ('images/a.png', None)
+    assert parse_path('images/a.png_files/9/1_0.png') == \
+        ('images/a.png', (9, 1, 0, 'png'))
+    assert parse_path('images/a.png_files/9/1_0.gif') is None
+    assert parse_path('.dzi') is None
+
+
+def test_tile(image_file):
+    original = Image.open(image_file).convert('RGB')
+    # the last tile of the last level, with the overlap on its top left
+    path = tile(image_file, 10, 2, 2, 'png')
+    expected = original.crop((
+        2 * TILE_SIZE - TILE_OVERLAP, 2 * TILE_SIZE - TILE_OVERLAP, 700, 600))
+    np.testing.assert_array_equal(
+        np.asarray(Image.open(path)), np.asarray(expected))
+    # a lower level is the image scaled down
+    path = tile(image_file, 9, 0, 0, 'png')
+    assert Image.open(path).size == (TILE_SIZE + TILE_OVERLAP,
+                                     TILE_SIZE + TILE_OVERLAP)
+    assert Image.open(tile(image_file, 0, 0, 0, 'png')).size == (1, 1)
+
+
+def test_tile_cached(image_file):
+    path = tile(image_file, 8, 0, 0, 'png')
+    assert path.parent.parent.parent.name == deepzoom.CACHE_FOLDER
+    mtime = path.stat().st_mtime_ns
+    assert tile(image_file, 8, 0, 0, 'png') == path
+    assert path.stat().st_mtime_ns == mtime
+    assert not list(path.parent.glob('*.part'))
+
+
+def test_tile_outside(image_file):
+    assert tile(image_file, 11, 0, 0, 'png') is None
+    assert tile(image_file, 10, 3, 0, 'png') is None
+    assert tile(image_file, 9, 0, 2, 'png') is None
+    # not the format of the descriptor
+    assert tile(image_file, 10, 0, 0, 'jpg') is None
@@ -0,0 +1,142 @@
+"""Check the project manifest against the files it describes."""
+import os
+
+import pandas as pd
+import pytest
+from PIL import Image
+
+from blobs import file_hash
+from datasets import Dataset
+import manifest as manifest_module
+from manifest import IMAGES_FILE, MANIFEST_FILE, image_available, \
+    image_header, load_manifest, project_manifest, read_images, read_manifest
+
+
+FORMATS = {'png': 'PNG', 'jpg': 'JPEG', 'gif': 'GIF', 'bmp': 'BMP',
+           'webp': 'WEBP'}
+
+
+@pytest.fixture
+def project(tmp_path):
+    folder = tmp_path.joinpath('project')
+    images = folder.joinpath('images')
+    images.mkdir(parents=True)
+    names = []
+    for i, (suffix, image_format) in enumerate(FORMATS.items()):
+        name = f'images/{i}.{suffix}'
+        Image.new('RGB', (17 + i, 9 + 2 * i), 'red').save(
+            folder.joinpath(name), image_format)
+        names.append(name)
+    names.append('images/missing.png')
+    pd.DataFrame({
+        'in:x': range(len(names)),
+        'out:y': [float(i) / 2 for i in range(len(names))],
+        'img:a': names,
+    }).to_csv(folder.joinpath('data.csv'), index=False)
+    return folder
+
+
+@pytest.mark.parametrize('suffix', list(FORMATS))
+def test_image_header(tmp_path, suffix):
+    path = tmp_path.joinpath(f'image.{suffix}')
+    Image.new('RGB', (123, 45), 'blue').save(path, FORMATS[suffix])
+    image_format, width, height = image_header(path)
+    with Image.open(path) as image:
+        assert image_format == image.format.lower()
+        assert (width, height) == image.size
+
+
+def test_jpeg_header_after_large_segments(tmp_path):
+    # the start of frame is after more than JPEG_SCAN_BYTES of ICC profile
+    path = tmp_path.joinpath('image.jpg')
+    Image.new('RGB', (123, 45)).save(path, 'JPEG', icc_profile=bytes(200000))
+    assert image_header(path) == ('jpeg', 123, 45)
+
+
+@pytest.mark.parametrize('encoder', ['orjson', 'json'])
+def test_round_trip(project, monkeypatch, encoder):
+    if encoder == 'json':
+        monkeypatch.setattr(manifest_module, 'orjson', None)
+    manifest = load_manifest(project)
+    assert project.joinpath(MANIFEST_FILE).exists()
+    assert read_manifest(project) == manifest
+    # the images are only read from their own file
+    assert 'images' not in manifest
+    images = read_images(project, manifest)
+    assert manifest['csv'] == 'data.csv'
+    assert manifest['rows'] == len(FORMATS) + 1
+    assert manifest['input_columns'] == ['in:x']
+    assert manifest['image_columns'] == ['img:a']
+    assert manifest['report']['missing'] == 1
+    assert manifest['report']['rows_missing'] == 1
+    assert manifest['report']['missing_examples'] == ['images/missing.png']
+    assert images['images/missing.png'] == {'missing': True}
+    for name, entry in images.items():
+        if entry['missing']:
+            continue
+        path = project.joinpath(name)
+        with Image.open(path) as image:
+            assert (entry['width'], entry['height']) == image.size
+        assert entry['size'] == path.stat().st_size
+        assert entry['hash'] == file_hash(path)
+
+
+def test_rebuilt_when_csv_changed(project):
+    manifest = load_manifest(project)
+    csv_file = project.joinpath('data.csv')
+    df = pd.read_csv(csv_file).iloc[:2]
+    df.to_csv(csv_file, index=False)
+    stat = csv_file.stat()
+    os.utime(csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert read_manifest(project) is None
+    changed = load_manifest(project)
+    assert changed['rows'] == 2
+    assert changed['dataset_version'] != manifest['dataset_version']
+
+
+def test_nested_csv(tmp_path):
+    folder = tmp_path.joinpath('project')
+    folder.joinpath('study').mkdir(parents=True)
+    pd.DataFrame({'in:x': [1, 2]}).to_csv(
+        folder.joinpath('study', 'data.csv'), index=False)
+    assert load_manifest(folder)['csv'] == 'study/data.csv'
+    assert load_manifest(tmp_path.joinpath('empty')) is None
+
+
+def test_image_available(project):
+    df = pd.read_csv(project.joinpath('data.csv'))
+    expected = [True] * len(FORMATS) + [False]
+    # checked from the files without a manifest
+    available = image_available(Dataset('files', df), 'img:a', project)
+    assert available.tolist() == expected
+    load_manifest(project)
+    available = image_available(Dataset('manifest', df), 'img:a', project)
+    assert available.tolist() == expected
+
+
+def test_project_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr('manifest.upload_path', tmp_path)
+    folder = tmp_path.joinpath('project')
+    study = folder.joinpath('study')
+    study.joinpath('images').mkdir(parents=True)
+    Image.new('RGB', (8, 8)).save(study.joinpath('images', '1.png'))
+    df = pd.DataFrame({'in:x': [1, 2], 'img:a': ['images/1.png', 'images/2.png']})
+    df.to_csv(study.joinpath('data.csv'), index=False)
+    load_manifest(folder)
+    # the manifest at the root of the project is found from the CSV folder
+    assert project_manifest(study)['csv'] == 'study/data.csv'
+    assert project_manifest(folder) is None
+    # and used instead of the files
+    study.joinpath('images', '1.png').unlink()
+    available = image_available(Dataset('nested', df), 'img:a', study)
+    assert available.tolist() == [True, False]
+
+
+def test_images_of_another_csv(project):
+    manifest = load_manifest(project)
+    images_file = project.joinpath(IMAGES_FILE)
+    assert read_images(project, dict(manifest, dataset_version='other')) is None
+    images_file.write_bytes(b'{"truncated')
+    assert read_images(project, manifest) is None
+    images_file.unlink()
+    assert read_images(project, manifest) is None
@@ -0,0 +1,58 @@
+"""Check the callback counters and their Prometheus text."""
+import pytest
+
+import metrics
+from metrics import add_rows, cache_hit_rate, instrument, record_cache, \
+    render_prometheus, snapshot
+
+
+@pytest.fixture(autouse=True)
+def empty_counters():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_instrument():
+    @instrument
+    def update_plot(rows):
+        add_rows(rows)
+        if rows < 0:
+            raise ValueError(rows)
+        return rows
+
+    assert update_plot(10) == 10
+    update_plot(5)
+    with pytest.raises(ValueError):
+        update_plot(-1)
+    # rows added outside of a callback are not attributed to any callback
+    add_rows(100)
+
+    stats = snapshot()['callbacks']['update_plot']
+    assert stats['calls'] == 3
+    assert stats['errors'] == 1
+    assert stats['rows'] == 14
+    assert sum(stats['buckets']) == 3
+
+
+def test_cache_hit_rate():
+    assert cache_hit_rate('frames') == 0.0
+    for hit in (True, True, False, True):
+        record_cache('frames', hit)
+    assert cache_hit_rate('frames') == 0.75
+
+
+def test_render_prometheus():
+    @instrument
+    def update_plot():
+        pass
+
+    update_plot()
+    record_cache('frames', False)
+    text = render_prometheus()
+    assert 'design_explorer_callback_seconds_bucket' \
+        '{callback="update_plot",le="+Inf"} 1' in text
+    assert 'design_explorer_callback_seconds_count' \
+        '{callback="update_plot"} 1' in text
+    assert 'design_explorer_cache_misses_total{cache="frames"} 1' in text
+    assert text.endswith('\n')
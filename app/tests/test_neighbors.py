@@ -0,0 +1,70 @@
+"""Check the nearest designs against a brute-force search."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import neighbors
+from neighbors import NeighborIndex
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'in:x': rng.uniform(0, 10, 500),
+        'in:y': rng.uniform(-1, 1, 500),
+        'in:z': rng.uniform(100, 200, 500),
+        'out:e': rng.normal(size=500),
+        'img:a': [f'{i}.png' for i in range(500)],
+    })
+    df.loc[7, 'in:y'] = np.nan
+    return df
+
+
+def brute_neighbors(df, columns, row, k):
+    values = df[columns].to_numpy(dtype=float)
+    minimum = np.nanmin(values, axis=0)
+    points = (values - minimum) / (np.nanmax(values, axis=0) - minimum)
+    points = np.where(np.isnan(points), 0.5, points)
+    distances = np.sqrt(np.square(points - points[row]).sum(axis=1))
+    distances[row] = np.inf
+    order = np.argsort(distances)[:k]
+    return order, distances[order]
+
+
+@pytest.mark.parametrize('tree', [True, False])
+@pytest.mark.parametrize('prefixes', [('in',), ('in', 'out')])
+def test_query(df, monkeypatch, tree, prefixes):
+    if tree:
+        pytest.importorskip('scipy')
+    else:
+        # the chunked scan, with chunks and a sample smaller than the rows
+        monkeypatch.setattr(neighbors, 'cKDTree', None)
+        monkeypatch.setattr(neighbors, 'CHUNK_ROWS', 64)
+        monkeypatch.setattr(neighbors, 'SAMPLE_ROWS', 50)
+    index = NeighborIndex(df, prefixes)
+    assert (index.tree is not None) == tree
+    columns = [c for c in df.columns if c.split(':', 1)[0] in prefixes]
+    assert index.columns == columns
+    for row in (0, 7, 499):
+        expected_rows, expected_distances = brute_neighbors(
+            df, columns, row, 8)
+        rows, distances = zip(*index.query(row, 8))
+        np.testing.assert_array_equal(rows, expected_rows)
+        np.testing.assert_allclose(distances, expected_distances, rtol=1e-5)
+
+
+def test_no_columns():
+    index = NeighborIndex(pd.DataFrame({'out:e': [1.0, 2.0]}))
+    assert index.query(0) == []
+
+
+def test_text_columns(df):
+    # a text input and a text output are left out of the distances
+    df['in:option'] = pd.array(['a', 'b'] * 250, dtype='string')
+    df['out:label'] = ['low', 'high'] * 250
+    index = NeighborIndex(df, ('in', 'out'))
+    assert index.columns == ['in:x', 'in:y', 'in:z', 'out:e']
+    expected_rows, _ = brute_neighbors(df, index.columns, 3, 5)
+    rows = [row for row, _ in index.query(3, 5)]
+    np.testing.assert_array_equal(rows, expected_rows)
@@ -0,0 +1,113 @@
+"""Check the Pareto sweeps and the block based sort against brute force."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import pareto
+from pareto import front_levels, non_dominated, objective_values, \
+    parse_objectives
+
+
+def brute_front(values):
+    """A row is dominated by a row that is as good in every objective and
+    better in one."""
+    better_or_equal = (values[None, :, :] <= values[:, None, :]).all(axis=2)
+    better = (values[None, :, :] < values[:, None, :]).any(axis=2)
+    return ~(better_or_equal & better).any(axis=1)
+
+
+def brute_levels(values):
+    levels = np.empty(len(values), dtype=np.int32)
+    remaining = np.arange(len(values))
+    level = 0
+    while remaining.size:
+        mask = brute_front(values[remaining])
+        levels[remaining[mask]] = level
+        remaining = remaining[~mask]
+        level += 1
+    return levels
+
+
+def random_values(rows, objectives, seed):
+    # few distinct values, so there are ties and duplicate rows
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 8, size=(rows, objectives)).astype(float)
+
+
+@pytest.mark.parametrize('objectives', [1, 2, 3, 4, 5])
+@pytest.mark.parametrize('seed', range(5))
+def test_front(objectives, seed):
+    values = random_values(300, objectives, seed)
+    np.testing.assert_array_equal(non_dominated(values), brute_front(values))
+
+
+@pytest.mark.parametrize('objectives', [1, 2, 3, 4])
+@pytest.mark.parametrize('seed', range(5))
+def test_levels(objectives, seed):
+    values = random_values(200, objectives, seed)
+    np.testing.assert_array_equal(front_levels(values), brute_levels(values))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_front_blocks(monkeypatch, seed):
+    # small blocks and chunks, so a block is compared with several chunks of
+    # the front found so far
+    monkeypatch.setattr(pareto, 'BLOCK_ROWS', 7)
+    monkeypatch.setattr(pareto, 'BLOCK_ELEMENTS', 20)
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(400, 4))
+    np.testing.assert_array_equal(non_dominated(values), brute_front(values))
+    np.testing.assert_array_equal(front_levels(values), brute_levels(values))
+
+
+def test_continuous_sweeps():
+    rng = np.random.default_rng(0)
+    for objectives in (2, 3):
+        values = rng.normal(size=(1000, objectives))
+        np.testing.assert_array_equal(
+            non_dominated(values), brute_front(values))
+
+
+def test_empty():
+    values = np.empty((0, 3))
+    assert non_dominated(values).shape == (0,)
+    assert front_levels(values).shape == (0,)
+
+
+def test_objective_values():
+    df = pd.DataFrame({'out:a': [1.0, np.nan, 3.0], 'out:b': [2, 5, 1]})
+    values = objective_values(df, (('out:a', 'min'), ('out:b', 'max')))
+    # a missing value is worse than any other, a maximized column is negated
+    np.testing.assert_array_equal(
+        values, [[1.0, -2.0], [4.0, -5.0], [3.0, -1.0]])
+
+
+def test_parse_objectives():
+    assert parse_objectives(
+        ['min:out:Energy', 'max:out:Daylight', 'max:out:Energy']) == (
+        ('out:Daylight', 'max'), ('out:Energy', 'max'))
+    assert parse_objectives(None) == ()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_front_3d_levels(monkeypatch, seed):
+    # small blocks, so the rows are compared by several levels of segments
+    monkeypatch.setattr(pareto, 'SWEEP_BLOCK', 2)
+    values = random_values(300, 3, seed)
+    np.testing.assert_array_equal(non_dominated(values), brute_front(values))
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(500, 3))
+    values[:, 2] = -values[:, 0] - values[:, 1]
+    # every row is on the front, none is dropped within its block
+    assert non_dominated(values).all()
+    np.testing.assert_array_equal(
+        pareto._front_3d(values[::-1]), brute_front(values[::-1]))
+
+
+def test_front_3d_staircase():
+    # the second objective decreases along the first, the front is every row
+    rows = np.arange(100000, dtype=float)
+    values = np.column_stack([rows, -rows, rows])
+    assert non_dominated(values).all()
+    values[-1] = values[0] + 1
+    assert non_dominated(values).sum() == len(values) - 1
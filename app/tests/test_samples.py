@@ -0,0 +1,42 @@
+"""Check that the copy of a sample, and its column store, are reused."""
+import os
+
+import pandas as pd
+import pytest
+
+import samples
+from samples import load_sample
+
+
+@pytest.fixture
+def sample(tmp_path, monkeypatch):
+    source = tmp_path.joinpath('assets', 'samples')
+    source.joinpath('box').mkdir(parents=True)
+    pd.DataFrame({'in:x': [1, 2, 3], 'out:y': [0.5, 0.25, 0.125]}).to_csv(
+        source.joinpath('box', 'data.csv'), index=False)
+    monkeypatch.setattr(samples, 'samples_path', source)
+    monkeypatch.setattr(
+        samples, 'sample_data_path', tmp_path.joinpath('data', 'samples'))
+    return source.joinpath('box', 'data.csv'), \
+        tmp_path.joinpath('data', 'samples', 'box', 'data.csv')
+
+
+def test_copy_reused(sample):
+    csv, copy = sample
+    _, version = load_sample('box')
+    copied = copy.stat()
+    # a single executable unpacks the sample again with a new time
+    os.utime(csv, ns=(copied.st_atime_ns, copied.st_mtime_ns + 10 ** 9))
+    assert load_sample('box')[1] == version
+    assert copy.stat().st_mtime_ns == copied.st_mtime_ns
+
+
+def test_copy_replaced(sample):
+    csv, copy = sample
+    _, version = load_sample('box')
+    pd.DataFrame({'in:x': [4, 5, 6], 'out:y': [1.0, 2.0, 4.0]}).to_csv(
+        csv, index=False)
+    df, changed = load_sample('box')
+    assert changed != version
+    assert df['in:x'].tolist() == [4, 5, 6]
+    assert copy.read_bytes() == csv.read_bytes()
@@ -0,0 +1,138 @@
+"""Check the filters, the selection cache and the sorted rows against pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import selection
+from datasets import get_dataset, register
+from pareto import pareto_front
+from selection import filter_rows, make_selection, normalize_filters, \
+    selection_count, selection_result, selection_rows, selection_spec, \
+    sorted_rows
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'in:x': rng.uniform(0, 10, 2000),
+        'in:n': rng.integers(0, 5, 2000).astype(np.int8),
+        'out:y': rng.normal(100, 30, 2000),
+    })
+    df.loc[::13, 'out:y'] = np.nan
+    dataset = get_dataset(register(df))
+    # the registry keeps the dataset, and its cache, across tests
+    dataset.cache.clear()
+    return dataset
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    selection._results.clear()
+    yield
+    selection._results.clear()
+
+
+def test_filter_rows(dataset):
+    df = dataset.df
+    filters = {
+        'in:x': [[2.5, 7.25]],
+        'in:n': [[[0, 1], [3, 3]]],
+        'out:y': None,
+    }
+    expected = df.index[df['in:x'].between(2.5, 7.25) &
+                        (df['in:n'].between(0, 1) | (df['in:n'] == 3))]
+    np.testing.assert_array_equal(filter_rows(df, filters), expected)
+    np.testing.assert_array_equal(filter_rows(df, {}), df.index)
+
+
+def test_selection(dataset):
+    assert selection_spec(dataset, {'in:x': None, 'in:removed': [[0, 1]]}) \
+        is None
+    assert selection_count(dataset, None) == len(dataset.df)
+    assert selection_rows(dataset, None) is None
+
+    filters = {'in:x': [[2, 4]]}
+    objectives = [('in:x', 'min'), ('out:y', 'max')]
+    spec = selection_spec(dataset, filters, objectives)
+    inside = filter_rows(dataset.df, filters)
+    expected = inside[pareto_front(dataset, tuple(objectives))[inside]]
+    selection = make_selection(spec, expected)
+    assert selection['count'] == len(expected)
+    # the selection only holds the specification, any worker gets the rows
+    np.testing.assert_array_equal(selection_rows(dataset, selection), expected)
+    assert make_selection(
+        selection_spec(dataset, filters, objectives), expected) == selection
+    other = selection_spec(dataset, {'in:x': [[2, 5]]}, objectives)
+    assert make_selection(other, expected)['id'] != selection['id']
+
+
+def test_normalize_filters(dataset, monkeypatch):
+    monkeypatch.setattr(selection, 'filter_precision', 3)
+    normalized = normalize_filters(dataset, {
+        'out:y': [[[150.12345, 170.98765], [10.11111, 20.99999]]],
+        'in:x': [[1.23456, 4.56789]],
+        'in:removed': [[0, 1]],
+        'in:n': None,
+    })
+    assert list(normalized) == ['in:x', 'out:y']
+    # the ranges are sorted and rounded outwards to 3 significant digits of
+    # the span of the axis
+    x_decimals = 3 - int(np.floor(np.log10(np.ptp(dataset.df['in:x']))))
+    y_span = np.nanmax(dataset.df['out:y']) - np.nanmin(dataset.df['out:y'])
+    y_decimals = 3 - int(np.floor(np.log10(y_span)))
+    assert normalized['in:x'] == [[[
+        np.floor(1.23456 * 10 ** x_decimals) / 10 ** x_decimals,
+        np.ceil(4.56789 * 10 ** x_decimals) / 10 ** x_decimals]]]
+    (low, high), (low2, high2) = normalized['out:y'][0]
+    assert low <= 10.11111 and high >= 20.99999 and low2 <= 150.12345
+    assert high2 >= 170.98765 and low < low2
+    assert high - 20.99999 < 10 ** -y_decimals
+    # nearly identical brushes share their specification
+    assert normalize_filters(dataset, {'in:x': [[1.234561, 4.567889]]}) == \
+        {'in:x': normalized['in:x']}
+
+
+def test_selection_cache(dataset, monkeypatch):
+    spec = selection_spec(dataset, {'in:x': [[1, 2]]})
+    result = selection_result(dataset, spec)
+    assert selection_result(dataset, spec) is result
+    assert selection_spec(dataset, {}) is None
+
+    # every result is about 1.6 KB, a limit of 4 KB keeps the last two
+    monkeypatch.setattr(selection, 'selection_cache_mb', 4096 / 1024 ** 2)
+    specs = [selection_spec(dataset, {'in:x': [[i, i + 1]]})
+             for i in range(2, 6)]
+    results = [selection_result(dataset, s) for s in specs]
+    assert len(selection._results) == 2
+    assert selection_result(dataset, specs[-1]) is results[-1]
+    assert selection_result(dataset, specs[0]) is not results[0]
+    np.testing.assert_array_equal(
+        selection_result(dataset, specs[0]).rows, results[0].rows)
+
+
+@pytest.mark.parametrize('low, high', [(0, 10), (2, 8), (4.0, 4.1)])
+@pytest.mark.parametrize('column', ['in:x', 'in:n', 'out:y'])
+def test_sorted_rows(dataset, low, high, column):
+    # a wide range is sorted by walking the column order, a narrow one with
+    # an argsort of its rows
+    df = dataset.df
+    spec = selection_spec(dataset, {'in:x': [[low, high]]})
+    rows = selection_result(dataset, spec).rows
+    expected = df.iloc[rows].sort_values(
+        column, kind='stable', na_position='last').index.to_numpy()
+    ascending = sorted_rows(dataset, spec, column)
+    np.testing.assert_array_equal(ascending, expected)
+    # descending is the reversal of the cached ascending order
+    descending = sorted_rows(dataset, spec, column, ascending=False)
+    np.testing.assert_array_equal(descending, expected[::-1])
+    np.testing.assert_array_equal(
+        selection_result(dataset, spec).orders[column], expected)
+
+
+def test_sorted_rows_all(dataset):
+    expected = dataset.df.sort_values(
+        'out:y', kind='stable', na_position='last').index.to_numpy()
+    np.testing.assert_array_equal(sorted_rows(dataset, None, 'out:y'), expected)
+    np.testing.assert_array_equal(
+        sorted_rows(dataset, None, 'out:y', ascending=False), expected[::-1])
@@ -0,0 +1,52 @@
+"""Check the sensitivity measures against pandas."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import sensitivity as sensitivity_module
+from sensitivity import sensitivity
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 1, 500)
+    n = rng.integers(0, 4, 500)
+    df = pd.DataFrame({
+        'in:x': x,
+        'in:n': n,
+        'in:name': [f'design {i}' for i in range(500)],
+        'out:a': 3 * x + rng.normal(0, 0.1, 500),
+        'out:b': n ** 2 + rng.normal(0, 1, 500),
+        'out:c': np.full(500, 2.0),
+    })
+    df.loc[::17, 'out:a'] = np.nan
+    return df
+
+
+def main_effect(x, y, bins):
+    levels = x if x.nunique() <= bins else pd.qcut(x, bins, labels=False)
+    means = y.groupby(levels).transform('mean')
+    return np.square(means - y.mean()).sum() / np.square(y - y.mean()).sum()
+
+
+def test_sensitivity(df):
+    result = sensitivity(df)
+    assert result['inputs'] == ['in:x', 'in:n']
+    assert result['outputs'] == ['out:a', 'out:b', 'out:c']
+    complete = df.dropna()
+    assert result['rows'] == len(complete)
+    for i, column in enumerate(result['inputs']):
+        for j, output in enumerate(result['outputs']):
+            x, y = complete[column], complete[output]
+            if output == 'out:c':
+                # a constant output has no correlation
+                assert result['pearson'][i][j] is None
+                assert result['main_effect'][i][j] is None
+                continue
+            assert result['pearson'][i][j] == pytest.approx(
+                x.corr(y), abs=1e-4)
+            assert result['spearman'][i][j] == pytest.approx(
+                x.corr(y, method='spearman'), abs=1e-4)
+            assert result['main_effect'][i][j] == pytest.approx(main_effect(
+                x, y, sensitivity_module.MAIN_EFFECT_BINS), abs=1e-4)
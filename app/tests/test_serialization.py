@@ -0,0 +1,50 @@
+"""Check that orjson encodes responses like the plotly encoder."""
+import datetime
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io.json
+from dash import html
+
+import serialization
+from serialization import to_json
+
+
+def plotly_json(obj):
+    return json.loads(plotly.io.json.to_json_plotly(obj, engine='json'))
+
+
+def test_to_json(monkeypatch):
+    response = {
+        'records': pd.DataFrame({
+            'in:x': [1.5, 2.5], 'img:a': ['a.png', None]}).to_dict('records'),
+        'values': np.arange(4, dtype=np.int16),
+        'column': pd.Series([0.25, np.nan]),
+        'labels': pd.Series(['a', 'b']),
+        'strided': np.arange(6.0)[::2],
+        'count': np.int64(3),
+        'grid': html.Div([html.Img(src='/a.png')], id='grid'),
+        'figure': go.Figure(go.Scatter(x=[1, 2], y=[3, 4])),
+    }
+    expected = plotly_json(response)
+
+    def fallback(*args, **kwargs):
+        raise AssertionError('encoded by plotly')
+
+    # the whole response is encoded by orjson
+    monkeypatch.setattr(serialization, '_plotly_to_json', fallback)
+    assert json.loads(to_json(response)) == expected
+
+
+def test_to_json_escapes_html():
+    text = to_json({'title': '</script><b>\u2028'})
+    assert '<' not in text and '/' not in text and '\u2028' not in text
+    assert json.loads(text) == {'title': '</script><b>\u2028'}
+
+
+def test_to_json_falls_back_to_plotly():
+    # dates are cleaned by the plotly encoder
+    response = {'day': datetime.date(2024, 1, 2), 'values': [1, 2]}
+    assert to_json(response) == plotly.io.json.to_json_plotly(response)
@@ -0,0 +1,93 @@
+"""Check the pages queried from SQLite against the NumPy pages."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sqlstore
+from callbacks.table import table_page
+from columnstore import load_columns, open_store
+from sqlstore import SqlStore, build, database_path, select_database
+
+
+@pytest.fixture
+def project(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = 500
+    df = pd.DataFrame({
+        # few distinct values, so the order of ties is checked too
+        'in:x': rng.integers(0, 10, rows).astype(float),
+        'out:y': rng.normal(size=rows),
+        'img:a': [f'{i}.png' for i in range(rows)],
+    })
+    df.loc[::11, 'out:y'] = np.nan
+    df.loc[::7, 'in:x'] = np.nan
+    csv_file = tmp_path.joinpath('data.csv')
+    df.to_csv(csv_file, index=False)
+    store = open_store(csv_file)
+    path = database_path(csv_file)
+    build(store, path, insert_rows=64)
+    return csv_file, SqlStore(path, store.columns, store.version)
+
+
+def records(data):
+    # NaN from the DataFrame is NULL in SQLite
+    return [{k: None if isinstance(v, float) and math.isnan(v) else v
+             for k, v in record.items()} for record in data]
+
+
+def sorted_page_rows(df, rows, sort_by):
+    # stable, NaN last, and descending is the reversal of ascending
+    rows = np.arange(len(df)) if rows is None else rows
+    order = np.argsort(
+        df[sort_by[0]['column_id']].to_numpy()[rows], kind='stable')
+    if sort_by[0]['direction'] == 'desc':
+        order = order[::-1]
+    return rows[order]
+
+
+@pytest.mark.parametrize('direction', ['asc', 'desc'])
+@pytest.mark.parametrize('column', ['in:x', 'out:y'])
+@pytest.mark.parametrize('filters', [
+    {}, {'out:y': [[-1, 1]], 'in:x': None},
+    {'in:x': [[[0, 2], [5, 6]]], 'out:y': [[-0.5, 2]]}])
+def test_page(project, direction, column, filters):
+    csv_file, database = project
+    assert database.ready
+    df, _ = load_columns(csv_file)
+    mask = np.ones(len(df), dtype=bool)
+    for name, selection in filters.items():
+        if selection:
+            ranges = selection[0] if isinstance(selection[0][0], list) \
+                else selection
+            mask &= np.any([df[name].between(low, high)
+                            for low, high in ranges], axis=0)
+    rows = np.flatnonzero(mask)
+    sort_by = [{'column_id': column, 'direction': direction}]
+    for page_current in (0, 2, 100):
+        expected = table_page(
+            df, sorted_page_rows(df, rows, sort_by), page_current, 30)
+        data, page_count = database.page(
+            filters, len(rows), page_current, 30, sort_by)
+        assert page_count == expected[1]
+        assert records(data) == records(expected[0])
+
+
+def test_select_database(project, monkeypatch):
+    csv_file, _ = project
+    monkeypatch.setattr(sqlstore, 'sqlite_min_rows', 1000)
+    assert select_database(csv_file) is None
+    monkeypatch.setattr(sqlstore, 'sqlite_min_rows', 100)
+    assert select_database(csv_file).ready
+
+
+def test_page_columns(project):
+    csv_file, database = project
+    df, _ = load_columns(csv_file)
+    sort_by = [{'column_id': 'out:y', 'direction': 'asc'}]
+    data, _ = database.page({}, len(df), 1, 10, sort_by, ['out:y', 'img:a'])
+    expected, _ = table_page(df, sorted_page_rows(df, None, sort_by), 1, 10,
+                             ['out:y', 'img:a'])
+    assert records(data) == records(expected)
+    assert list(data[0]) == ['out:y', 'img:a']
@@ -0,0 +1,70 @@
+"""Check the column statistics and histograms against NumPy."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats import ColumnStats
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'in:x': rng.uniform(0, 10, 1000),
+        'in:n': rng.integers(0, 5, 1000),
+        'in:constant': np.full(1000, 3.0),
+        'in:name': [f'design {i}' for i in range(1000)],
+        'out:y': rng.normal(100, 30, 1000),
+        'img:a': [f'{i}.png' for i in range(1000)],
+    })
+    df.loc[::9, 'out:y'] = np.nan
+    return df
+
+
+def reference(df, column, rows):
+    full = df[column].dropna().to_numpy(dtype=float)
+    low, high = full.min(), full.max()
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    values = df[column].iloc[rows].dropna().to_numpy(dtype=float)
+    histogram, _ = np.histogram(values, bins=20, range=(low, high))
+    return values, histogram
+
+
+@pytest.mark.parametrize('rows', [None, 'half', 'empty'])
+def test_summarize(df, rows):
+    stats = ColumnStats(df)
+    assert stats.columns == ['in:x', 'in:n', 'in:constant', 'out:y']
+    if rows == 'half':
+        rows = np.flatnonzero(df['in:x'] > 5)
+    elif rows == 'empty':
+        rows = np.array([], dtype=np.int64)
+    summary = stats.summarize(rows)
+    for column in stats.columns:
+        values, histogram = reference(
+            df, column, slice(None) if rows is None else rows)
+        column_stats = summary[column]
+        assert column_stats['count'] == len(values)
+        assert column_stats['histogram'] == histogram.tolist()
+        if not len(values):
+            assert 'mean' not in column_stats
+            continue
+        assert column_stats['min'] == values.min()
+        assert column_stats['max'] == values.max()
+        assert column_stats['mean'] == pytest.approx(values.mean())
+        assert column_stats['median'] == pytest.approx(np.median(values))
+        assert column_stats['q25'] == pytest.approx(np.quantile(values, 0.25))
+
+
+def test_lazy_columns(df):
+    stats = ColumnStats(df)
+    rows = np.flatnonzero(df['in:x'] > 5)
+    # only the requested numeric columns are binned, in the order requested
+    summary = stats.summarize(rows, ['out:y', 'in:name', 'in:x'])
+    assert list(summary) == ['out:y', 'in:x']
+    assert sorted(stats._row_bins) == ['in:x', 'out:y']
+    edges, row_bins = stats.column_bins('out:y')
+    assert row_bins.shape == (len(df),)
+    assert (row_bins[::9] == -1).all()
+    full = stats.summarize(None, ['in:x'])
+    assert stats.summarize(None, ['in:x'])['in:x'] is full['in:x']
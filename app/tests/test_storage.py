@@ -0,0 +1,138 @@
+"""Check the LRU eviction of the projects over the storage quota."""
+import os
+import time
+
+import pytest
+
+import blobs
+import storage
+from storage import ACCESS_FILE, ProjectStorage, folder_size, \
+    freed_size
+
+
+def make_project(root, name, size, accessed):
+    folder = root.joinpath(name)
+    folder.mkdir(parents=True)
+    folder.joinpath('data.csv').write_bytes(b'x' * size)
+    access_file = folder.joinpath(ACCESS_FILE)
+    access_file.touch()
+    os.utime(access_file, (accessed, accessed))
+    return folder
+
+
+@pytest.fixture
+def quota(tmp_path, monkeypatch):
+    """Point the shared quota at a storage and blobs below tmp_path."""
+    blob_path = tmp_path.joinpath('blobs')
+    monkeypatch.setattr(storage, 'blob_path', blob_path)
+    monkeypatch.setattr(blobs, 'blob_path', blob_path)
+    uploads = ProjectStorage(tmp_path.joinpath('uploaded'), 1)
+    monkeypatch.setattr(storage, 'storages', (uploads,))
+    monkeypatch.setattr(storage, 'active_seconds', 0)
+
+    def set_quota(quota_bytes, active_seconds=0):
+        monkeypatch.setattr(storage, 'quota_bytes', quota_bytes)
+        monkeypatch.setattr(storage, 'active_seconds', active_seconds)
+        return uploads
+    return set_quota
+
+
+@pytest.fixture
+def projects(tmp_path):
+    now = time.time()
+    # oldest first
+    return [make_project(tmp_path.joinpath('uploaded'), name, 1000, now - age)
+            for name, age in (('a', 4000), ('b', 3000), ('c', 2000),
+                              ('d', 1000))]
+
+
+def test_enforce(quota, projects):
+    uploads = quota(2500)
+    # the least recently used projects are removed, except the kept one
+    assert uploads.enforce(keep=['a']) == projects[1:3]
+    assert [p.exists() for p in projects] == [True, False, False, True]
+    assert uploads.enforce() == []
+
+
+def test_active_projects_are_kept(quota, projects):
+    uploads = quota(1500, active_seconds=2500)
+    # c and d were used in the last 2500 seconds
+    assert uploads.enforce() == projects[:2]
+    # still over the quota, but c and d are in use
+    assert uploads.enforce() == []
+
+
+def test_no_quota(quota, projects):
+    assert quota(0).enforce() == []
+    assert all(p.exists() for p in projects)
+
+
+def test_shared_quota(tmp_path, quota, monkeypatch):
+    uploads = quota(2500)
+    pollination = ProjectStorage(tmp_path.joinpath('pollination'), 3)
+    monkeypatch.setattr(storage, 'storages', (uploads, pollination))
+    now = time.time()
+    old = make_project(
+        tmp_path.joinpath('pollination', 'owner', 'project'), 'artifact',
+        1000, now - 2000)
+    new = make_project(tmp_path.joinpath('uploaded'), 'new', 1000, now - 1000)
+    # each root is under the quota, together with the blobs they are not
+    tmp_path.joinpath('blobs', 'ab').mkdir(parents=True)
+    tmp_path.joinpath('blobs', 'ab', 'cdef').write_bytes(b'x' * 1000)
+    assert storage.enforce() == [old]
+    assert new.exists()
+
+
+def test_shared_blobs(tmp_path, quota):
+    uploads = quota(1500)
+    now = time.time()
+    render = b'x' * 1000
+    for name, age in (('a', 3000), ('b', 2000), ('c', 1000)):
+        folder = tmp_path.joinpath('uploaded', name)
+        make_project(tmp_path.joinpath('uploaded'), name, 100, now - age)
+        folder.joinpath('images').mkdir()
+        folder.joinpath('images', '1.png').write_bytes(render)
+        blobs.store_images(folder)
+    # 1000 bytes of blob and 300 of CSV: the render is counted once
+    assert uploads.enforce() == []
+    uploads.track('c')
+    tmp_path.joinpath('uploaded', 'c', 'images', '1.png').unlink()
+    tmp_path.joinpath('uploaded', 'c', 'images', '2.png').write_bytes(
+        b'y' * 1000)
+    blobs.store_images(tmp_path.joinpath('uploaded', 'c'))
+    # removing a or b frees only its CSV, the blob is linked by the other
+    assert uploads.enforce() == [tmp_path.joinpath('uploaded', 'a'),
+                                 tmp_path.joinpath('uploaded', 'b')]
+    assert len(list(tmp_path.joinpath('blobs').glob('*/*'))) == 1
+
+
+def test_project_dir(tmp_path):
+    storage = ProjectStorage(tmp_path, 3)
+    assert storage.project_dir('owner/project/artifact/images/1.png') == \
+        tmp_path.joinpath('owner', 'project', 'artifact')
+    assert storage.project_dir('owner/project') is None
+    assert storage.project_dir('../project/artifact') is None
+
+
+def test_folder_size_counts_links_once(tmp_path):
+    folder = tmp_path.joinpath('project')
+    folder.mkdir()
+    folder.joinpath('a.png').write_bytes(b'x' * 100)
+    os.link(folder.joinpath('a.png'), folder.joinpath('b.png'))
+    folder.joinpath('c.png').write_bytes(b'x' * 10)
+    assert folder_size(folder) == 110
+
+
+def test_freed_size(tmp_path):
+    blob = tmp_path.joinpath('blob.png')
+    blob.write_bytes(b'x' * 100)
+    first = tmp_path.joinpath('first')
+    second = tmp_path.joinpath('second')
+    for folder in (first, second):
+        folder.mkdir()
+        os.link(blob, folder.joinpath('a.png'))
+        folder.joinpath('data.csv').write_bytes(b'x' * 10)
+    # the blob is still linked by the other project
+    assert freed_size(first) == 10
+    second.joinpath('a.png').unlink()
+    assert freed_size(first) == 110